@@ -0,0 +1,77 @@
+# Resumable execution benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""What it costs to run programs so that they can be stopped and moved (checkpoint.py).
+
+    python benchmarks/checkpoint.py --trips 1000,10000 --array 1000
+
+Runs generated programs (benchmarks/corpus.py), with an array of
+`--array` elements declared, to the end on the StackInterpreter, on a
+ResumableInterpreter in `run` chunks of `--chunk` steps, and stopped
+halfway with its state saved and resumed from it. Prints one CSV row
+per trip count: the seconds of each, the size of the state without and
+with the program image, and the seconds to save and to resume it. The
+output of each way is checked against the first.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cfpl import pool
+from cfpl.checkpoint import ResumableInterpreter, resume
+from cfpl.stack_interpreter import StackInterpreter
+import corpus
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL resumable execution benchmark')
+    arg_parser.add_argument('--trips', default='1000,10000', help='comma-separated loop trip counts')
+    arg_parser.add_argument('--statements', type=int, default=20)
+    arg_parser.add_argument('--array', type=int, default=1000, help='elements of an array the program declares')
+    arg_parser.add_argument('--chunk', type=int, default=10000, help='steps per run call')
+    args = arg_parser.parse_args()
+
+    fields = ['trips', 'stack_seconds', 'resumable_seconds', 'overhead', 'steps', 'state_bytes',
+              'embedded_bytes', 'checkpoint_seconds', 'resume_seconds']
+    print(','.join(fields))
+    for trips in [int(count) for count in args.trips.split(',')]:
+        source = corpus.program(variables=10, statements=args.statements, trip_count=trips)
+        source = source.replace('VAR n=0 AS INT', 'VAR n=0 AS INT\nVAR table[{}] AS FLOAT'.format(args.array))
+        tree = pool.parse(source)
+
+        start = time.perf_counter()
+        expected = pool.run(tree, (), StackInterpreter)
+        stack_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        interpreter = ResumableInterpreter(tree)
+        while not interpreter.run(args.chunk):
+            pass
+        resumable_seconds = time.perf_counter() - start
+        steps = interpreter.steps
+        if (interpreter.take_output(), None) != expected:
+            sys.exit('resumable run of {} trips printed something else'.format(trips))
+
+        interpreter = ResumableInterpreter(tree)
+        interpreter.run(steps // 2)
+        start = time.perf_counter()
+        state = interpreter.checkpoint()
+        checkpoint_seconds = time.perf_counter() - start
+        embedded = interpreter.checkpoint(embed=True)
+        start = time.perf_counter()
+        interpreter = resume(state, tree)
+        resume_seconds = time.perf_counter() - start
+        interpreter.run()
+        if (interpreter.take_output(), None) != expected:
+            sys.exit('resumed run of {} trips printed something else'.format(trips))
+
+        print('{},{:.4f},{:.4f},{:.3f},{},{},{},{:.6f},{:.6f}'.format(
+            trips, stack_seconds, resumable_seconds, resumable_seconds / stack_seconds, steps, len(state),
+            len(embedded), checkpoint_seconds, resume_seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# Compiled build benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Interpreted sources against the compiled builds of cfpl/native.py.
+
+    python -m cfpl.native build && python -m cfpl.native build --compiler cython
+    python benchmarks/compiled.py --repeat 5
+
+Each build runs in its own process (a module is either compiled or not
+once imported) and times, best of `repeat`:
+
+    samples   lex, parse and run every tests/test*.txt
+    parse     lex and parse one long generated program
+    loops     run a loop-heavy generated program, parsed beforehand
+
+Prints one CSV row per workload and build, with the speedup over the
+pure-Python sources. Builds that have not been made are skipped.
+"""
+
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cfpl import native
+
+
+def best(function, repeat):
+    seconds = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds
+
+
+def worker(build, repeat, trip_count, statements):
+    if build != 'python' and native.enable(build) is None:
+        raise SystemExit('No ' + build + ' build')
+    from cfpl import pool
+    import corpus
+    samples = [open(path).read() for path in sorted(glob.glob(os.path.join(ROOT, 'tests', 'test*.txt')))]
+    long_program = corpus.program(variables=20, statements=statements, trip_count=1)
+    loops = pool.parse(corpus.program(variables=10, statements=10, trip_count=trip_count))
+
+    def run_samples():
+        for source in samples:
+            pool.run(source, ['1.5,2'])
+
+    return {
+        'results': [pool.run(source, ['1.5,2']) for source in samples] + [pool.run(loops)],
+        'samples': best(run_samples, repeat),
+        'parse': best(lambda: pool.parse(long_program), repeat),
+        'loops': best(lambda: pool.run(loops), repeat),
+    }
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL compiled build benchmark')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--trip-count', type=int, default=20000)
+    arg_parser.add_argument('--statements', type=int, default=20000)
+    arg_parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    options = [str(args.repeat), str(args.trip_count), str(args.statements)]
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.repeat, args.trip_count, args.statements)))
+        return
+
+    builds = ['python'] + [compiler for compiler in native.COMPILERS if native.built(compiler)]
+    results = {}
+    for build in builds:
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--worker', build,
+                                          '--repeat', options[0], '--trip-count', options[1],
+                                          '--statements', options[2]])
+        results[build] = json.loads(output.decode('utf-8'))
+        if results[build]['results'] != results['python']['results']:
+            raise SystemExit(build + ' build produced different output')
+    print('workload,build,seconds,speedup')
+    for workload in ['samples', 'parse', 'loops']:
+        for build in builds:
+            seconds = results[build][workload]
+            print('{},{},{:.4f},{:.2f}'.format(workload, build, seconds, results['python'][workload] / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Synthetic CFPL program generator
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Generate valid CFPL programs that grow along one axis at a time.
+
+    python benchmarks/corpus.py --axis nesting --size 20 > deep.cfpl
+"""
+
+AXES = ('variables', 'statements', 'nesting', 'expression_depth', 'trip_count')
+
+
+def expression(depth, variable):
+    """A parenthesized expression `depth` operators deep that evaluates to `variable`."""
+    text = variable
+    for level in range(depth):
+        op = '+' if level % 2 == 0 else '-'
+        text = '(' + text + ' ' + op + ' 1)'
+    if depth % 2:
+        text = '(' + text + ' - 1)'
+    return text
+
+
+def program(variables=1, statements=1, nesting=0, expression_depth=1, trip_count=1):
+    """Return the source of a CFPL program sized by the given knobs.
+
+    variables         -- number of `VAR ... AS INT` lines
+    statements        -- assignments (and OUTPUTs) in the innermost block
+    nesting           -- IF/WHILE blocks wrapped around that block, alternating
+    expression_depth  -- operators in each assignment's right-hand side
+    trip_count        -- iterations of the outermost WHILE loop
+    """
+    variables = max(variables, 1)
+    lines = ['* generated: variables={} statements={} nesting={} expression_depth={} trip_count={}'
+             .format(variables, statements, nesting, expression_depth, trip_count)]
+    for i in range(variables):
+        lines.append('VAR v{}={} AS INT'.format(i, i))
+    lines.append('VAR n=0 AS INT')
+    for level in range(nesting):
+        lines.append('VAR w{}=0 AS INT'.format(level))
+
+    body = []
+    for i in range(statements):
+        target = 'v{}'.format(i % variables)
+        source = 'v{}'.format((i * 7 + 3) % variables)
+        body.append('{} = {}'.format(target, expression(expression_depth, source)))
+        if i % 10 == 9:
+            body.append('OUTPUT: "{}=" & {}'.format(target, target))
+
+    # wrap from the inside out; every WHILE runs exactly once per entry
+    for level in reversed(range(nesting)):
+        if level % 2 == 0:
+            block = ['IF (n >= 0)', 'START'] + body + ['STOP']
+        else:
+            counter = 'w{}'.format(level)
+            block = ['{} = 0'.format(counter),
+                     'WHILE ({} < 1)'.format(counter), 'START',
+                     '{} = ({} + 1)'.format(counter, counter)] + body + ['STOP']
+        body = block
+
+    lines.append('START')
+    lines.append('WHILE (n < {})'.format(trip_count))
+    lines.append('START')
+    lines.extend(body)
+    lines.append('n = (n + 1)')
+    lines.append('STOP')
+    lines.append('OUTPUT: "n=" & n')
+    lines.append('STOP')
+    return '\n'.join(lines) + '\n'
+
+
+def sized(axis, size):
+    """A program where `axis` is `size` and every other knob stays small."""
+    if axis not in AXES:
+        raise ValueError('Unknown axis ' + repr(axis))
+    return program(**{axis: size})
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='Generate a CFPL program')
+    arg_parser.add_argument('--axis', choices=AXES, default='statements')
+    arg_parser.add_argument('--size', type=int, default=100)
+    args = arg_parser.parse_args()
+    print(sized(args.axis, args.size), end='')
+
+
+if __name__ == '__main__':
+    main()
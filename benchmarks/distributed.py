@@ -0,0 +1,84 @@
+# Distributed runner benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Throughput of distributed.Coordinator with local workers, with and without faults.
+
+    python benchmarks/distributed.py --workers 1,2,4 --programs 40 --cases 8
+
+Runs generated programs (benchmarks/corpus.py) x input cases on a
+localhost coordinator and local worker processes, and prints one CSV
+row per setup: tasks per second, and the coordinator's counts of
+dispatches, retries, straggler copies and dropped duplicates. With
+`--faults`, each setup of three or more workers is run again with one
+worker killed (SIGKILL) and one frozen (SIGSTOP) shortly after the
+start, so its tasks have to be retried or copied. Every run's outputs
+are checked against running the same tasks in this process.
+"""
+
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cfpl.distributed import Coordinator, start_workers
+from cfpl.server import execute
+import corpus
+
+
+def measure(sources, cases, workers, batch_size, faults):
+    coordinator = Coordinator(('127.0.0.1', 0)).start()
+    processes = start_workers(coordinator.address, workers, batch_size)
+    start = time.perf_counter()
+    try:
+        ids = coordinator.submit(sources, cases)
+        if faults:
+            time.sleep(0.2)
+            os.kill(processes[0].pid, signal.SIGKILL)
+            os.kill(processes[1].pid, signal.SIGSTOP)
+        coordinator.wait()
+        seconds = time.perf_counter() - start
+    finally:
+        coordinator.shutdown()
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGCONT)
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+    return [coordinator.results[task] for task in ids], seconds, coordinator.stats
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL distributed runner benchmark')
+    arg_parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    arg_parser.add_argument('--programs', type=int, default=40)
+    arg_parser.add_argument('--cases', type=int, default=8, help='input cases per program')
+    arg_parser.add_argument('--trip-count', type=int, default=200)
+    arg_parser.add_argument('--batch', type=int, default=8)
+    arg_parser.add_argument('--faults', action='store_true', help='also run with a killed and a frozen worker')
+    args = arg_parser.parse_args()
+
+    sources = [corpus.program(variables=i % 10 + 1, statements=20, trip_count=args.trip_count)
+               for i in range(args.programs)]
+    cases = [[str(i)] for i in range(args.cases)]
+    expected = [(response['output'], response['error']) for response in
+                (execute(source, inputs) for source in sources for inputs in cases)]
+
+    fields = ['workers', 'faults', 'tasks', 'seconds', 'tasks_per_second',
+              'dispatched', 'retried', 'speculative', 'duplicates', 'failed']
+    print(','.join(fields))
+    for workers in [int(count) for count in args.workers.split(',')]:
+        for faults in ([False, True] if args.faults and workers >= 3 else [False]):
+            responses, seconds, stats = measure(sources, cases, workers, args.batch, faults)
+            if [(response['output'], response['error']) for response in responses] != expected:
+                sys.exit('outputs differ from a local run with {} workers{}'.format(
+                    workers, ' and faults' if faults else ''))
+            row = dict(stats, workers=workers, faults=int(faults), tasks=len(responses),
+                       seconds='{:.3f}'.format(seconds), tasks_per_second='{:.1f}'.format(len(responses) / seconds))
+            print(','.join(str(row.get(field, 0)) for field in fields))
+
+
+if __name__ == '__main__':
+    main()
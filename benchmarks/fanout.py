@@ -0,0 +1,139 @@
+# Program fan-out benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Cost of handing one parsed program to many worker processes.
+
+    python benchmarks/fanout.py --statements 1000,5000,20000 --workers 4 --jobs 32
+
+For each program size, prints the serialized size and the time to
+serialize and rebuild the tree with pickle and with a program image
+(image.py), then the wall time for `jobs` runs spread over `workers`
+pre-started processes when
+
+    pickle-job      the parent pickles the tree for every job (what
+                    multiprocessing.Pool.map does with a tree argument)
+    pickle-worker   each worker receives the pickle once and keeps the tree
+    image           the image goes into shared memory once and each worker
+                    decodes it once, only the block name travels per job
+"""
+
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cfpl import image
+from cfpl import pool
+import corpus
+
+
+def best(function, repeat=3):
+    seconds = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds, result
+
+
+def worker(conn):
+    trees = {}
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        kind, payload = message
+        if kind == 'pickle':
+            tree = pickle.loads(payload)
+        elif kind == 'keep':
+            tree = trees[None] = pickle.loads(payload)
+        elif kind == 'again':
+            tree = trees[None]
+        else:
+            tree = trees.get(payload)
+            if tree is None:
+                tree = trees[payload] = image.load(payload)
+        conn.send(pool.run(tree)[1])
+
+
+def fan_out(conns, jobs, message):
+    """Send `jobs` messages round-robin, at most one in flight per worker."""
+    start = time.perf_counter()
+    sent = 0
+    for number in range(0, jobs, len(conns)):
+        batch = conns[:jobs - number]
+        for index, conn in enumerate(batch):
+            conn.send(message(sent, index))
+            sent += 1
+        for conn in batch:
+            error = conn.recv()
+            if error is not None:
+                raise SystemExit(error)
+    return time.perf_counter() - start
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL program fan-out')
+    arg_parser.add_argument('--statements', default='1000,5000,20000')
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument('--jobs', type=int, default=32)
+    args = arg_parser.parse_args()
+    sys.setrecursionlimit(100000)
+
+    context = multiprocessing.get_context('fork')
+    conns = []
+    processes = []
+    for i in range(args.workers):
+        conn, child = context.Pipe()
+        process = context.Process(target=worker, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        conns.append(conn)
+        processes.append(process)
+
+    try:
+        # start the resource tracker and import shared_memory everywhere first
+        block = image.share(pool.parse('START\nSTOP'))
+        fan_out(conns, len(conns), lambda sent, index: ('image', block.name))
+        block.close()
+        block.unlink()
+
+        print('statements,format,bytes,serialize,deserialize,mode,jobs,seconds')
+        for statements in [int(count) for count in args.statements.split(',')]:
+            tree = pool.parse(corpus.program(variables=20, statements=statements, trip_count=1))
+            dumps, data = best(lambda: pickle.dumps(tree, pickle.HIGHEST_PROTOCOL))
+            loads, ignored = best(lambda: pickle.loads(data))
+            encode, flat = best(lambda: image.encode(tree))
+            decode, ignored = best(lambda: image.decode(flat))
+
+            per_job = fan_out(conns, args.jobs, lambda sent, index: (
+                'pickle', pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)))
+            per_worker = fan_out(conns, args.jobs, lambda sent, index: (
+                ('keep', data) if sent < len(conns) else ('again', None)))
+            start = time.perf_counter()
+            block = image.share(tree)
+            try:
+                fan_out(conns, args.jobs, lambda sent, index: ('image', block.name))
+                shared = time.perf_counter() - start
+            finally:
+                block.close()
+                block.unlink()
+
+            row = '{},{},{},{:.4f},{:.4f},{},{},{:.4f}'
+            print(row.format(statements, 'pickle', len(data), dumps, loads, 'pickle-job', args.jobs, per_job))
+            print(row.format(statements, 'pickle', len(data), dumps, loads, 'pickle-worker', args.jobs, per_worker))
+            print(row.format(statements, 'image', len(flat), encode, decode, 'image', args.jobs, shared))
+    finally:
+        for conn in conns:
+            conn.send(None)
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Interning memory benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Parse-tree memory with and without hash-consing (hashcons.Interner).
+
+    python benchmarks/interning.py --statements 1000,10000,50000
+
+Parses generated programs (benchmarks/corpus.py) both ways and prints one
+CSV row per size and mode: the distinct AST nodes, the bytes the tree
+keeps once parsing is over (tracemalloc), the peak while parsing, which
+includes the interner's table, the parse seconds and the size of its
+program image.
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cfpl import ast
+from cfpl import image
+from cfpl.hashcons import Interner
+from cfpl.lexer import Lexer
+from cfpl.parser import Parser
+import corpus
+
+
+def nodes(tree):
+    """Number of distinct AST nodes in `tree`."""
+    seen = set()
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        if id(node) not in seen:
+            seen.add(id(node))
+            todo.extend(ast.iter_child_nodes(node))
+    return len(seen)
+
+
+def measure(source, intern):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tree = Parser(Lexer(source), Interner() if intern else None).parse()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'nodes': nodes(tree), 'retained_bytes': retained, 'peak_bytes': peak,
+            'seconds': seconds, 'image_bytes': len(image.encode(tree))}
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL interning memory benchmark')
+    arg_parser.add_argument('--statements', default='1000,10000,50000',
+                            help='comma-separated program lengths')
+    arg_parser.add_argument('--variables', type=int, default=20)
+    arg_parser.add_argument('--expression-depth', type=int, default=4)
+    args = arg_parser.parse_args()
+
+    fields = ['statements', 'interned', 'nodes', 'retained_bytes', 'peak_bytes', 'seconds', 'image_bytes']
+    print(','.join(fields))
+    for statements in [int(size) for size in args.statements.split(',')]:
+        source = corpus.program(variables=args.variables, statements=statements,
+                                expression_depth=args.expression_depth)
+        for intern in (False, True):
+            row = measure(source, intern)
+            row.update(statements=statements, interned=int(intern))
+            print(','.join('{:.4f}'.format(row[field]) if field == 'seconds' else str(row[field])
+                           for field in fields))
+
+
+if __name__ == '__main__':
+    main()
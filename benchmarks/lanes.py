@@ -0,0 +1,109 @@
+# Worker lane benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Latency of quick programs on a server shared with slow ones.
+
+    python benchmarks/lanes.py --workers 4 --slow-workers 1
+
+Starts a server.Server twice on the same number of workers, once with one
+queue for everything and once with `--slow-workers` of them in a slow
+lane picked by cost.Estimator, and sends both the same mix: the sample
+programs in tests/ as quick jobs and long-running generated programs
+(benchmarks/corpus.py) as slow ones, from concurrent clients. Prints one
+CSV row per setup and kind of job: latency percentiles as the clients
+saw them, and how many jobs ran in the lane their measured time says
+they belonged in.
+"""
+
+import glob
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from cfpl.server import Client, Server
+import corpus
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(address, jobs, clients):
+    """Send `jobs` [(kind, source)] from `clients` threads; [(kind, seconds, response)]."""
+    results = []
+    lock = threading.Lock()
+    todo = list(jobs)
+
+    def client():
+        connection = Client(address)
+        while True:
+            with lock:
+                if not todo:
+                    break
+                kind, source = todo.pop()
+            start = time.perf_counter()
+            response = connection.run(source, inputs=['1.5,2'])
+            elapsed = time.perf_counter() - start
+            with lock:
+                results.append((kind, elapsed, response))
+        connection.close()
+
+    threads = [threading.Thread(target=client) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL worker lane benchmark')
+    arg_parser.add_argument('--workers', type=int, default=4)
+    arg_parser.add_argument('--slow-workers', type=int, default=1)
+    arg_parser.add_argument('--fast-jobs', type=int, default=400)
+    arg_parser.add_argument('--slow-jobs', type=int, default=12)
+    arg_parser.add_argument('--slow-trips', type=int, default=5000, help='loop passes of each slow program')
+    arg_parser.add_argument('--clients', type=int, default=16)
+    args = arg_parser.parse_args()
+
+    samples = [open(path, 'r').read() for path in sorted(glob.glob(os.path.join(ROOT, 'tests', 'test*.txt')))]
+    jobs = [('fast', samples[i % len(samples)]) for i in range(args.fast_jobs)]
+    for i in range(args.slow_jobs):
+        # spread the slow jobs through the mix, each a distinct program
+        source = corpus.program(variables=i + 2, statements=10, trip_count=args.slow_trips)
+        jobs.insert(len(jobs) * i // args.slow_jobs, ('slow', source))
+    jobs.reverse()  # the clients pop from the end
+
+    print('setup,kind,jobs,p50_ms,p95_ms,max_ms,right_lane')
+    directory = tempfile.mkdtemp()
+    for setup, slow_workers in (('one queue', 0), ('lanes', args.slow_workers)):
+        address = os.path.join(directory, 'cfpl.sock')
+        server = Server(address, workers=args.workers, queue_size=len(jobs), slow_workers=slow_workers).start()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            results = run(address, jobs, args.clients)
+        finally:
+            server.shutdown()
+        threshold = server.estimator.threshold if server.estimator is not None else None
+        for kind in ('fast', 'slow'):
+            latencies = [elapsed * 1000 for job_kind, elapsed, response in results if job_kind == kind]
+            right = ''
+            if threshold is not None:
+                right = sum(1 for job_kind, elapsed, response in results if job_kind == kind and
+                            response['lane'] == ('slow' if response['timings']['execute'] > threshold else 'fast'))
+            print('{},{},{},{:.2f},{:.2f},{:.2f},{}'.format(
+                setup, kind, len(latencies), statistics.median(latencies), percentile(latencies, 0.95),
+                max(latencies), right))
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Partial evaluation benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Run time of programs specialized for some of their input (partial.py).
+
+    python benchmarks/partial.py --trips 10,100,1000 --runs 50
+
+The program reads a loop bound `n` and a value `x`, and its loop does
+most of its work on values that only depend on `n`. For each bound it
+prints one CSV row per setup: the original program, the residual
+program for that `n` (reading `x` at run time) and the one for both
+values. Each row has the specialization time, the AST nodes of the
+statements and the mean seconds per run. Every residual run's output is
+checked against the original's.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cfpl import ast
+from cfpl import pool
+from cfpl.partial import PartialEvaluator
+
+SOURCE = '''
+VAR n, i, total, square, odd AS INT
+VAR x, y=1.0, scale AS FLOAT
+START
+INPUT: n, x
+i = 0
+WHILE (i < n)
+START
+    square = (i * i)
+    IF ((square % 2) == 1)
+    START
+        odd = (odd + 1)
+    STOP
+    total = (total + (square + (i * 3)))
+    scale = ((total * 0.5) + 1)
+    y = ((y * 0.5) + (x / scale))
+    i = (i + 1)
+STOP
+OUTPUT: "total=" & total & " odd=" & odd & " y=" & y
+STOP
+'''
+
+
+def nodes(tree):
+    return sum(1 for node in ast.walk(tree.block.compound_statement))
+
+
+def measure(tree, inputs, runs):
+    start = time.perf_counter()
+    for i in range(runs):
+        output, error = pool.run(tree, inputs)
+    return output, error, (time.perf_counter() - start) / runs
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL partial evaluation benchmark')
+    arg_parser.add_argument('--trips', default='10,100,1000', help='comma-separated values of n')
+    arg_parser.add_argument('--x', default='2.5', help='the value of x')
+    arg_parser.add_argument('--runs', type=int, default=50)
+    args = arg_parser.parse_args()
+
+    tree = pool.parse(SOURCE)
+    fields = ['n', 'setup', 'specialize_seconds', 'nodes', 'seconds_per_run']
+    print(','.join(fields))
+    for trips in args.trips.split(','):
+        expected = measure(tree, [trips + ',' + args.x], args.runs)
+        if expected[1] is not None:
+            sys.exit('n={}: {}'.format(trips, expected[1]))
+        print('{},original,0,{},{:.6f}'.format(trips, nodes(tree), expected[2]))
+        for setup, bindings, inputs in (('bind n', {'n': trips}, [args.x]),
+                                        ('bind n and x', {'n': trips, 'x': args.x}, [])):
+            start = time.perf_counter()
+            residual = PartialEvaluator(max_passes=int(trips), max_statements=20 * int(trips)).specialize(
+                tree, bindings)
+            seconds = time.perf_counter() - start
+            result = measure(residual, inputs, args.runs)
+            if result[:2] != expected[:2]:
+                sys.exit('residual program for {} prints {!r}, not {!r}'.format(bindings, result[:2], expected[:2]))
+            print('{},{},{:.6f},{},{:.6f}'.format(trips, setup, seconds, nodes(residual), result[2]))
+
+
+if __name__ == '__main__':
+    main()
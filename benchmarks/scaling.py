@@ -0,0 +1,143 @@
+# Scaling-curve benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Sweep generated programs along each axis and record time and peak memory.
+
+    python benchmarks/scaling.py --output scaling.csv
+    python benchmarks/scaling.py --axis nesting --sizes 10,50,100,200
+
+One CSV row per (axis, size, phase). `slope` is the log-log slope of time
+against size since the previous size, so ~1 is linear and >1 superlinear.
+A phase that raised (RecursionError, MemoryError, ...) records the
+exception name in `error` and stops the sweep for that axis.
+"""
+
+import io
+import math
+import os
+import sys
+import time
+import csv
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cfpl.constants import EOF
+from cfpl.lexer import Lexer
+from cfpl.parser import Parser
+from cfpl.interpreter import Interpreter
+import corpus
+
+
+SIZES = {
+    'variables': [10, 100, 1000, 5000, 10000],
+    'statements': [10, 100, 1000, 5000, 10000],
+    'nesting': [5, 10, 25, 50, 100, 200],
+    'expression_depth': [5, 10, 25, 50, 100, 200],
+    'trip_count': [10, 100, 1000, 10000, 100000],
+}
+PHASES = ('lex', 'parse', 'execute')
+FIELDS = ['axis', 'size', 'source_bytes', 'phase', 'seconds', 'peak_bytes', 'slope', 'error']
+
+
+def lex(source):
+    lexer = Lexer(source)
+    while lexer.get_next_token().type != EOF:
+        pass
+
+
+def parse(source):
+    return Parser(Lexer(source)).parse()
+
+
+def execute(source):
+    parser = Parser(Lexer(source))
+    tree = parser.parse()
+    start = time.perf_counter()
+    Interpreter(parser, stdout=io.StringIO()).visit(tree)
+    return time.perf_counter() - start
+
+
+def run(phase, source):
+    """Run one phase and return its seconds.
+
+    Parse time still includes lexing, since the parser pulls tokens from
+    the lexer as it goes; `measure` subtracts it. Execute time excludes both.
+    """
+    start = time.perf_counter()
+    if phase == 'lex':
+        lex(source)
+    elif phase == 'parse':
+        parse(source)
+    else:
+        return execute(source)
+    return time.perf_counter() - start
+
+
+def measure(phase, source, repeat):
+    """Best-of-`repeat` seconds and tracemalloc peak bytes for one phase."""
+    best = min(run(phase, source) for i in range(repeat))
+    if phase == 'parse':
+        best -= min(run('lex', source) for i in range(repeat))
+
+    tracemalloc.start()
+    try:
+        run(phase, source)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return max(best, 0.0), peak
+
+
+def sweep(axis, sizes, repeat=3):
+    previous = {}
+    for size in sizes:
+        source = corpus.sized(axis, size)
+        failed = False
+        for phase in PHASES:
+            row = {'axis': axis, 'size': size, 'source_bytes': len(source),
+                   'phase': phase, 'seconds': '', 'peak_bytes': '', 'slope': '', 'error': ''}
+            try:
+                seconds, peak = measure(phase, source, repeat)
+            except (RecursionError, MemoryError) as e:
+                row['error'] = type(e).__name__
+                failed = True
+                yield row
+                break
+            row['seconds'] = '{:.6f}'.format(seconds)
+            row['peak_bytes'] = peak
+            if phase in previous and seconds > 0 and previous[phase][1] > 0:
+                last_size, last_seconds = previous[phase]
+                row['slope'] = '{:.2f}'.format(
+                    math.log(seconds / last_seconds) / math.log(size / last_size))
+            previous[phase] = (size, seconds)
+            yield row
+        if failed:
+            break
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL scaling curves')
+    arg_parser.add_argument('--axis', choices=corpus.AXES, action='append',
+                            help='axis to sweep (repeatable; default: all)')
+    arg_parser.add_argument('--sizes', help='comma-separated sizes overriding the defaults')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--output', metavar='PATH', help='CSV file (default: stdout)')
+    args = arg_parser.parse_args()
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    writer = csv.DictWriter(out, FIELDS)
+    writer.writeheader()
+    for axis in args.axis or corpus.AXES:
+        sizes = SIZES[axis]
+        if args.sizes:
+            sizes = [int(size) for size in args.sizes.split(',')]
+        for row in sweep(axis, sizes, args.repeat):
+            writer.writerow(row)
+            out.flush()
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == '__main__':
+    main()
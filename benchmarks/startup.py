@@ -0,0 +1,102 @@
+# Startup benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Cold-start cost of the cfpl command, checked against a budget.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 50 --budget-import-ms 5
+
+Every run is a new process. Two numbers, the median over `runs`:
+
+    import        ms spent importing the cfpl modules a run needs and
+                  whatever they import, from `python -X importtime`
+    first_output  ms from starting `python -m cfpl` on a one-line
+                  program until its output arrives, less the same for
+                  `python -c "print('hi')"`, so it is what cfpl adds
+
+Bytecode is compiled first, as it would be for an installed package.
+Prints one CSV row per number and exits with status 1 if either is over
+its budget, listing the slowest imports to look at.
+"""
+
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAM = 'START\nOUTPUT: "hi"\nSTOP\n'
+
+
+def imports(command, env):
+    """[(module, self us, cumulative us, depth)] that `command` imported after startup."""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(own), int(cumulative), len(name) - len(name.lstrip()) - 1))
+    return modules
+
+
+def first_output(command, env):
+    """Seconds from starting `command` until it writes its first byte."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable] + command, cwd=ROOT, env=env, stdout=subprocess.PIPE)
+    process.stdout.read(1)
+    elapsed = time.perf_counter() - start
+    process.stdout.read()
+    process.wait()
+    return elapsed
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL startup benchmark')
+    arg_parser.add_argument('--runs', type=int, default=20)
+    arg_parser.add_argument('--budget-import-ms', type=float, default=10.0)
+    arg_parser.add_argument('--budget-first-output-ms', type=float, default=40.0)
+    args = arg_parser.parse_args()
+
+    compileall.compile_dir(os.path.join(ROOT, 'cfpl'), quiet=1)
+    env = dict(os.environ)
+    env.pop('PYTHONPATH', None)
+    with tempfile.NamedTemporaryFile('w', suffix='.cfpl', delete=False) as program:
+        program.write(PROGRAM)
+    try:
+        command = ['-m', 'cfpl', program.name]
+        samples = []
+        slowest = {}
+        for i in range(args.runs):
+            modules = imports(command, env)
+            # the cfpl modules and everything below them
+            ours = [module for module in modules if module[3] == 0 and module[0].split('.')[0] == 'cfpl']
+            samples.append(sum(module[2] for module in ours) / 1000.0)
+            for name, own, cumulative, depth in modules:
+                slowest[name] = min(slowest.get(name, own), own)
+        import_ms = statistics.median(samples)
+        baseline = statistics.median(first_output(['-c', "print('hi')"], env) for i in range(args.runs))
+        output_ms = (statistics.median(first_output(command, env) for i in range(args.runs)) - baseline) * 1000
+    finally:
+        os.unlink(program.name)
+
+    print('metric,ms,budget_ms,status')
+    over = False
+    for metric, ms, budget in (('import', import_ms, args.budget_import_ms),
+                               ('first_output', output_ms, args.budget_first_output_ms)):
+        over = over or ms > budget
+        print('{},{:.1f},{:.1f},{}'.format(metric, ms, budget, 'over' if ms > budget else 'ok'))
+    if over:
+        sys.stderr.write('slowest imports (self ms):\n')
+        for name, own in sorted(slowest.items(), key=lambda item: -item[1])[:10]:
+            sys.stderr.write('  {:<32} {:.1f}\n'.format(name, own / 1000.0))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Subinterpreter benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Throughput and memory of threads, subinterpreters and processes.
+
+    python3.13 benchmarks/subinterpreters.py --workers 1,2,4,8 --jobs 64
+
+Every job runs the same program source with
+    threads          pool.ThreadPool, one GIL for all workers
+    subinterpreters  subinterpreters.SubinterpreterPool, one GIL per worker
+    processes        a forked multiprocessing.Pool
+and prints the wall time, programs per second and the resident memory of
+the benchmark plus its worker processes (VmRSS from /proc) while the
+workers are still up. Subinterpreters need CPython 3.13 or later; on
+older versions that row is skipped.
+"""
+
+import os
+import sys
+import time
+import multiprocessing.pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cfpl import pool
+from cfpl import subinterpreters
+import corpus
+
+
+def rss(pids):
+    """Resident memory of the processes `pids`, in MiB."""
+    total = 0
+    for pid in pids:
+        with open('/proc/{}/status'.format(pid)) as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1])
+    return total / 1024.0
+
+
+def measure(workers, sources):
+    start = time.perf_counter()
+    results = workers.map(sources)
+    seconds = time.perf_counter() - start
+    return seconds, results
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL subinterpreter benchmark')
+    arg_parser.add_argument('--workers', default='1,2,4,8')
+    arg_parser.add_argument('--jobs', type=int, default=64)
+    arg_parser.add_argument('--trip-count', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    print('python {} cpus={}'.format(sys.version.split()[0], os.cpu_count()))
+    source = corpus.program(variables=10, statements=10, trip_count=args.trip_count)
+    expected = pool.run(source)
+    sources = [source] * args.jobs
+    available = subinterpreters.backend() is not None
+    context = multiprocessing.get_context('fork')
+    print('backend,workers,seconds,programs_per_second,rss_mib')
+    for count in [int(workers) for workers in args.workers.split(',')]:
+        rows = []
+        with pool.ThreadPool(count) as workers:
+            seconds, results = measure(workers, sources)
+            rows.append(('threads', seconds, results, rss([os.getpid()])))
+        if available:
+            with subinterpreters.SubinterpreterPool(count) as workers:
+                seconds, results = measure(workers, sources)
+                rows.append(('subinterpreters', seconds, results, rss([os.getpid()])))
+        with context.Pool(count) as workers:
+            start = time.perf_counter()
+            results = workers.map(pool.run, sources, chunksize=1)
+            seconds = time.perf_counter() - start
+            pids = [os.getpid()] + [process.pid for process in workers._pool]
+            rows.append(('processes', seconds, results, rss(pids)))
+        for backend, seconds, results, memory in rows:
+            if any(tuple(result) != expected for result in results):
+                raise SystemExit('{} with {} workers produced different output'.format(backend, count))
+            print('{},{},{:.3f},{:.1f},{:.1f}'.format(backend, count, seconds, args.jobs / seconds, memory))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Thread scaling benchmark
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Throughput of pool.ThreadPool as the thread count grows.
+
+    python3.13t benchmarks/threads.py --threads 1,2,4,8 --jobs 64
+
+Every job runs one shared parsed tree. On a free-threaded build
+(`sys._is_gil_enabled()` is False) throughput should grow with the thread
+count up to the core count; with the GIL it stays flat.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cfpl.pool import ThreadPool, parse, run
+import corpus
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL thread scaling')
+    arg_parser.add_argument('--threads', default='1,2,4,8')
+    arg_parser.add_argument('--jobs', type=int, default=64)
+    arg_parser.add_argument('--trip-count', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('python {} gil={} cpus={}'.format(sys.version.split()[0], gil, os.cpu_count()))
+    tree = parse(corpus.program(variables=10, statements=10, trip_count=args.trip_count))
+    expected = run(tree)
+    print('threads,seconds,programs_per_second,speedup')
+    baseline = None
+    for threads in [int(count) for count in args.threads.split(',')]:
+        with ThreadPool(threads) as pool:
+            start = time.perf_counter()
+            results = pool.map([tree] * args.jobs)
+            seconds = time.perf_counter() - start
+        if any(result != expected for result in results):
+            raise SystemExit('threads={} produced different output'.format(threads))
+        baseline = baseline or seconds
+        print('{},{:.3f},{:.1f},{:.2f}'.format(threads, seconds, args.jobs / seconds, baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
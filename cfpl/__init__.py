@@ -0,0 +1,48 @@
+# CFPL interpreter package
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""CIT's First Programming Language.
+
+    >>> import cfpl
+    >>> cfpl.run(source, inputs=['1.5,2'])   # (output, error)
+
+Importing the package loads nothing else: each name below imports its
+module the first time it is used, so a plain run never pays for the
+optional engines, optimizers, debugger, server or compiled builds.
+"""
+
+# name: module it comes from
+EXPORTS = {
+    'parse': 'pool',
+    'run': 'pool',
+    'ThreadPool': 'pool',
+    'Lexer': 'lexer',
+    'Parser': 'parser',
+    'Interpreter': 'interpreter',
+    'StackInterpreter': 'stack_interpreter',
+    'QuickeningInterpreter': 'quicken',
+    'LoopOptimizer': 'optimizer',
+    'DataflowOptimizer': 'optimizer',
+    'Interner': 'hashcons',
+    'Estimator': 'cost',
+    'Coordinator': 'distributed',
+    'PartialEvaluator': 'partial',
+    'ResumableInterpreter': 'checkpoint',
+    'Debugger': 'debugger',
+    'Metrics': 'metrics',
+}
+
+__all__ = sorted(EXPORTS)
+
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError('module ' + repr(__name__) + ' has no attribute ' + repr(name))
+    from importlib import import_module
+    value = getattr(import_module('.' + EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,6 @@
+# python -m cfpl
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+from .interpreter import main
+
+main()
@@ -0,0 +1,225 @@
+# Array values
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import array
+import itertools
+import operator
+
+from .constants import BOOL, CHAR, FLOAT, INT
+
+
+# element storage per CFPL type: CHAR keeps code points (0 is the empty
+# char) and BOOL keeps 0/1, so every array is one flat machine buffer
+TYPECODES = {INT: 'i', FLOAT: 'd', CHAR: 'I', BOOL: 'B'}
+
+# arithmetic on arrays of at least this many elements runs in NumPy, if
+# it is installed; shorter ones are cheaper element by element
+NUMPY_MIN_SIZE = 256
+UFUNCS = {operator.add: 'add', operator.sub: 'subtract', operator.mul: 'multiply',
+          operator.truediv: 'true_divide', operator.mod: 'remainder'}
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+numpy = None
+
+
+def numpy_module():
+    """NumPy, imported on first use, or False when it is not installed."""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            module = False
+        numpy = module
+    return numpy
+
+
+def show(value):
+    """`value` as OUTPUT prints it: BOOLs are Python bools until then."""
+    if type(value) is bool:
+        return 'TRUE' if value else 'FALSE'
+    return str(value)
+
+
+class Array(object):
+    """Fixed-size CFPL array backed by an `array.array` buffer.
+
+    Arithmetic between arrays, or between an array and a scalar, runs
+    element-wise over the whole buffer and returns a new Array: one
+    operator call per element, or one NumPy call for long arrays.
+    """
+
+    def __init__(self, data_type, size=0, data=None):
+        self.data_type = data_type
+        if data is None:
+            data = array.array(TYPECODES[data_type], bytes(size * array.array(TYPECODES[data_type]).itemsize))
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __str__(self):
+        return ', '.join(show(self.decode(value)) for value in self.data)
+
+    def encode(self, value):
+        if self.data_type == CHAR:
+            # an element holds one code point, where a CHAR variable holds any string
+            if len(value) > 1:
+                raise NameError('Value ' + repr(value) + ' could not assign to char array element')
+            return ord(value) if value else 0
+        if self.data_type == BOOL:
+            return 1 if value else 0
+        return value
+
+    def decode(self, value):
+        if self.data_type == CHAR:
+            return chr(value) if value else ''
+        if self.data_type == BOOL:
+            return value == 1
+        return value
+
+    def check_index(self, index):
+        if not isinstance(index, int) or isinstance(index, bool):
+            raise NameError('Array index ' + repr(index) + ' is not an int')
+        if not 0 <= index < len(self.data):
+            raise NameError('Array index ' + str(index) + ' out of range 0..' + str(len(self.data) - 1))
+
+    def get(self, index):
+        self.check_index(index)
+        return self.decode(self.data[index])
+
+    def set(self, index, value):
+        self.check_index(index)
+        try:
+            self.data[index] = self.encode(value)
+        except OverflowError:
+            raise NameError('Value ' + repr(value) + ' overflows 32-bit INT array element')
+
+    def fill(self, value):
+        try:
+            item = array.array(self.data.typecode, [self.encode(value)])
+        except OverflowError:
+            raise NameError('Value ' + repr(value) + ' overflows 32-bit INT array element')
+        self.data = item * len(self.data)
+
+    def assign(self, value):
+        """Copy another array into this one, or fill it with a scalar."""
+        if not isinstance(value, Array):
+            self.fill(value)
+            return
+        if len(value) != len(self):
+            raise NameError('Cannot assign array of size ' + str(len(value)) + ' to array of size ' + str(len(self)))
+        if value.data_type == self.data_type:
+            self.data = array.array(self.data.typecode, value.data)
+        elif self.data_type == INT and value.data_type == FLOAT:
+            self.data = array.array(self.data.typecode, map(int, value.data))
+        elif self.data_type == FLOAT and value.data_type == INT:
+            self.data = array.array(self.data.typecode, value.data)
+        else:
+            raise NameError('Cannot assign ' + value.data_type + ' array to ' + self.data_type + ' array')
+
+    def sum(self):
+        if self.data_type == CHAR:
+            raise NameError('Cannot SUM a CHAR array')
+        return sum(self.data)
+
+    def elementwise(self, other, op, reflected=False):
+        if self.data_type not in (INT, FLOAT):
+            raise NameError('Arithmetic on ' + self.data_type + ' array')
+        right_type = INT
+        if isinstance(other, Array):
+            if len(other) != len(self):
+                raise NameError('Array sizes ' + str(len(self)) + ' and ' + str(len(other)) + ' differ')
+            if other.data_type not in (INT, FLOAT):
+                raise NameError('Arithmetic on ' + other.data_type + ' array')
+            right_type = other.data_type
+            right = other.data
+        else:
+            if isinstance(other, float):
+                right_type = FLOAT
+            elif not isinstance(other, int) or isinstance(other, bool):
+                raise NameError('Arithmetic between array and ' + repr(other))
+            right = itertools.repeat(other, len(self))
+        if FLOAT in (self.data_type, right_type) or op is operator.truediv:
+            data_type = FLOAT
+        else:
+            data_type = INT
+        if len(self) >= NUMPY_MIN_SIZE and numpy_module():
+            data = self.bulk(other, op, reflected, data_type)
+            if data is not None:
+                return Array(data_type, data=data)
+        left = self.data
+        if reflected:
+            left, right = right, left
+        try:
+            data = array.array(TYPECODES[data_type], map(op, left, right))
+        except OverflowError:
+            raise NameError('Array arithmetic overflowed 32-bit INT')
+        return Array(data_type, data=data)
+
+    def bulk(self, other, op, reflected, data_type):
+        """The buffer `elementwise` would make, computed by NumPy, or None.
+
+        None leaves the cases where NumPy could differ to the element loop,
+        which raises their errors: a zero divisor, an INT scalar beyond 32
+        bits and an INT result that does not fit back into 32 bits. INT
+        operands are widened to 64 bits, so no operation can wrap.
+        """
+        left = numpy.frombuffer(self.data, self.data.typecode)
+        if self.data_type == INT:
+            left = left.astype(numpy.int64)
+        if isinstance(other, Array):
+            right = numpy.frombuffer(other.data, other.data.typecode)
+            if other.data_type == INT:
+                right = right.astype(numpy.int64)
+        elif isinstance(other, int) and not INT_MIN <= other <= INT_MAX:
+            return None
+        else:
+            right = other
+        if reflected:
+            left, right = right, left
+        if op in (operator.truediv, operator.mod) and not numpy.all(right):
+            return None
+        with numpy.errstate(all='ignore'):
+            result = getattr(numpy, UFUNCS[op])(left, right)
+        if data_type == INT:
+            if result.min() < INT_MIN or result.max() > INT_MAX:
+                return None
+            result = result.astype(numpy.int32)
+        return array.array(TYPECODES[data_type], result.tobytes())
+
+    def __add__(self, other):
+        return self.elementwise(other, operator.add)
+
+    def __radd__(self, other):
+        return self.elementwise(other, operator.add, True)
+
+    def __sub__(self, other):
+        return self.elementwise(other, operator.sub)
+
+    def __rsub__(self, other):
+        return self.elementwise(other, operator.sub, True)
+
+    def __mul__(self, other):
+        return self.elementwise(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self.elementwise(other, operator.mul, True)
+
+    def __truediv__(self, other):
+        return self.elementwise(other, operator.truediv)
+
+    def __rtruediv__(self, other):
+        return self.elementwise(other, operator.truediv, True)
+
+    def __mod__(self, other):
+        return self.elementwise(other, operator.mod)
+
+    def __rmod__(self, other):
+        return self.elementwise(other, operator.mod, True)
+
+    def __neg__(self):
+        return self.elementwise(-1, operator.mul)
+
+    def __pos__(self):
+        return self
@@ -0,0 +1,177 @@
+# Abstract Syntax Trees
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+class AST(object):
+    # statements only: the source line, set by the parser
+    line: int
+
+
+class BinOp(AST):
+    def __init__(self, left, op, right):
+        self.left = left
+        self.token = self.op = op
+        self.right = right
+        self.value = None
+
+
+class Num(AST):
+    def __init__(self, token):
+        self.token = token
+        self.value = token.value
+
+
+class Char(Num):
+    pass
+
+
+class Bool(Num):
+    # the source says "TRUE"/"FALSE"; programs compute with bools
+    def __init__(self, token):
+        self.token = token
+        self.value = token.value == 'TRUE'
+
+
+class String(Num):
+    pass
+
+
+class Input(Num):
+    # partial.py: the text of each value fixed in advance, None for those
+    # still read, e.g. ['10', None]; None when every value is read
+    fixed = None
+
+
+class Output(Num):
+    pass
+
+
+class IfStatement(AST):
+    def __init__(self, token, expr, body, els=None):
+        self.token = token
+        self.value = body
+        self.expr = expr
+        self.els = els
+
+
+class WhileStatement(AST):
+    def __init__(self, token, expr, body):
+        self.token = token
+        self.value = body
+        self.expr = expr
+
+
+class CountedLoop(AST):
+    """A WHILE loop driven by an INT counter, built by optimizer.LoopOptimizer.
+
+    The loop runs while `counter <comparison> limit`; `limit` is a constant or a
+    variable the body never assigns, and the body moves the counter by
+    `step` exactly once per pass through an Increment. `unroll` bodies run
+    back to back whenever the condition provably holds for all of them.
+    """
+    def __init__(self, token, expr, body, counter, comparison, limit, step, unroll=1):
+        self.token = token
+        self.value = body
+        self.expr = expr
+        self.counter = counter
+        self.comparison = comparison
+        self.limit = limit
+        self.step = step
+        self.unroll = unroll
+
+
+class Increment(AST):
+    """`name = name + step` on an INT variable, built by optimizer.LoopOptimizer."""
+    def __init__(self, token, step):
+        self.token = token
+        self.value = token.value
+        self.step = step
+
+
+class UnaryOp(AST):
+    def __init__(self, op, expr):
+        self.token = self.op = op
+        self.expr = expr
+
+
+class Compound(AST):
+    """Represents a 'START ... STOP' block"""
+    def __init__(self):
+        self.children = []
+
+
+class Assign(AST):
+    def __init__(self, left, op, right):
+        self.left = left
+        self.token = self.op = op
+        self.right = right
+
+
+class Var(AST):
+    """The Var node is constructed out of ID token."""
+    def __init__(self, token):
+        self.token = token
+        self.value = token.value
+        self.default_value = None
+        self.size = None
+
+
+class Index(AST):
+    """An array element, ID[expr]."""
+    def __init__(self, token, index):
+        self.token = token
+        self.value = token.value
+        self.index = index
+
+
+class Sum(AST):
+    """SUM(expr) over a whole array."""
+    def __init__(self, token, expr):
+        self.token = token
+        self.expr = expr
+
+
+class NoOp(AST):
+    pass
+
+
+class Program(AST):
+    def __init__(self, block):
+        self.block = block
+
+
+class Block(AST):
+    def __init__(self, declarations, compound_statement):
+        self.declarations = declarations
+        self.compound_statement = compound_statement
+
+
+class VarDecl(AST):
+    def __init__(self, var_node, type_node):
+        self.var_node = var_node
+        self.type_node = type_node
+
+
+class Type(AST):
+    def __init__(self, token):
+        self.token = token
+        self.value = token.value
+
+
+def iter_child_nodes(node):
+    """Yield the direct child nodes of `node`, whatever field holds them."""
+    for value in vars(node).values():
+        if isinstance(value, AST):
+            yield value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, AST):
+                    yield item
+
+
+def walk(node):
+    """Yield `node` and every node below it, in no particular order."""
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        yield node
+        todo.extend(iter_child_nodes(node))
@@ -0,0 +1,173 @@
+# Program result cache
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+
+from .ast import AST, Input, walk
+from .token import Token
+
+
+def canonical(node):
+    """Serialize a tree to a string that ignores formatting and comments.
+
+    Two sources that parse to the same tree (they can only differ in
+    whitespace and `*` comment lines) give the same string. Token fields
+    are left out since every node keeps what it needs from its token in
+    `value` or `op`, and so are the source line numbers of statements.
+    """
+    if isinstance(node, AST):
+        fields = sorted(item for item in vars(node).items() if item[0] not in ('token', 'line'))
+        return '(' + type(node).__name__ + ''.join(
+            ' ' + name + '=' + canonical(value) for name, value in fields) + ')'
+    if isinstance(node, Token):
+        return '<' + node.type + ' ' + canonical(node.value) + '>'
+    if isinstance(node, list):
+        return '[' + ' '.join(canonical(item) for item in node) + ']'
+    return type(node).__name__ + ':' + repr(node)
+
+
+class ResultCache(object):
+    """Captured (output, error) of whole-program runs.
+
+    Keys combine the canonical tree hash with the limits and, for programs
+    that contain INPUT, the complete list of input lines; programs without
+    INPUT share one entry for every input. Entries live in a bounded LRU
+    in memory and, if `directory` is given, in one JSON file each on disk,
+    where the least recently used files beyond `disk_size` are removed.
+    """
+
+    def __init__(self, size=1024, directory=None, disk_size=100000):
+        self.size = size
+        self.directory = directory
+        self.disk_size = disk_size
+        self.entries = collections.OrderedDict()
+        self.digests = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def digest(self, tree):
+        """(sha256 of the canonical tree, whether it reads INPUT), memoized per tree."""
+        result = self.digests.get(tree)
+        if result is None:
+            text = canonical(tree).encode('utf-8')
+            reads_input = any(isinstance(node, Input) for node in walk(tree))
+            result = (hashlib.sha256(text).hexdigest(), reads_input)
+            self.digests[tree] = result
+        return result
+
+    def key(self, tree, inputs=(), limits=None):
+        digest, reads_input = self.digest(tree)
+        payload = [digest, list(inputs) if reads_input else None, limits or {}]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, key):
+        """Return the cached (output, error) for `key`, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        if self.directory is not None:
+            entry = self.read(self.path(key))
+            if entry is not None:
+                self.remember(key, entry)
+                with self.lock:
+                    self.hits += 1
+                return entry
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def read(self, path):
+        """The (output, error) stored at `path`, or None; a malformed file is removed."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except OSError:
+            return None
+        except ValueError:
+            data = None  # truncated, or not JSON
+        if isinstance(data, dict) and isinstance(data.get('output'), str) and 'error' in data and \
+                (data['error'] is None or isinstance(data['error'], str)):
+            try:
+                os.utime(path)  # mark as recently used for eviction
+            except OSError:
+                pass
+            return data['output'], data['error']
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        return None
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def put(self, key, output, error):
+        self.remember(key, (output, error))
+        if self.directory is None:
+            return
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'output': output, 'error': error}, f)
+        os.replace(temp, path)
+        with self.lock:
+            self.puts += 1
+            evict = self.puts % 256 == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used files beyond `disk_size`."""
+        files = []
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        files.append((os.stat(path).st_mtime, path))
+                    except OSError:
+                        pass
+        if len(files) <= self.disk_size:
+            return
+        files.sort()
+        for mtime, path in files[:len(files) - self.disk_size]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def run(self, program, inputs=(), engine=None):
+        """Like `pool.run`, but answered from the cache when possible."""
+        from . import pool
+        if isinstance(program, str):
+            try:
+                program = pool.parse(program)
+            except Exception as e:
+                return '', str(e)
+        key = self.key(program, inputs)
+        entry = self.get(key)
+        if entry is None:
+            entry = pool.run(program, inputs, engine or pool.Interpreter)
+            self.put(key, *entry)
+        return entry
@@ -0,0 +1,303 @@
+# Resumable execution
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Run a program in steps, and save its state between any two statements.
+
+    >>> interpreter = ResumableInterpreter(tree, inputs=['10'])
+    >>> interpreter.run(steps=100000)       # False: not done yet
+    >>> state = interpreter.checkpoint()     # bytes
+    >>> interpreter = resume(state, tree)    # here, or in another process
+    >>> interpreter.run()                    # True: done
+    >>> interpreter.take_output()
+
+The interpreter is a StackInterpreter, so everything a run still has to
+do is on its work and value stacks rather than in Python frames. A state
+holds those stacks, every variable (arrays included), the input lines
+not read yet and the output not taken yet, and refers to nodes by their
+offset in the program's image (image.py). It can only be resumed with
+the same program: `resume` checks the image's digest, and with
+`checkpoint(embed=True)` the image is part of the state, so no source is
+needed to resume it on another host.
+
+Output is kept until `take_output()`, and a state carries what has not
+been taken, so a run moved to another host keeps what it printed so far.
+`drive` prints the output before it saves each state, so a run resumed
+from the last state saved starts printing from there; only a crash
+between printing and saving prints some output twice.
+"""
+
+import array
+import hashlib
+import io
+import json
+import struct
+import zlib
+
+from . import image
+from .arrays import TYPECODES, Array
+from .stack_interpreter import StackInterpreter
+
+
+MAGIC = b'CFPS'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')  # magic, version, state bytes, image bytes
+
+# steps `run` takes between looks at the clock and the stop flag in `drive`
+CHUNK = 10000
+
+
+class ResumableInterpreter(StackInterpreter):
+    """A StackInterpreter that runs `tree` a budget of steps at a time.
+
+    A step is one `(handler, node)` pair off the work stack; `run(steps)`
+    only stops before a step that starts a statement.
+    """
+
+    def __init__(self, tree, inputs=(), stdout=None):
+        StackInterpreter.__init__(self, None, stdout, io.StringIO(''.join(line + '\n' for line in inputs)))
+        self.tree = tree
+        self.pending = []
+        self.steps = 0
+        self.image = None
+        self.offsets = None
+        self.boundaries = set(handler.__name__ for handler in self.statements.values())
+        self.boundaries.update(['exec_fallback', 'counted_step'])
+        if tree is not None:
+            self.push_statement(tree)
+
+    def write(self, text):
+        self.pending.append(text)
+
+    def take_output(self):
+        """The output printed since it was last taken."""
+        output = ''.join(self.pending)
+        self.pending = []
+        return output
+
+    def flush_output(self):
+        pending, self.pending = self.pending, []
+        # one write per OUTPUT, as the other interpreters do
+        for text in pending:
+            self.stdout.write(text)
+        self.stdout.flush()
+
+    def run(self, steps=None):
+        """Run to the end, or stop at the first statement after `steps` steps; True when done."""
+        work = self.work
+        if steps is None:
+            while work:
+                handler, item = work.pop()
+                self.steps += 1
+                handler(item)
+            return True
+        boundaries = self.boundaries
+        left = steps
+        while work:
+            handler, item = work[-1]
+            if left <= 0 and handler.__name__ in boundaries:
+                break
+            work.pop()
+            left -= 1
+            handler(item)
+        self.steps += steps - left
+        return not work
+
+    def program(self):
+        """(image, digest) of the tree, and the image offset of each of its nodes."""
+        if self.image is None:
+            encoder = image.Encoder()
+            self.image = encoder.encode(self.tree)
+            self.offsets = encoder.offsets
+        return self.image, hashlib.sha256(self.image).hexdigest()
+
+    def checkpoint(self, embed=False):
+        """The state of the run as bytes; between `run` calls only."""
+        data, digest = self.program()
+        arrays = []
+        array_index = {}
+
+        def pack(value):
+            if value is None or type(value) in (bool, int, float, str):
+                return value
+            if isinstance(value, Array):
+                index = array_index.get(id(value))
+                if index is None:
+                    index = array_index[id(value)] = len(arrays)
+                    arrays.append([value.data_type, value.data.tolist()])
+                return {'array': index}
+            if isinstance(value, tuple):
+                return {'tuple': [pack(part) for part in value]}
+            return {'node': self.offsets[id(value)]}
+
+        stdin = self.stdin.getvalue()[self.stdin.tell():]
+        state = {
+            'program': digest,
+            'work': [[handler.__name__, pack(item)] for handler, item in self.work],
+            'values': [pack(value) for value in self.values],
+            'scope': dict((name, pack(value)) for name, value in self.GLOBAL_SCOPE.items()),
+            'declared': self.DECLARED_VAR,
+            'arrays': arrays,
+            'input': stdin,
+            'output': ''.join(self.pending),
+            'steps': self.steps,
+        }
+        state = zlib.compress(json.dumps(state, separators=(',', ':')).encode('utf-8'))
+        if not embed:
+            data = b''
+        return HEADER.pack(MAGIC, VERSION, len(state), len(data)) + state + data
+
+    def restore(self, state, nodes):
+        """Load a state from `checkpoint`; `nodes` maps image offsets to nodes."""
+        arrays = [Array(data_type, data=array.array(TYPECODES[data_type], data))
+                  for data_type, data in state['arrays']]
+
+        def unpack(value):
+            if type(value) is dict:
+                if 'array' in value:
+                    return arrays[value['array']]
+                if 'tuple' in value:
+                    return tuple(unpack(part) for part in value['tuple'])
+                return nodes[value['node']]
+            return value
+
+        work = []
+        for name, item in state['work']:
+            if not name.startswith(('exec_', 'eval_', 'finish_', 'counted_')):
+                raise ValueError('Unknown step ' + repr(name) + ' in checkpoint')
+            work.append((getattr(self, name), unpack(item)))
+        self.work = work
+        self.values = [unpack(value) for value in state['values']]
+        self.GLOBAL_SCOPE = dict((name, unpack(value)) for name, value in state['scope'].items())
+        self.DECLARED_VAR = state['declared']
+        self.stdin = io.StringIO(state['input'])
+        self.pending = [state['output']] if state['output'] else []
+        self.steps = state['steps']
+
+
+def resume(state, tree=None, stdout=None):
+    """A ResumableInterpreter that carries on from `state`.
+
+    `tree` is the program the state was saved from, parsed again or
+    decoded from its image; it can be left out if the image is embedded.
+    """
+    magic, version, size, embedded = HEADER.unpack_from(state)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a CFPL checkpoint')
+    start = HEADER.size
+    fields = json.loads(zlib.decompress(state[start:start + size]).decode('utf-8'))
+    if embedded:
+        data = bytes(state[start + size:start + size + embedded])
+    elif tree is not None:
+        data = image.encode(tree)
+    else:
+        raise ValueError('The checkpoint has no program; pass the tree it was saved from')
+    if hashlib.sha256(data).hexdigest() != fields['program']:
+        raise ValueError('The checkpoint was saved from another program')
+    # run on a copy decoded from the image, whose nodes are at known offsets
+    decoder = image.Decoder(data)
+    try:
+        tree = decoder.decode()
+        nodes = decoder.objects[:len(decoder.words)]
+    finally:
+        decoder.release()
+    interpreter = ResumableInterpreter(None, stdout=stdout)
+    interpreter.tree = tree
+    interpreter.image = data
+    interpreter.offsets = dict((id(node), offset) for offset, node in enumerate(nodes) if node is not None)
+    try:
+        interpreter.restore(fields, nodes)
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError('Corrupt checkpoint: ' + repr(e))
+    return interpreter
+
+
+def save(path, state):
+    """Write `state` to `path` so that a crash leaves either the old or the new one."""
+    import os
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(state)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def drive(interpreter, path, every=1.0, stop=None, embed=False):
+    """Run to the end, printing the output and saving the state to `path` every `every` seconds.
+
+    If `stop()` turns true the state is saved and this returns False;
+    it returns True once the program is done.
+    """
+    import time
+    last = time.monotonic()
+    while not interpreter.run(CHUNK):
+        if stop is not None and stop():
+            interpreter.flush_output()
+            save(path, interpreter.checkpoint(embed))
+            return False
+        if time.monotonic() - last >= every:
+            interpreter.flush_output()
+            save(path, interpreter.checkpoint(embed))
+            last = time.monotonic()
+    interpreter.flush_output()
+    return True
+
+
+def main():
+    import argparse
+    import os
+    import signal
+    import sys
+    from .lexer import Lexer
+    from .parser import Parser
+    arg_parser = argparse.ArgumentParser(description='CFPL resumable runs')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run a program, saving its state as it goes')
+    run_parser.add_argument('file', help='CFPL source file')
+    resume_parser = commands.add_parser('resume', help='carry on from a saved state')
+    resume_parser.add_argument('from_state', metavar='STATE', help='state saved by run or resume')
+    resume_parser.add_argument('--program', help='the source file, if the state does not embed it')
+    for command in (run_parser, resume_parser):
+        command.add_argument('--state', help='where to save the state (default: STATE, or FILE.state)')
+        command.add_argument('--every', type=float, default=1.0, help='seconds between saved states')
+        command.add_argument('--embed', action='store_true', help='save the program image in the state')
+    args = arg_parser.parse_args()
+
+    if args.command == 'run':
+        tree = Parser(Lexer(open(args.file, 'r').read())).parse()
+        # input lines are read up front, so the unread ones go with the state
+        interpreter = ResumableInterpreter(tree, sys.stdin.read().splitlines(), sys.stdout)
+        path = args.state or args.file + '.state'
+    else:
+        tree = None
+        if args.program:
+            tree = Parser(Lexer(open(args.program, 'r').read())).parse()
+        with open(args.from_state, 'rb') as f:
+            try:
+                interpreter = resume(f.read(), tree, sys.stdout)
+            except ValueError as e:
+                sys.exit(str(e))
+        interpreter.flush_output()
+        path = args.state or args.from_state
+        # without --program the state has the image, and so will the next one
+        args.embed = args.embed or tree is None
+
+    # SIGTERM (preemption) saves the state at the next statement and exits with status 3
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    try:
+        done = drive(interpreter, path, args.every, lambda: stopping, args.embed)
+    except Exception as e:
+        interpreter.flush_output()
+        print(e)
+        sys.exit(1)
+    if not done:
+        sys.stderr.write('stopped after {} steps; resume with: python -m cfpl.checkpoint resume {}\n'.format(
+            interpreter.steps, path))
+        sys.exit(3)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 # Constant values
 # Copyright 2019 Art Layese <artiskool@gmail.com>
 
-from token import Token
+from .token import Token
 
 
 INT_CONST       = 'INT_CONST'
@@ -50,6 +50,7 @@ CHAR = 'CHAR'
 AND = 'AND'
 OR = 'OR'
 NOT = 'NOT'
+SUM = 'SUM'
 
 RESERVED_KEYWORDS = {
     'VAR': Token('VAR', 'VAR'),
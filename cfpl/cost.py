@@ -0,0 +1,368 @@
+# Static cost estimates
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Guess how long a parsed program runs before running it.
+
+    >>> estimator = Estimator()
+    >>> found = features(tree)
+    >>> estimator.lane(found)                  # 'fast' or 'slow'
+    >>> estimator.observe(found, seconds)      # once the run is measured
+
+`features(tree)` walks a Program without running it. Every statement and
+condition counts its expression nodes (a whole array counts its length)
+as `work`, OUTPUT counts its items as `output`, and both are multiplied
+by the passes of each WHILE around them. A WHILE that counts an INT from
+a known constant towards a constant limit by a constant step runs a
+known number of passes; any other is assumed to run ASSUMED_TRIPS. A
+WHILE whose condition reads no variable its body assigns, or whose
+counter steps away from its limit, can only stop by not starting, so it
+is counted as `unbounded` and such programs always go to the slow lane.
+
+`Estimator` turns the features into seconds with one coefficient per
+feature, starting from PRIOR and refitted to the measured runs it is
+shown, and remembers the measured time of recent programs, which beats
+any estimate the next time the same program comes in.
+"""
+
+import collections
+
+from .constants import GREATER_EQUAL, GREATER_THAN, INT, LESSER_EQUAL, LESSER_THAN, MINUS, PLUS
+from .ast import (
+    Assign, BinOp, CountedLoop, Compound, IfStatement, Increment, Input, NoOp, Num, Output, Program, UnaryOp,
+    Var, WhileStatement, walk,
+)
+from .optimizer import FLIPPED, assigned_names, read_names
+
+
+# passes assumed for a loop whose trip count is unknown
+ASSUMED_TRIPS = 20
+# trip count of a counter loop that steps away from its limit
+UNBOUNDED = -1
+# seconds per unit of each feature; `base` is per run
+PRIOR = {'base': 2e-5, 'work': 3.5e-7, 'output': 1e-6}
+# predicted seconds above which a program is slow
+SLOW_SECONDS = 0.01
+# weight of the prior when refitting, in measured runs
+RIDGE = 4.0
+# runs faster than this are timed no more precisely than this
+MIN_SECONDS = 1e-4
+
+
+def array_sizes(tree):
+    """{name: length} of the arrays declared with a constant size."""
+    sizes = {}
+    for declaration in tree.block.declarations:
+        var = declaration.var_node
+        if isinstance(var.size, Num) and isinstance(var.size.value, int):
+            sizes[var.value] = var.size.value
+    return sizes
+
+
+def expression_size(node, arrays):
+    """Nodes evaluated for `node`, where a whole array costs its length."""
+    size = 0
+    for child in walk(node):
+        size += 1
+        if type(child) is Var and child.value in arrays:
+            size += arrays[child.value]
+    return size
+
+
+def statements(node):
+    """The statements of a block, or the node itself if it is one."""
+    if isinstance(node, list):
+        return node
+    if type(node) is Compound:
+        return node.children
+    return [node]
+
+
+def int_constant(node):
+    """The value of an INT literal, signed (`-5` parses as a UnaryOp), else None."""
+    if type(node) is Num and type(node.value) is int:
+        return node.value
+    if type(node) is UnaryOp and node.op.type in (PLUS, MINUS):
+        value = int_constant(node.expr)
+        if value is not None and node.op.type == MINUS:
+            return -value
+        return value
+    return None
+
+
+def constant_store(statement):
+    """(name, value) if `statement` is `name = <INT constant>`, else None."""
+    if type(statement) is Assign and type(statement.left) is Var:
+        value = int_constant(statement.right)
+        if value is not None:
+            return statement.left.value, value
+    return None
+
+
+def counter_step(body, name, assigned):
+    """The step of the one `name = (name + step)` a loop body runs per pass, if that is its only store.
+
+    `assigned` is assigned_names(body).
+    """
+    if assigned[name] != 1:
+        return None
+    for statement in statements(body):
+        if type(statement) is Increment and statement.value == name:
+            return statement.step
+        if type(statement) is Assign and type(statement.left) is Var and statement.left.value == name:
+            right = statement.right
+            if type(right) is BinOp and right.op.type in (PLUS, MINUS) and type(right.left) is Var and \
+                    right.left.value == name and int_constant(right.right) is not None:
+                step = int_constant(right.right)
+                return step if right.op.type == PLUS else -step
+    return None
+
+
+def passes(start, end, step, comparison):
+    """How often `counter <comparison> end` holds for counter = start, start + step, ..."""
+    if comparison == LESSER_EQUAL:
+        end, comparison = end + 1, LESSER_THAN
+    elif comparison == GREATER_EQUAL:
+        end, comparison = end - 1, GREATER_THAN
+    if comparison == GREATER_THAN:
+        start, end, step = -start, -end, -step
+    elif comparison != LESSER_THAN:
+        return None
+    if start >= end:
+        return 0
+    if step <= 0:
+        return UNBOUNDED
+    return -(-(end - start) // step)
+
+
+def trip_count(loop, constants, assigned):
+    """Passes of a WHILE counting an INT towards a limit, UNBOUNDED, or None if unknown.
+
+    `constants` are the INT variables known to hold a constant when the
+    loop starts: the counter must be one, and so must the limit, unless
+    it is a constant itself. `assigned` is assigned_names(loop.value).
+    """
+    expr = loop.expr
+    if type(expr) is not BinOp or expr.op.type not in FLIPPED:
+        return None
+    for counter, limit, comparison in ((expr.left, expr.right, expr.op.type),
+                                       (expr.right, expr.left, FLIPPED[expr.op.type])):
+        if type(counter) is not Var or counter.value not in constants:
+            continue
+        step = counter_step(loop.value, counter.value, assigned)
+        if step is None:
+            continue
+        end = int_constant(limit)
+        if end is None and type(limit) is Var and not assigned[limit.value]:
+            end = constants.get(limit.value)
+        if type(end) is not int:
+            return None
+        return passes(constants[counter.value], end, step, comparison)
+    return None
+
+
+def features(tree):
+    """Static features of a parsed Program (see the module docstring)."""
+    found = collections.Counter(work=0, output=0, loops=0, depth=0, unbounded=0, nodes=0)
+    if not isinstance(tree, Program):
+        return found
+    arrays = array_sizes(tree)
+    defaults = {}
+    for declaration in tree.block.declarations:
+        store = declaration.var_node.default_value
+        if declaration.type_node.value == INT and declaration.var_node.size is None:
+            # a default that is not a literal leaves the variable unknown
+            value = 0 if store is None else int_constant(store)
+            if value is not None:
+                defaults[declaration.var_node.value] = value
+    # blocks still to count: (statements, runs of each, loop depth, known constants)
+    todo = [(statements(tree.block.compound_statement), 1, 0, defaults)]
+    while todo:
+        block, weight, depth, constants = todo.pop()
+        for node in block:
+            kind = type(node)
+            if kind is Compound:
+                todo.append((node.children, weight, depth, dict(constants)))
+            elif kind is WhileStatement or kind is CountedLoop:
+                found['loops'] += 1
+                found['depth'] = max(found['depth'], depth + 1)
+                assigned = assigned_names(node.value)
+                trips = trip_count(node, constants, assigned)
+                if trips == UNBOUNDED or (kind is WhileStatement and not read_names(node.expr) & set(assigned)):
+                    found['unbounded'] += 1
+                if trips is None or trips == UNBOUNDED:
+                    trips = ASSUMED_TRIPS
+                # the condition is tested once more than the body runs
+                size = expression_size(node.expr, arrays)
+                found['nodes'] += size
+                found['work'] += weight * (trips + 1) * size
+                inside = dict((name, value) for name, value in constants.items() if not assigned[name])
+                todo.append((statements(node.value), weight * trips, depth + 1, inside))
+                for name in assigned:
+                    constants.pop(name, None)
+                continue
+            elif kind is IfStatement:
+                size = expression_size(node.expr, arrays)
+                found['nodes'] += size
+                found['work'] += weight * size
+                # either branch may run, so count both
+                todo.append((statements(node.value), weight, depth, dict(constants)))
+                if node.els is not None:
+                    todo.append((statements(node.els), weight, depth, dict(constants)))
+            elif kind is Output:
+                size = 0
+                for item in node.value:
+                    size += expression_size(item, arrays)
+                found['nodes'] += size
+                found['work'] += weight * size
+                found['output'] += weight * len(node.value)
+            elif kind is Input:
+                found['nodes'] += 1
+                found['work'] += weight * len(node.value)
+            elif kind is not NoOp:
+                size = expression_size(node, arrays)
+                found['nodes'] += size
+                found['work'] += weight * size
+            # what the next statement can rely on
+            store = constant_store(node)
+            if store is not None:
+                constants[store[0]] = store[1]
+            else:
+                for name in assigned_names(node):
+                    constants.pop(name, None)
+    return found
+
+
+def solve(matrix, vector):
+    """Solve the square system `matrix * x = vector` by Gaussian elimination."""
+    n = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(n)]
+    for column in range(n):
+        pivot = max(range(column, n), key=lambda row: abs(rows[row][column]))
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(column + 1, n):
+            factor = rows[row][column] / rows[column][column]
+            for k in range(column, n + 1):
+                rows[row][k] -= factor * rows[column][k]
+    x = [0.0] * n
+    for row in reversed(range(n)):
+        x[row] = (rows[row][n] - sum(rows[row][k] * x[k] for k in range(row + 1, n))) / rows[row][row]
+    return x
+
+
+class Estimator(object):
+    """Predicts run time from `features` and learns from measured runs.
+
+    The coefficients are a least-squares fit of the relative error of
+    the observed runs, so a 1 ms program counts as much as a 1 s one,
+    pulled towards PRIOR as if RIDGE runs had matched it exactly. Older
+    runs fade by `decay` per new one, which lets the fit follow a
+    machine that gets busier.
+
+    `history` keeps the last measured seconds of up to `history_size`
+    programs; `stats` counts the lane decisions and how many of the
+    observed runs were on the wrong side of the threshold.
+
+    Not thread-safe; callers that share one hold a lock around it.
+    """
+
+    FEATURES = ('base', 'work', 'output')
+
+    def __init__(self, threshold=SLOW_SECONDS, history_size=1024, decay=0.99, prior=None):
+        self.threshold = threshold
+        self.history_size = history_size
+        self.decay = decay
+        self.prior = dict(PRIOR if prior is None else prior)
+        self.coefficients = dict(self.prior)
+        n = len(self.FEATURES)
+        self.xx = [[0.0] * n for i in range(n)]
+        self.xy = [0.0] * n
+        self.history = collections.OrderedDict()
+        self.stats = collections.Counter()
+
+    def vector(self, found):
+        # in units of the prior, so every prior coefficient is 1
+        values = {'base': 1, 'work': found['work'], 'output': found['output']}
+        return [values[name] * self.prior[name] for name in self.FEATURES]
+
+    def seconds(self, found, program=None):
+        """Predicted seconds for a program with features `found`."""
+        if program is not None and program in self.history:
+            self.history.move_to_end(program)
+            return self.history[program]
+        return sum(self.coefficients[name] / self.prior[name] * value
+                   for name, value in zip(self.FEATURES, self.vector(found)))
+
+    def lane(self, found, program=None):
+        """'slow' or 'fast', for the worker lane the program should run in."""
+        measured = program is not None and program in self.history
+        if found['unbounded'] and not measured:
+            lane = 'slow'
+        else:
+            lane = 'slow' if self.seconds(found, program) > self.threshold else 'fast'
+        self.stats[lane] += 1
+        return lane
+
+    def observe(self, found, seconds, program=None):
+        """Feed back the measured `seconds` of a run and refit."""
+        slow = found['unbounded'] or self.seconds(found) > self.threshold
+        predicted = 'slow' if slow else 'fast'
+        actual = 'slow' if seconds > self.threshold else 'fast'
+        self.stats['observed'] += 1
+        if predicted != actual:
+            self.stats['mispredicted_' + actual] += 1
+        if program is not None:
+            self.history[program] = seconds
+            self.history.move_to_end(program)
+            while len(self.history) > self.history_size:
+                self.history.popitem(last=False)
+        if found['unbounded']:
+            return  # ASSUMED_TRIPS says nothing about these, keep them out of the fit
+        # divided by the run time, so the fit minimizes relative error
+        seconds = max(seconds, MIN_SECONDS)
+        x = [value / seconds for value in self.vector(found)]
+        n = len(x)
+        for i in range(n):
+            self.xy[i] = self.xy[i] * self.decay + x[i]
+            for j in range(n):
+                self.xx[i][j] = self.xx[i][j] * self.decay + x[i] * x[j]
+        # ridge towards the prior, whose weights are all 1 in these units
+        matrix = [[self.xx[i][j] + (RIDGE if i == j else 0.0) for j in range(n)] for i in range(n)]
+        weights = solve(matrix, [self.xy[i] + RIDGE for i in range(n)])
+        for name, weight in zip(self.FEATURES, weights):
+            # a negative cost per unit is noise, keep a sliver of the prior
+            self.coefficients[name] = max(weight, 0.01) * self.prior[name]
+
+
+def main():
+    import argparse
+    import sys
+    import time
+    from .lexer import Lexer
+    from .parser import Parser
+    from .interpreter import Interpreter
+    arg_parser = argparse.ArgumentParser(description='CFPL static cost estimate')
+    arg_parser.add_argument('file', help='CFPL source files', nargs='+')
+    arg_parser.add_argument('--run', action='store_true',
+                            help='also run each program (output discarded) and show the measured time')
+    args = arg_parser.parse_args()
+
+    estimator = Estimator()
+    print('file,work,output,loops,depth,unbounded,estimate_ms,lane' + (',measured_ms' if args.run else ''))
+    for path in args.file:
+        tree = Parser(Lexer(open(path, 'r').read())).parse()
+        found = features(tree)
+        row = [path] + [str(found[name]) for name in ('work', 'output', 'loops', 'depth', 'unbounded')]
+        row += ['{:.3f}'.format(estimator.seconds(found) * 1000), estimator.lane(found)]
+        if args.run:
+            import io
+            start = time.perf_counter()
+            try:
+                Interpreter(None, stdout=io.StringIO(), stdin=sys.stdin).visit(tree)
+            except Exception:
+                pass
+            row.append('{:.3f}'.format((time.perf_counter() - start) * 1000))
+        print(','.join(row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+# Debugger and tracing hooks
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+from .ast import Index
+from .arrays import Array, show
+
+
+TRACED_CLASSES = {}
+
+
+class Traced(object):
+    """Hook calls shared by the instrumented engines.
+
+    These mixins are only ever part of the class of an interpreter while a
+    Debugger is attached to it; every method reads the debugger and the
+    plain `base` class before calling out, so a hook may detach halfway.
+    """
+
+    def assign_var_value(self, name, value):
+        debugger, base = self.debugger, type(self).base
+        value = base.assign_var_value(self, name, value)
+        debugger.assigned(self, name, value)
+        return value
+
+    def visit_Increment(self, node):
+        debugger, base = self.debugger, type(self).base
+        base.visit_Increment(self, node)
+        debugger.assigned(self, node.value, self.GLOBAL_SCOPE[node.value])
+
+    def output_text(self, node):
+        # OUTPUT only: INPUT prompts are written too, but not through here
+        debugger, base = self.debugger, type(self).base
+        text = base.output_text(self, node)
+        debugger.output(self, text)
+        return text
+
+
+class TracedVisitor(Traced):
+    """Recursive engines: every statement goes through `visit`."""
+
+    def visit(self, node):
+        debugger, base = self.debugger, type(self).base
+        if hasattr(node, 'line'):
+            debugger.statement(self, node)
+        return base.visit(self, node)
+
+    def visit_Assign(self, node):
+        debugger, base = self.debugger, type(self).base
+        result = base.visit_Assign(self, node)
+        if isinstance(node.left, Index):
+            debugger.assigned(self, node.left.value, self.GLOBAL_SCOPE[node.left.value])
+        return result
+
+
+class TracedStack(Traced):
+    """Explicit-stack engines: every statement is pushed by `push_statement`."""
+
+    def push_statement(self, node):
+        if hasattr(node, 'line'):
+            self.work.append((self.trace_statement, node))
+        else:
+            type(self).base.push_statement(self, node)
+
+    def trace_statement(self, node):
+        self.debugger.statement(self, node)
+        handler = self.statements.get(type(node))
+        if handler is None:
+            handler = self.exec_fallback
+        handler(node)
+
+    def exec_increment(self, node):
+        debugger, base = self.debugger, type(self).base
+        base.exec_increment(self, node)
+        debugger.assigned(self, node.value, self.GLOBAL_SCOPE[node.value])
+
+    def finish_assign_index(self, node):
+        debugger, base = self.debugger, type(self).base
+        base.finish_assign_index(self, node)
+        debugger.assigned(self, node.left.value, self.GLOBAL_SCOPE[node.left.value])
+
+    def retrace(self, traced):
+        """Switch statements already waiting on the work stack to or from tracing."""
+        work = self.work
+        for position, (handler, node) in enumerate(work):
+            if not hasattr(node, 'line'):
+                continue
+            plain = self.statements.get(type(node), self.exec_fallback)
+            if traced and handler == plain:
+                work[position] = (self.trace_statement, node)
+            elif not traced and handler == self.trace_statement:
+                work[position] = (plain, node)
+
+
+def traced(cls):
+    """The instrumented subclass of an engine class, created once per class."""
+    result = TRACED_CLASSES.get(cls)
+    if result is None:
+        mixin = TracedStack if hasattr(cls, 'push_statement') else TracedVisitor
+        result = type('Traced' + cls.__name__, (mixin, cls), {'base': cls})
+        TRACED_CLASSES[cls] = result
+    return result
+
+
+class Debugger(object):
+    """Breakpoints, single-stepping, watches and tracing callbacks.
+
+    Hooks are plain callables, registered with the `on_*` methods:
+
+        on_statement(interpreter, node)        before every statement
+        on_assign(interpreter, name, value)    after every variable or array element store
+        on_output(interpreter, text)           for every OUTPUT line
+        on_break(interpreter, node)            before a statement on a breakpoint line,
+                                               or the next one after `step()`
+        on_watch(interpreter, name, old, new)  when a watched variable changes
+
+    `attach` swaps the interpreter's class for an instrumented subclass
+    and `detach` swaps it back, at any point of a run (from a hook, a
+    signal handler or another thread), so interpreters that are not being
+    debugged run the plain engine with no hook checks at all.
+    """
+
+    def __init__(self):
+        self.breakpoints = set()
+        self.watches = {}
+        self.statement_hooks = []
+        self.assign_hooks = []
+        self.output_hooks = []
+        self.break_hooks = []
+        self.watch_hooks = []
+        self.stepping = False
+        self.interpreter = None
+
+    def on_statement(self, hook):
+        self.statement_hooks.append(hook)
+        return hook
+
+    def on_assign(self, hook):
+        self.assign_hooks.append(hook)
+        return hook
+
+    def on_output(self, hook):
+        self.output_hooks.append(hook)
+        return hook
+
+    def on_break(self, hook):
+        self.break_hooks.append(hook)
+        return hook
+
+    def on_watch(self, hook):
+        self.watch_hooks.append(hook)
+        return hook
+
+    def break_at(self, line):
+        self.breakpoints.add(line)
+
+    def clear(self, line):
+        self.breakpoints.discard(line)
+
+    def watch(self, name):
+        scope = self.interpreter.GLOBAL_SCOPE if self.interpreter is not None else {}
+        self.watches[name] = self.snapshot(scope.get(name))
+
+    def step(self):
+        """Break before the next statement."""
+        self.stepping = True
+
+    def attach(self, interpreter):
+        if self.interpreter is not None:
+            raise Exception('Debugger is already attached')
+        if not hasattr(interpreter, '__dict__'):
+            # a native class of the mypyc build (see native.py)
+            raise Exception('Cannot debug a compiled ' + type(interpreter).__name__)
+        interpreter.debugger = self
+        if hasattr(interpreter, 'deoptimize'):
+            interpreter.deoptimize()
+        interpreter.__class__ = traced(type(interpreter))
+        self.interpreter = interpreter
+        if hasattr(interpreter, 'retrace'):
+            interpreter.retrace(True)
+        for name in self.watches:
+            self.watches[name] = self.snapshot(interpreter.GLOBAL_SCOPE.get(name))
+        return interpreter
+
+    def detach(self):
+        interpreter = self.interpreter
+        if interpreter is None:
+            return
+        if hasattr(interpreter, 'retrace'):
+            interpreter.retrace(False)
+        interpreter.__class__ = type(interpreter).base
+        if hasattr(interpreter, 'deoptimize'):
+            interpreter.deoptimize()
+        del interpreter.debugger
+        self.interpreter = None
+
+    def snapshot(self, value):
+        # arrays change in place, so compare their contents
+        return str(value) if isinstance(value, Array) else value
+
+    def statement(self, interpreter, node):
+        for hook in self.statement_hooks:
+            hook(interpreter, node)
+        if self.stepping or node.line in self.breakpoints:
+            self.stepping = False
+            for hook in self.break_hooks:
+                hook(interpreter, node)
+
+    def assigned(self, interpreter, name, value):
+        for hook in self.assign_hooks:
+            hook(interpreter, name, value)
+        if name in self.watches:
+            old = self.watches[name]
+            new = self.snapshot(value)
+            if old != new:
+                self.watches[name] = new
+                for hook in self.watch_hooks:
+                    hook(interpreter, name, old, new)
+
+    def output(self, interpreter, text):
+        for hook in self.output_hooks:
+            hook(interpreter, text)
+
+
+COMMANDS = """s(tep)            run to the next statement
+c(ontinue)        run to the next breakpoint
+b(reak) LINE      set a breakpoint
+cl(ear) LINE      remove a breakpoint
+w(atch) NAME      report changes of a variable
+p(rint) NAME      show a variable
+d(etach)          run the rest of the program without the debugger
+q(uit)            stop the program"""
+
+
+def main():
+    import argparse
+    from .lexer import Lexer
+    from .parser import Parser
+    from .interpreter import Interpreter
+    arg_parser = argparse.ArgumentParser(description='CFPL debugger')
+    arg_parser.add_argument('file')
+    arg_parser.add_argument('--engine', choices=['recursive', 'stack'], default='recursive')
+    arg_parser.add_argument('--break', dest='breakpoints', type=int, action='append', default=[],
+                            metavar='LINE', help='stop before the statement on LINE')
+    arg_parser.add_argument('--watch', action='append', default=[], metavar='NAME',
+                            help='report every change of variable NAME')
+    arg_parser.add_argument('--trace', action='store_true', help='print every statement and store')
+    args = arg_parser.parse_args()
+    text = open(args.file, 'r').read()
+    lines = text.split('\n')
+
+    parser = Parser(Lexer(text))
+    if args.engine == 'stack':
+        from .stack_interpreter import StackInterpreter
+        interpreter = StackInterpreter(parser)
+    else:
+        interpreter = Interpreter(parser)
+    debugger = Debugger()
+    for line in args.breakpoints:
+        debugger.break_at(line)
+    for name in args.watch:
+        debugger.watch(name)
+    if not args.breakpoints and not args.trace:
+        debugger.step()
+
+    def where(node):
+        return 'line ' + str(node.line) + ': ' + lines[node.line - 1].strip()
+
+    @debugger.on_watch
+    def changed(interpreter, name, old, new):
+        print('  ' + name + ': ' + show(old) + ' -> ' + show(new))
+
+    @debugger.on_break
+    def prompt(interpreter, node):
+        print('> ' + where(node))
+        while True:
+            try:
+                command = input('(cfpl) ').split()
+            except EOFError:
+                command = ['q']
+            if not command or command[0] in ('s', 'step'):
+                debugger.step()
+                return
+            name, argument = command[0], command[1] if len(command) > 1 else None
+            if name in ('c', 'continue'):
+                return
+            elif name in ('d', 'detach'):
+                debugger.detach()
+                return
+            elif name in ('q', 'quit'):
+                raise SystemExit(0)
+            elif name in ('b', 'break') and argument and argument.isdigit():
+                debugger.break_at(int(argument))
+            elif name in ('cl', 'clear') and argument and argument.isdigit():
+                debugger.clear(int(argument))
+            elif name in ('w', 'watch') and argument:
+                debugger.watch(argument)
+            elif name in ('p', 'print') and argument:
+                print('  ' + argument + ' = ' + show(interpreter.GLOBAL_SCOPE.get(argument)))
+            else:
+                print(COMMANDS)
+
+    if args.trace:
+        debugger.on_statement(lambda interpreter, node: print('  ' + where(node)))
+        debugger.on_assign(lambda interpreter, name, value: print('  ' + name + ' = ' + show(value)))
+
+    debugger.attach(interpreter)
+    try:
+        interpreter.interpret()
+    except Exception as e:
+        print(e)
+
+
+if __name__ == '__main__':
+    main()
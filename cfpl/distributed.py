@@ -0,0 +1,470 @@
+# Distributed runner
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Run programs x input cases on workers spread over any number of hosts.
+
+    coordinator$  python -m cfpl.distributed coordinator --port 7070 --cases cases.json tests/*.txt
+    each worker$  python -m cfpl.distributed worker --connect coordinator-host:7070
+    one box$      python -m cfpl.distributed local --workers 4 --cases cases.json tests/*.txt
+
+The coordinator turns every (program, input case) pair into a task on a
+work queue. Workers connect over TCP, pull batches of tasks, run each one
+with server.execute (the usual Lexer, Parser and Interpreter, with the
+same limits) and send every result back as soon as it is ready. Messages
+are server.py frames:
+
+    worker       {'op': 'pull', 'worker': NAME, 'max': N}
+    coordinator  {'op': 'batch', 'tasks': [{'task', 'program', 'inputs', 'limits'}, ...],
+                  'programs': {program id: source}}   (sources the worker lacks)
+                 {'op': 'wait'}                       (nothing to do yet, pull again)
+                 {'op': 'done'}                       (shutting down)
+    worker       {'op': 'result', 'task': ID, 'response': {...}}
+    coordinator  {'op': 'ack', 'duplicate': BOOL}
+
+Tasks of a worker whose connection drops go back on the queue, up to
+`max_attempts` dispatches per task. Once the queue is empty, idle
+workers also get copies of tasks that have been running for much longer
+than runs usually take (stragglers). Whichever copy answers first is
+the result; later ones are counted as duplicates and dropped.
+
+A worker runs its batch in order, so a task starts when the result
+before it on the same connection comes back (the first one when the
+batch is sent). Run times, and how long a task has been running, count
+from then; a task still waiting behind a straggler is as late as that
+straggler. Every task has a timeout, so one that never stops cannot
+hold a worker forever.
+"""
+
+import collections
+import os
+import socket
+import socketserver
+import statistics
+import threading
+import time
+
+from .server import DEFAULT_TIMEOUT, TCPServer, execute, program_id, recv_message, send_message
+
+
+BATCH_SIZE = 8
+MAX_ATTEMPTS = 3
+# copies of one task that may run at the same time
+MAX_COPIES = 2
+# a task is a straggler once out this many times the median run...
+STRAGGLER_FACTOR = 4.0
+# ...but never before this many seconds, or this many before any task is back
+STRAGGLER_MIN = 0.5
+STRAGGLER_FIRST = 5.0
+# seconds a pull waits for work before the coordinator answers 'wait'
+POLL = 0.25
+
+
+class Task(object):
+    def __init__(self, task, program, inputs, limits):
+        self.task = task
+        self.program = program
+        self.inputs = list(inputs)
+        self.limits = limits or {}
+        self.dispatches = 0
+        self.running = set()  # peers it was sent to
+
+
+class Peer(object):
+    """One worker connection, as the coordinator sees it."""
+
+    def __init__(self, name):
+        self.name = name
+        self.sent = set()  # program ids whose source it has
+        self.running = collections.deque()  # task ids it holds, in the order it runs them
+        self.started = None  # when it started the first of them
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        coordinator = self.server.coordinator
+        peer = Peer('{}:{}'.format(*self.client_address[:2]))
+        try:
+            while True:
+                message = recv_message(self.request)
+                if message is None:
+                    break
+                if not isinstance(message, dict):
+                    message = {}  # answered like an unknown op
+                op = message.get('op')
+                if op == 'pull':
+                    peer.name = message.get('worker') or peer.name
+                    reply = coordinator.take(peer, message.get('max', 1))
+                elif op == 'result':
+                    reply = coordinator.complete(peer, message.get('task'), message.get('response'))
+                else:
+                    reply = {'op': 'error', 'error': 'Unknown op ' + repr(op)}
+                send_message(self.request, reply)
+                if reply['op'] == 'done':
+                    break
+        except (ValueError, OSError):
+            pass
+        finally:
+            coordinator.lost(peer)
+
+
+class Coordinator(object):
+    """Work queue of (program, input case) tasks served to pulling workers.
+
+    `address` is the `(host, port)` to listen on; port 0 picks a free one,
+    and `address` holds the real one after `start()`. `on_result(task,
+    response)` is called from a connection thread with the first result
+    of every task. Responses are those of server.execute plus the
+    `worker` that ran the task and the `attempts` it took; a task that
+    lost its worker `max_attempts` times gets an error response.
+
+    `straggler_after` fixes the seconds after which a task is copied to
+    an idle worker; by default it follows the measured run times.
+    `timeout` is the limit of tasks submitted without one (None: none).
+    """
+
+    def __init__(self, address=('127.0.0.1', 0), max_attempts=MAX_ATTEMPTS, straggler_after=None,
+                 on_result=None, timeout=DEFAULT_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.straggler_after = straggler_after
+        self.on_result = on_result
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.tasks = {}
+        self.pending = collections.deque()
+        self.running = set()
+        self.sources = {}
+        self.results = {}
+        self.durations = collections.deque(maxlen=100)
+        self.stats = collections.Counter()
+        self.closing = False
+        self.server = None
+
+    def start(self):
+        self.server = TCPServer(tuple(self.address), Handler)
+        self.server.coordinator = self
+        self.address = self.server.server_address[:2]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def submit(self, sources, cases=((),), limits=None):
+        """Queue every source with every input case; returns the task ids, program by program."""
+        ids = []
+        limits = dict(limits or {})
+        if not limits.get('timeout'):
+            limits['timeout'] = self.timeout
+        with self.lock:
+            for source in sources:
+                program = program_id(source)
+                self.sources[program] = source
+                for inputs in cases:
+                    task = Task(len(self.tasks), program, inputs, limits)
+                    self.tasks[task.task] = task
+                    self.pending.append(task.task)
+                    ids.append(task.task)
+            self.changed.notify_all()
+        return ids
+
+    def wait(self, timeout=None):
+        """Block until every submitted task has a result; False if `timeout` ran out first."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.lock:
+            while len(self.results) < len(self.tasks):
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.changed.wait(remaining)
+        return True
+
+    def shutdown(self):
+        """Tell pulling workers to stop and close the listening socket."""
+        with self.lock:
+            self.closing = True
+            self.changed.notify_all()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def straggling(self):
+        """Seconds after which a task still out counts as a straggler."""
+        if self.straggler_after is not None:
+            return self.straggler_after
+        if not self.durations:
+            return STRAGGLER_FIRST
+        return max(STRAGGLER_MIN, STRAGGLER_FACTOR * statistics.median(self.durations))
+
+    def ready(self, peer, count, now):
+        batch = []
+        while self.pending and len(batch) < count:
+            task = self.tasks[self.pending.popleft()]
+            if task.task not in self.results:
+                batch.append(task)
+        if batch:
+            return batch
+        # nothing queued: copy the longest-running stragglers to this worker;
+        # a copy runs, or waits behind, the task its worker started at `started`
+        limit = self.straggling()
+        late = []
+        for task_id in self.running:
+            task = self.tasks[task_id]
+            if peer not in task.running and len(task.running) < MAX_COPIES and \
+                    task.running and now - min(holder.started for holder in task.running) > limit:
+                late.append(task)
+        late.sort(key=lambda task: min(holder.started for holder in task.running))
+        self.stats['speculative'] += len(late[:count])
+        return late[:count]
+
+    def take(self, peer, count):
+        """Answer a pull: a batch of up to `count` tasks, 'wait' or 'done'."""
+        deadline = time.perf_counter() + POLL
+        with self.lock:
+            while True:
+                if self.closing:
+                    return {'op': 'done'}
+                now = time.perf_counter()
+                batch = self.ready(peer, count, now)
+                if batch:
+                    break
+                if now >= deadline:
+                    return {'op': 'wait'}
+                self.changed.wait(deadline - now)
+            programs = {}
+            if not peer.running:
+                peer.started = now
+            for task in batch:
+                task.dispatches += 1
+                task.running.add(peer)
+                peer.running.append(task.task)
+                self.running.add(task.task)
+                if task.program not in peer.sent:
+                    peer.sent.add(task.program)
+                    programs[task.program] = self.sources[task.program]
+            self.stats['dispatched'] += len(batch)
+        return {
+            'op': 'batch',
+            'tasks': [{'task': task.task, 'program': task.program, 'inputs': task.inputs, 'limits': task.limits}
+                      for task in batch],
+            'programs': programs,
+        }
+
+    def finish(self, task, response):
+        # with the lock held
+        response['attempts'] = task.dispatches
+        self.results[task.task] = response
+        self.running.discard(task.task)
+        self.changed.notify_all()
+
+    def complete(self, peer, task_id, response):
+        """Record a worker's result, unless another copy of the task got there first."""
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None or not isinstance(response, dict):
+                return {'op': 'error', 'error': 'Unknown task ' + repr(task_id)}
+            now = time.perf_counter()
+            task.running.discard(peer)
+            started = None
+            if peer.running and peer.running[0] == task_id:
+                started = peer.started
+                peer.running.popleft()
+            elif task_id in peer.running:
+                peer.running.remove(task_id)
+            peer.started = now  # the worker goes on with its next task
+            if task_id in self.results:
+                self.stats['duplicates'] += 1
+                return {'op': 'ack', 'duplicate': True}
+            if started is not None:
+                self.durations.append(now - started)
+            response['worker'] = peer.name
+            self.finish(task, response)
+            self.stats['completed'] += 1
+        if self.on_result is not None:
+            self.on_result(task, response)
+        return {'op': 'ack', 'duplicate': False}
+
+    def lost(self, peer):
+        """Requeue the tasks of a worker that went away, or give up on them."""
+        failed = []
+        with self.lock:
+            for task_id in peer.running:
+                task = self.tasks[task_id]
+                task.running.discard(peer)
+                if task_id in self.results or task.running:
+                    continue
+                self.running.discard(task_id)
+                if task.dispatches >= self.max_attempts:
+                    response = {'ok': False, 'output': '', 'timings': {}, 'worker': None,
+                                'error': 'Gave up after ' + str(task.dispatches) + ' attempts'}
+                    self.finish(task, response)
+                    self.stats['failed'] += 1
+                    failed.append((task, response))
+                else:
+                    self.pending.appendleft(task_id)
+                    self.stats['retried'] += 1
+            peer.running.clear()
+            self.changed.notify_all()
+        if self.on_result is not None:
+            for task, response in failed:
+                self.on_result(task, response)
+
+
+class Worker(object):
+    """Pulls batches from a Coordinator, runs them and streams the results back.
+
+    Keeps trying to connect for `connect_timeout` seconds, so workers can
+    be started before the coordinator. `run()` returns once the
+    coordinator says it is done or goes away.
+    """
+
+    def __init__(self, address, name=None, batch_size=BATCH_SIZE, connect_timeout=10.0):
+        self.address = tuple(address)
+        self.name = name or '{}:{}'.format(socket.gethostname(), os.getpid())
+        self.batch_size = batch_size
+        self.connect_timeout = connect_timeout
+        self.stats = collections.Counter()
+
+    def connect(self):
+        deadline = time.perf_counter() + self.connect_timeout
+        while True:
+            try:
+                return socket.create_connection(self.address)
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    def exchange(self, sock, message):
+        """Send `message` and return the reply, or None if the coordinator went away."""
+        try:
+            send_message(sock, message)
+            return recv_message(sock)
+        except (ValueError, OSError):
+            return None
+
+    def run(self):
+        sock = self.connect()
+        sources = {}
+        trees = collections.OrderedDict()  # parsed programs, as in server.worker_loop
+        try:
+            while True:
+                reply = self.exchange(sock, {'op': 'pull', 'worker': self.name, 'max': self.batch_size})
+                if reply is None or reply['op'] == 'done':
+                    break
+                if reply['op'] != 'batch':
+                    continue
+                sources.update(reply['programs'])
+                for task in reply['tasks']:
+                    # execute() reports a program's errors in the response
+                    response = execute(sources[task['program']], task['inputs'], task['limits'],
+                                       trees=trees, program=task['program'])
+                    if self.exchange(sock, {'op': 'result', 'task': task['task'], 'response': response}) is None:
+                        return
+                    self.stats['run'] += 1
+        finally:
+            sock.close()
+
+
+def run_worker(address, name=None, batch_size=BATCH_SIZE):
+    Worker(address, name, batch_size).run()
+
+
+def start_workers(address, count, batch_size=BATCH_SIZE):
+    """Start `count` local worker processes for the coordinator at `address`."""
+    import multiprocessing
+    context = multiprocessing.get_context('fork')
+    processes = []
+    for i in range(count):
+        process = context.Process(target=run_worker, args=(address, 'local-' + str(i), batch_size), daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def run_local(sources, cases=((),), limits=None, workers=None, batch_size=BATCH_SIZE, on_result=None,
+              timeout=DEFAULT_TIMEOUT):
+    """Run every source with every case on local worker processes and a localhost coordinator.
+
+    Returns (responses in submission order, coordinator stats).
+    """
+    coordinator = Coordinator(('127.0.0.1', 0), on_result=on_result, timeout=timeout).start()
+    processes = start_workers(coordinator.address, workers or os.cpu_count() or 1, batch_size)
+    try:
+        ids = coordinator.submit(sources, cases, limits)
+        coordinator.wait()
+    finally:
+        coordinator.shutdown()
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+    return [coordinator.results[task] for task in ids], coordinator.stats
+
+
+def main():
+    import argparse
+    import json
+    import sys
+    arg_parser = argparse.ArgumentParser(description='CFPL distributed runner')
+    commands = arg_parser.add_subparsers(dest='command')
+    remote = commands.add_parser('coordinator', help='queue FILEs for workers that connect over TCP')
+    remote.add_argument('--host', default='127.0.0.1')
+    remote.add_argument('--port', type=int, default=0)
+    local = commands.add_parser('local', help='run FILEs on local worker processes')
+    local.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    local.add_argument('--batch', type=int, default=BATCH_SIZE)
+    for sub in (remote, local):
+        sub.add_argument('file', nargs='+', help='CFPL source files')
+        sub.add_argument('--cases', metavar='JSON',
+                         help='file with a JSON list of input cases, each a list of input lines (default: one empty case)')
+        sub.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                         help='seconds each run may take (0: no limit)')
+        sub.add_argument('--max-output', type=int, help='characters each run may print')
+    worker = commands.add_parser('worker', help='pull tasks from a coordinator')
+    worker.add_argument('--connect', required=True, metavar='HOST:PORT')
+    worker.add_argument('--name')
+    worker.add_argument('--batch', type=int, default=BATCH_SIZE)
+    args = arg_parser.parse_args()
+
+    if args.command == 'worker':
+        host, port = args.connect.rsplit(':', 1)
+        Worker((host, int(port)), args.name, args.batch).run()
+        return
+    if args.command is None:
+        arg_parser.error('a command is required')
+
+    sources = [open(path, 'r').read() for path in args.file]
+    cases = [[]]
+    if args.cases:
+        cases = json.load(open(args.cases, 'r'))
+    limits = {}
+    if args.max_output:
+        limits['max_output'] = args.max_output
+    lock = threading.Lock()
+
+    def report(task, response):
+        # task ids run program by program, case by case
+        line = json.dumps({'file': args.file[task.task // len(cases)], 'case': task.task % len(cases),
+                           'ok': response['ok'], 'output': response['output'], 'error': response['error'],
+                           'worker': response['worker']})
+        with lock:
+            print(line)
+            sys.stdout.flush()
+
+    if args.command == 'local':
+        responses, stats = run_local(sources, cases, limits, args.workers, args.batch, report, args.timeout or None)
+    else:
+        coordinator = Coordinator((args.host, args.port), on_result=report, timeout=args.timeout or None).start()
+        sys.stderr.write('coordinator listening on {}:{}\n'.format(*coordinator.address))
+        try:
+            coordinator.submit(sources, cases, limits)
+            coordinator.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            coordinator.shutdown()
+        stats = coordinator.stats
+    sys.stderr.write(' '.join(name + '=' + str(stats[name]) for name in sorted(stats)) + '\n')
+
+
+if __name__ == '__main__':
+    main()
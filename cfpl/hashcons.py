@@ -0,0 +1,90 @@
+# Hash-consed expression trees
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import collections
+import copy
+
+from .constants import ASSIGN
+from .ast import AST, BinOp, Bool, Char, Num, String, UnaryOp, Var
+
+
+CONSTANTS = (Num, Char, Bool, String)
+
+
+class Interner(object):
+    """Table of pure expression nodes, so that equal subtrees are one node.
+
+    Give one to the parser (`Parser(lexer, Interner())`) and every
+    constant, variable reference, and unary or binary operation on
+    interned operands is looked up before it is kept: a second `(v3 + 1)`
+    becomes the first one, with its tokens. Chained assignments, array
+    elements and SUM are left alone. Since operands are interned first, a
+    node's key holds the ids of its operands and lookups stay O(1).
+
+    An interned node may appear in many places, so nothing may change it
+    afterwards; the optimizers `unshare` a tree before rewriting it. One
+    interner can serve several parses, sharing subtrees between programs;
+    the table keeps every node it has seen alive. `stats` counts the
+    distinct `nodes` and the `shared` occurrences that reused one.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.members = set()
+        self.stats = collections.Counter()
+
+    def key(self, node):
+        kind = type(node)
+        if kind in CONSTANTS:
+            # 1 == 1.0 == True, so the type of the value is part of the key
+            return (kind, node.token, type(node.value))
+        if kind is Var:
+            return (kind, node.token)
+        if kind is UnaryOp and id(node.expr) in self.members:
+            return (kind, node.op, id(node.expr))
+        if kind is BinOp and node.op.type != ASSIGN and \
+                id(node.left) in self.members and id(node.right) in self.members:
+            return (kind, node.op, id(node.left), id(node.right))
+        return None
+
+    def intern(self, node):
+        """Return the interned node equal to `node`, adding `node` if it is the first."""
+        key = self.key(node)
+        if key is None:
+            return node
+        shared = self.nodes.get(key)
+        if shared is not None:
+            self.stats['shared'] += 1
+            return shared
+        self.nodes[key] = node
+        self.members.add(id(node))
+        self.stats['nodes'] += 1
+        return node
+
+
+def unshare(tree):
+    """Copy every node that `tree` reaches by more than one path, in place.
+
+    Afterwards each node has one parent, so rewriting one occurrence of a
+    subtree no longer changes the others. Returns `tree`.
+    """
+    seen = set([id(tree)])
+    todo = [tree]
+
+    def own(node):
+        if id(node) in seen:
+            node = copy.deepcopy(node)
+        seen.add(id(node))
+        todo.append(node)
+        return node
+
+    while todo:
+        node = todo.pop()
+        for name, value in list(vars(node).items()):
+            if isinstance(value, AST):
+                setattr(node, name, own(value))
+            elif isinstance(value, list):
+                for index, item in enumerate(value):
+                    if isinstance(item, AST):
+                        value[index] = own(item)
+    return tree
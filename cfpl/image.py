@@ -0,0 +1,210 @@
+# Flat program images
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import array
+import json
+import struct
+
+from . import ast
+from .token import Token
+
+
+MAGIC = b'CFPI'
+VERSION = 1
+HEADER = struct.Struct('<4sIiII')  # magic, version, root, words, pool bytes
+
+# record kinds
+NODE, LIST, TOKEN = 0, 1, 2
+
+
+class Encoder(object):
+    """Lay a tree out as int32 words plus a JSON constant pool.
+
+    A node, list or token becomes one record; references between records
+    are word offsets from the start of the record area, so the image can
+    be mapped anywhere. Objects that appear twice in the tree (shared
+    tokens, the OUTPUT term list) are written once and stay shared.
+
+    Records:  NODE  schema value*    (one value per field of the schema)
+              LIST  length value*
+              TOKEN type value
+    A value word is the offset of a record, -1 for None or -2 - i for
+    constant i. Each schema, a node class name and its sorted field
+    names, is stored once in the pool, which holds `[schemas, constants]`.
+    """
+
+    def __init__(self):
+        self.words = array.array('i')
+        self.schemas = []
+        self.schema_index = {}
+        self.pool = []
+        self.constants = {}
+        self.offsets = {}
+
+    def constant(self, value):
+        key = (type(value).__name__, value)
+        index = self.constants.get(key)
+        if index is None:
+            index = self.constants[key] = len(self.pool)
+            self.pool.append(value)
+        return index
+
+    def schema(self, item, names):
+        key = (type(item).__name__,) + tuple(names)
+        index = self.schema_index.get(key)
+        if index is None:
+            index = self.schema_index[key] = len(self.schemas)
+            self.schemas.append(list(key))
+        return index
+
+    def value(self, value):
+        if value is None:
+            return -1
+        if isinstance(value, (ast.AST, Token, list)):
+            return self.record(value)
+        return -2 - self.constant(value)
+
+    def record(self, item):
+        offset = self.offsets.get(id(item))
+        if offset is not None:
+            return offset
+        if isinstance(item, Token):
+            fields = [TOKEN, self.value(item.type), self.value(item.value)]
+        elif isinstance(item, list):
+            fields = [LIST, len(item)] + [self.value(element) for element in item]
+        else:
+            attributes = sorted(vars(item).items())
+            fields = [NODE, self.schema(item, [name for name, value in attributes])]
+            fields += [self.value(value) for name, value in attributes]
+        # children first: a record only refers to records before it
+        offset = self.offsets[id(item)] = len(self.words)
+        self.words.extend(fields)
+        return offset
+
+    def encode(self, tree):
+        root = self.record(tree)
+        pool = json.dumps([self.schemas, self.pool]).encode('utf-8')
+        return HEADER.pack(MAGIC, VERSION, root, len(self.words), len(pool)) + self.words.tobytes() + pool
+
+
+def encode(tree):
+    """Return the image of a parsed tree as bytes."""
+    return Encoder().encode(tree)
+
+
+class Decoder(object):
+    """Rebuild the objects of an image, reading the words straight from `buffer`.
+
+    `decode()` builds the whole tree in one pass over the records;
+    `record(offset)` builds just the subtree at `offset`, for lazy use.
+    """
+
+    def __init__(self, buffer):
+        magic, version, self.root, words, pool = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise Exception('Not a CFPL program image')
+        view = memoryview(buffer)
+        end = HEADER.size + 4 * words
+        self.view = view[HEADER.size:end]
+        self.words = self.view.cast('i')
+        schemas, self.pool = json.loads(bytes(view[end:end + pool]).decode('utf-8'))
+        view.release()
+        self.schemas = [(getattr(ast, schema[0]), schema[1:]) for schema in schemas]
+        # objects by offset, then the constants backwards and None, so
+        # that any value word indexes this list directly
+        self.objects = [None] * len(self.words) + self.pool[::-1] + [None]
+
+    def release(self):
+        """Drop the views of the buffer; needed before shared memory is closed."""
+        self.words.release()
+        self.view.release()
+
+    def value(self, word):
+        return self.record(word) if word >= 0 else self.objects[word]
+
+    def record(self, offset):
+        item = self.objects[offset]
+        if item is not None:
+            return item
+        words = self.words
+        kind = words[offset]
+        if kind == TOKEN:
+            item = Token(self.value(words[offset + 1]), self.value(words[offset + 2]))
+        elif kind == LIST:
+            item = [self.value(word) for word in words[offset + 2:offset + 2 + words[offset + 1]]]
+        else:
+            cls, names = self.schemas[words[offset + 1]]
+            item = cls.__new__(cls)
+            item.__dict__.update(zip(names, [self.value(word) for word in words[offset + 2:offset + 2 + len(names)]]))
+        self.objects[offset] = item
+        return item
+
+    def decode(self):
+        # the int32 view itself: slices of it are views too, not copies
+        words = self.words
+        schemas = self.schemas
+        objects = self.objects
+        value = objects.__getitem__
+        new = object.__new__
+        offset = 0
+        end = len(words)
+        while offset < end:
+            kind = words[offset]
+            if kind == NODE:
+                cls, names = schemas[words[offset + 1]]
+                start = offset + 2
+                offset = start + len(names)
+                item = objects[start - 2] = new(cls)
+                item.__dict__ = dict(zip(names, map(value, words[start:offset])))
+            elif kind == LIST:
+                start = offset + 2
+                offset = start + words[offset + 1]
+                objects[start - 2] = list(map(value, words[start:offset]))
+            else:
+                objects[offset] = Token(value(words[offset + 1]), value(words[offset + 2]))
+                offset += 3
+        return objects[self.root]
+
+
+def decode(buffer):
+    """Rebuild a tree from an image in any buffer (bytes, mmap, shared memory)."""
+    decoder = Decoder(buffer)
+    try:
+        return decoder.decode()
+    finally:
+        decoder.release()
+
+
+def share(tree):
+    """Put the image of `tree` in a new shared memory block and return the block.
+
+    Pass `block.name` to the workers; the caller owns the block and must
+    `close()` and `unlink()` it once they are done.
+    """
+    from multiprocessing import shared_memory
+    data = encode(tree)
+    block = shared_memory.SharedMemory(create=True, size=len(data))
+    block.buf[:len(data)] = data
+    return block
+
+
+def load(name):
+    """Decode the whole program image in the shared memory block called `name`.
+
+    The tree is built before the block is closed, so nothing refers to
+    the shared memory afterwards; attach a Decoder to `block.buf` to
+    build only some subtrees with `record`.
+    """
+    from multiprocessing import shared_memory
+    try:
+        block = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before 3.13 every attach registers the block with the resource
+        # tracker, which would unlink it when this process exits
+        from multiprocessing import resource_tracker
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, 'shared_memory')
+    try:
+        return decode(block.buf)
+    finally:
+        block.close()
@@ -0,0 +1,513 @@
+# Main interpreter file
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+from __future__ import annotations
+
+import operator
+import sys
+
+# for the type checker only, as in lexer.py
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Dict, List, NoReturn, Optional, TextIO
+
+    from mypy_extensions import mypyc_attr
+
+    from .hashcons import Interner
+
+from .constants import (
+    AND, ASSIGN, BOOL, CHAR, DIV, EQUAL, FLOAT, GREATER_EQUAL, GREATER_THAN, INT, LESSER_EQUAL,
+    LESSER_THAN, MINUS, MOD, MUL, NOT, NOT_EQUAL, OR, PLUS, STRING_CONST,
+)
+from .ast import (
+    Assign, BinOp, Block, Bool, Char, Compound, CountedLoop, IfStatement, Increment, Index, Input,
+    NoOp, Num, Output, Program, String, Sum, Type, UnaryOp, Var, VarDecl, WhileStatement,
+)
+from .lexer import Lexer
+from .parser import Parser
+from .arrays import Array, show
+
+try:
+    mypyc_attr
+except NameError:
+    # mypyc reads the decorator at compile time (see native.py); at run
+    # time a no-op will do, and mypy_extensions would import typing
+    def mypyc_attr(*args, **kwargs):  # type: ignore[misc]
+        return lambda cls: cls
+
+
+COMPARISONS = {
+    GREATER_THAN: operator.gt,
+    LESSER_THAN: operator.lt,
+    GREATER_EQUAL: operator.ge,
+    LESSER_EQUAL: operator.le,
+}
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
+class NodeVisitor(object):
+    def visit(self, node: Any) -> Any:
+        method_name = 'visit_' + type(node).__name__
+        visitor = getattr(self, method_name, self.generic_visit)
+        return visitor(node)
+
+    def generic_visit(self, node: Any) -> NoReturn:
+        raise Exception('No visit_{} method'.format(type(node).__name__))
+
+
+# the other engines, the debugger and the quickening interpreter subclass it
+@mypyc_attr(allow_interpreted_subclasses=True)
+class Interpreter(NodeVisitor):
+    parser: Optional[Parser]
+    GLOBAL_SCOPE: Dict[str, Any]
+    DECLARED_VAR: Dict[str, str]
+    stdout: TextIO
+    stdin: TextIO
+    passes: List[Any]
+
+    def __init__(self, parser: Optional[Parser], stdout: Optional[TextIO] = None, stdin: Optional[TextIO] = None) -> None:
+        self.parser = parser
+        self.GLOBAL_SCOPE = {}
+        self.DECLARED_VAR = {}
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.stdin = stdin if stdin is not None else sys.stdin
+        # tree rewrites (see optimizer.py) applied by interpret() after parsing
+        self.passes = []
+
+    def write(self, text: str) -> None:
+        self.stdout.write(text)
+
+    def read(self, prompt: str) -> str:
+        self.write(prompt)
+        self.stdout.flush()
+        line = self.stdin.readline()
+        if not line:
+            raise NameError("Invalid inputs.")
+        return line.rstrip('\n')
+
+    def visit_Program(self, node: Program) -> None:
+        self.visit(node.block)
+
+    def visit_Block(self, node: Block) -> None:
+        for declaration in node.declarations:
+            self.visit(declaration)
+        self.visit(node.compound_statement)
+
+    def assign_var_value(self, name: str, value: Any) -> Any:
+        if name in self.DECLARED_VAR:
+            current = self.GLOBAL_SCOPE.get(name)
+            if isinstance(current, Array):
+                current.assign(value if isinstance(value, Array) else self.coerce_value(name, value))
+                return current
+            value = self.coerce_value(name, value)
+            self.GLOBAL_SCOPE[name] = value
+        #else: # ignore for now
+            #raise NameError(repr(name) + ' variable not defined.')
+        return value
+
+    def coerce_value(self, name: str, value: Any) -> Any:
+        if self.DECLARED_VAR[name] == INT:
+            if not isinstance(value, int):
+                if isinstance(value, float):
+                    value = int(value)
+                else:
+                    try:
+                        value = int(value)
+                    except (ValueError, TypeError):
+                        raise NameError('Value ' + repr(value) + ' could not assign to int variable ' + repr(name))
+        elif self.DECLARED_VAR[name] == FLOAT:
+            if not isinstance(value, float):
+                if isinstance(value, int):
+                    value = float(value)
+                else:
+                    try:
+                        value = float(value)
+                    except (ValueError, TypeError):
+                        raise NameError('Value ' + repr(value) + ' could not assign to float variable ' + repr(name))
+        elif self.DECLARED_VAR[name] == CHAR:
+            if not isinstance(value, str):
+                raise NameError('Value ' + repr(value) + ' could not assign to char variable ' + repr(name))
+        elif self.DECLARED_VAR[name] == BOOL:
+            if not isinstance(value, bool):
+                raise NameError('Value ' + repr(value) + ' could not assign to boolean variable ' + repr(name))
+        else:
+            raise NameError('Unknown data type ' + self.DECLARED_VAR[name])
+        return value
+
+    def visit_VarDecl(self, node: VarDecl) -> None:
+        if node.var_node.value in self.DECLARED_VAR:
+            raise NameError(repr(node.var_node.value) + " variable already defined")
+        default_value: Any
+        if node.var_node.default_value == None:
+            if node.type_node.value == INT:
+                default_value = 0
+            elif node.type_node.value == FLOAT:
+                default_value = 0
+            elif node.type_node.value == CHAR:
+                default_value = ''
+            elif node.type_node.value == BOOL:
+                default_value = False
+            else:
+                default_value = node.var_node.default_value
+        else:
+            # a literal, or any expression such as -5
+            default_value = self.visit(node.var_node.default_value)
+        self.DECLARED_VAR[node.var_node.value] = node.type_node.value
+        if node.var_node.size is not None:
+            size = self.visit(node.var_node.size)
+            if not isinstance(size, int) or size < 1:
+                raise NameError('Invalid size ' + repr(size) + ' for array ' + repr(node.var_node.value))
+            self.GLOBAL_SCOPE[node.var_node.value] = Array(node.type_node.value, size)
+        self.assign_var_value(node.var_node.value, default_value)
+
+    def visit_Type(self, node: Type) -> None:
+        # Do nothing
+        pass
+
+    def visit_BinOp(self, node: BinOp) -> Any:
+        if node.op.type == PLUS:
+            return self.visit(node.left) + self.visit(node.right)
+        elif node.op.type == MINUS:
+            return self.visit(node.left) - self.visit(node.right)
+        elif node.op.type == MUL:
+            return self.visit(node.left) * self.visit(node.right)
+        elif node.op.type == MOD:
+            return self.visit(node.left) % self.visit(node.right)
+        elif node.op.type == DIV:
+            return self.visit(node.left) / self.visit(node.right)
+        elif node.op.type == ASSIGN:
+            # LIMITATIONS: for multiple assignments, constant values must be enclosed in braces
+            return self.assign_chain(node)
+        elif node.op.type == AND:
+            return self.visit(node.left) and self.visit(node.right)
+        elif node.op.type == OR:
+            return self.visit(node.left) or self.visit(node.right)
+        elif node.op.type == NOT:
+            return not self.visit(node.right)
+        elif node.op.type == GREATER_THAN:
+            return self.visit(node.left) > self.visit(node.right)
+        elif node.op.type == LESSER_THAN:
+            return self.visit(node.left) < self.visit(node.right)
+        elif node.op.type == GREATER_EQUAL:
+            return self.visit(node.left) >= self.visit(node.right)
+        elif node.op.type == LESSER_EQUAL:
+            return self.visit(node.left) <= self.visit(node.right)
+        elif node.op.type == EQUAL:
+            return self.visit(node.left) == self.visit(node.right)
+        elif node.op.type == NOT_EQUAL:
+            return bool(self.visit(node.left) != self.visit(node.right))
+
+    def assign_chain(self, node: BinOp, chained: Any = None) -> Any:
+        """Assign `a = b = (value)` chains, parsed as nested ASSIGN BinOps.
+
+        The value of the outermost right-hand side is handed down the
+        chain as `chained` instead of being stored on the nodes, so a tree
+        can be run any number of times, from any number of threads.
+        """
+        value = self.visit(node.right)
+        if chained is None:
+            chained = value
+        # process all lefts
+        if type(node.left).__name__ == 'BinOp':
+            if node.left.op.type == ASSIGN:
+                return self.assign_chain(node.left, chained)
+            return self.visit(node.left)
+        if type(node.left).__name__ == 'Var' and node.left.value in self.GLOBAL_SCOPE:
+            self.assign_var_value(node.left.value, chained)
+        if type(node.right).__name__ == 'Var' and node.right.value in self.GLOBAL_SCOPE:
+            self.assign_var_value(node.right.value, chained)
+        return value
+
+    def visit_Num(self, node: Num) -> Any:
+        return node.value
+
+    def visit_Char(self, node: Char) -> Any:
+        return node.value
+
+    def visit_Bool(self, node: Bool) -> Any:
+        return node.value
+
+    def visit_String(self, node: String) -> Any:
+        return node.value
+
+    def input_prompt(self, node: Input) -> str:
+        data_types = []
+        for val in node.value:
+            data_types.append(self.DECLARED_VAR[val.value])
+        return 'please input ' + str(len(node.value)) + ' values separated by comma [' + ', '.join(data_types) + '] >>> '
+
+    def input_value(self, name: str, value: str) -> Any:
+        """Convert the text typed for variable `name` as INPUT does."""
+        data_type = self.DECLARED_VAR[name]
+        if data_type == INT:
+            try:
+                return int(value)
+            except ValueError:
+                raise NameError('Invalid input ' + repr(value) + ' for int variable ' + repr(name))
+        elif data_type == FLOAT:
+            try:
+                return float(value)
+            except ValueError:
+                raise NameError('Invalid input ' + repr(value) + ' for float variable ' + repr(name))
+        elif data_type == CHAR:
+            return value[0] if len(value) > 0 else value
+        elif data_type == BOOL:
+            return value == 'TRUE'
+        return str(value)
+
+    def visit_Input(self, node: Input) -> Any:
+        inputs = self.read(self.input_prompt(node))
+        # getattr, as compiled code would take the type of Input.fixed from its None
+        fixed_values: Any = getattr(node, 'fixed')
+        if fixed_values is not None:
+            # specialized by partial.py: read the values left open and
+            # put them back in line with the fixed ones
+            read = inputs.split(',')
+            if len(read) != fixed_values.count(None):
+                raise NameError("Invalid inputs.")
+            read.reverse()
+            inputs = ','.join(read.pop() if fixed is None else fixed for fixed in fixed_values)
+        self.write(inputs + '\n')
+        values = inputs.split(',')
+        if len(values) != len(node.value):
+            raise NameError("Invalid inputs.")
+        i = 0
+        for val in node.value:
+            self.assign_var_value(val.value, self.input_value(val.value, values[i]))
+            i = i + 1
+        return node.value
+
+    def output_text(self, node: Output) -> str:
+        """The line an OUTPUT statement prints, with its newline."""
+        output = ''
+        for val in node.value:
+            if type(val).__name__ == 'Index':
+                val = self.visit(val)
+            elif type(val).__name__ == 'Var' and isinstance(self.GLOBAL_SCOPE.get(val.value), Array):
+                val = self.GLOBAL_SCOPE[val.value]
+            elif type(val).__name__ == 'Var':
+                if val.value not in self.GLOBAL_SCOPE:
+                    raise NameError(repr(val.value) + " variable is not defined.")
+                val_name = val.value
+                val = self.GLOBAL_SCOPE[val_name]
+                data_type = self.DECLARED_VAR[val_name]
+                if data_type == INT:
+                    val = int(val)
+                elif data_type == FLOAT:
+                    val = float(val)
+                elif data_type == CHAR:
+                    val = val[0] if len(val) > 0 else val
+                elif data_type == BOOL:
+                    val = 'TRUE' if val else 'FALSE'
+            else:
+                val = val.value
+            output += show(val)
+        return output + '\n'
+
+    def visit_Output(self, node: Output) -> Any:
+        self.write(self.output_text(node))
+        return node.value
+
+    def visit_IfStatement(self, node: IfStatement) -> Any:
+        val_expr = self.visit(node.expr)
+        if val_expr:
+            values = [node.value]
+            if type(node.value).__name__ == 'list':
+                values = []
+                for val in node.value:
+                    values.append(val)
+            for val in values:
+                self.visit(val)
+        elif node.els is not None:
+            self.visit(node.els)
+        return node.value
+
+    def visit_WhileStatement(self, node: WhileStatement) -> Any:
+        values = [node.value]
+        if type(node.value).__name__ == 'list':
+            values = list(node.value)
+        while True:
+            if not self.visit(node.expr):
+                break
+            for val in values:
+                self.visit(val)
+        return node.value
+
+    def visit_CountedLoop(self, node: CountedLoop) -> None:
+        compare = COMPARISONS[node.comparison]
+        limit = self.visit(node.limit)
+        scope = self.GLOBAL_SCOPE
+        counter = node.counter
+        body = node.value.children
+        block = body * node.unroll
+        span = node.step * (node.unroll - 1)
+        while compare(scope[counter], limit):
+            # the counter moves by `step` once per pass, so if the check
+            # holds `unroll - 1` steps ahead it holds for every step between
+            if span and compare(scope[counter] + span, limit):
+                for statement in block:
+                    self.visit(statement)
+            else:
+                for statement in body:
+                    self.visit(statement)
+
+    def visit_Increment(self, node: Increment) -> None:
+        self.GLOBAL_SCOPE[node.value] += node.step
+
+    def visit_UnaryOp(self, node: UnaryOp) -> Any:
+        op = node.op.type
+        if op == PLUS:
+            return +self.visit(node.expr)
+        elif op == MINUS:
+            return -self.visit(node.expr)
+
+    def visit_Compound(self, node: Compound) -> None:
+        for child in node.children:
+            if child is not None:
+                self.visit(child)
+
+    def visit_Assign(self, node: Assign) -> None:
+        if type(node.left).__name__ == 'Index':
+            array = self.lookup_array(node.left)
+            value = self.visit(node.right)
+            if isinstance(value, Array):
+                raise NameError('Array could not assign to element of ' + repr(node.left.value))
+            array.set(self.visit(node.left.index), self.coerce_value(node.left.value, value))
+            return
+        values = [node.left]
+        if type(node.left.value).__name__ == 'list':
+            values = []
+            for val in node.left.value:
+                values.append(val)
+        for val in values:
+            var_name = val.value
+            if val.token.type != STRING_CONST and var_name not in self.DECLARED_VAR:
+                raise NameError(repr(var_name) + " variable is not defined.")
+            self.assign_var_value(var_name, self.visit(node.right))
+        return
+        ### codes below may also work
+        value = node.left.value
+        if type(value).__name__ == 'list':
+            node.left.value = ''
+            for val in value:
+                node.left.value += val.value
+        var_name = node.left.value
+        if var_name not in self.DECLARED_VAR:
+            raise NameError(repr(var_name) + " variable is not defined")
+        self.assign_var_value(var_name, self.visit(node.right))
+
+    def visit_Var(self, node: Var) -> Any:
+        var_name = node.value
+        var_value = self.GLOBAL_SCOPE.get(var_name)
+        if var_value is None:
+            raise NameError(repr(var_name))
+        else:
+            return var_value
+
+    def lookup_array(self, node: Any) -> Array:
+        array = self.GLOBAL_SCOPE.get(node.value)
+        if not isinstance(array, Array):
+            raise NameError(repr(node.value) + " is not an array.")
+        return array
+
+    def visit_Index(self, node: Index) -> Any:
+        return self.lookup_array(node).get(self.visit(node.index))
+
+    def visit_Sum(self, node: Sum) -> Any:
+        value = self.visit(node.expr)
+        if not isinstance(value, Array):
+            raise NameError('SUM needs an array, got ' + repr(value))
+        return value.sum()
+
+    def visit_NoOp(self, node: NoOp) -> None:
+        pass
+
+    def interpret(self) -> Any:
+        if self.parser is None:
+            raise Exception('No program to interpret')
+        tree = self.parser.parse()
+        if tree is None:
+            return ''
+        for optimizer in self.passes:
+            tree = optimizer.optimize(tree)
+        return self.visit(tree)
+
+
+
+def help_formatter(prog: str) -> Any:
+    """argparse's formatter, sized without importing shutil (and the
+    compression modules it pulls in) on every start."""
+    import argparse
+    import os
+    try:
+        columns = int(os.environ.get('COLUMNS', 0)) or os.get_terminal_size().columns
+    except (ValueError, OSError):
+        columns = 80
+    return argparse.HelpFormatter(prog, width=columns - 2)
+
+
+def main() -> None:
+    import argparse
+    arg_parser = argparse.ArgumentParser(prog='cfpl', description='CFPL interpreter',
+                                         formatter_class=help_formatter)
+    arg_parser.add_argument('file')
+    arg_parser.add_argument('--engine', choices=['recursive', 'stack'], default='recursive',
+                            help="'stack' walks the tree without Python recursion")
+    arg_parser.add_argument('--quicken', action='store_true',
+                            help='specialize hot expressions and stores on the types they see (see quicken.py)')
+    arg_parser.add_argument('--quicken-stats', action='store_true',
+                            help='with --quicken, print specialization hit rates to stderr')
+    arg_parser.add_argument('--optimize', action='store_true',
+                            help='optimize loops and blocks (see optimizer.py) before running')
+    arg_parser.add_argument('--optimizer-stats', action='store_true',
+                            help='with --optimize, print what each pass rewrote to stderr')
+    arg_parser.add_argument('--intern', action='store_true',
+                            help='share equal expression subtrees of the parsed program (see hashcons.py)')
+    arg_parser.add_argument('--metrics', metavar='PATH',
+                            help='write run metrics to PATH (JSON if it ends in .json, else Prometheus text)')
+    args = arg_parser.parse_args()
+    if args.quicken and args.engine == 'stack':
+        arg_parser.error('--quicken is a recursive engine of its own; drop --engine stack')
+    if args.metrics and args.engine == 'stack':
+        arg_parser.error('--metrics counts visits, which the stack engine does not make')
+    text = open(args.file, 'r').read()
+
+    lexer = Lexer(text)
+    interner: Optional[Interner] = None
+    if args.intern:
+        from .hashcons import Interner
+        interner = Interner()
+    parser = Parser(lexer, interner)
+    interpreter: Interpreter
+    if args.engine == 'stack':
+        from .stack_interpreter import StackInterpreter
+        interpreter = StackInterpreter(parser)
+    elif args.quicken:
+        from .quicken import QuickeningInterpreter
+        interpreter = QuickeningInterpreter(parser)
+    else:
+        interpreter = Interpreter(parser)
+    if args.optimize:
+        from .optimizer import LoopOptimizer, DataflowOptimizer
+        interpreter.passes.extend([LoopOptimizer(), DataflowOptimizer()])
+    metrics = None
+    if args.metrics:
+        from .metrics import Metrics
+        metrics = Metrics()
+        metrics.attach(interpreter)
+    try:
+        result = interpreter.interpret()
+    except Exception as e:
+        print(e)
+    if metrics is not None:
+        metrics.dump(args.metrics)
+    if args.optimizer_stats:
+        for optimizer in interpreter.passes:
+            counts = ' '.join(name + '=' + str(count) for name, count in sorted(optimizer.stats.items()))
+            sys.stderr.write(type(optimizer).__name__ + ': ' + (counts or 'nothing') + '\n')
+    if args.quicken_stats and hasattr(interpreter, 'report'):
+        sys.stderr.write(interpreter.report() + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,43 @@
 # Lexical analyzer
 # Copyright 2019 Art Layese <artiskool@gmail.com>
 
-from constants import *
-from token import Token
+from __future__ import annotations
 
-class Lexer(object):
+# annotations are for the compiled builds (see native.py); importing
+# typing at run time would more than double the startup time
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, NoReturn, Optional
+
+from .constants import (
+    AMPERSAND, AS, ASSIGN, COLON, COMMA, DIV, DOT, EOF, EQUAL, GREATER_EQUAL, GREATER_THAN, ID,
+    LEFT_BRACE, LEFT_PAREN, LESSER_EQUAL, LESSER_THAN, MINUS, MOD, MUL, NOT_EQUAL, PLUS,
+    RESERVED_KEYWORDS, RIGHT_BRACE, RIGHT_PAREN, SEMI,
+)
+from .token import Token
 
-    def __init__(self, text):
+class Lexer(object):
+    # declared for compiled builds (see native.py)
+    lines: List[str]
+    line: int
+    token_line: int
+    pos: int
+    text: str
+    current_char: Optional[str]
+
+    def __init__(self, text: str) -> None:
         self.lines = text.split("\n")
         if len(self.lines) == 0:
             self.error()
         self.line = -1
+        # 1-based line of the last token returned by get_next_token
+        self.token_line = 0
+        self.pos = 0
+        self.text = ''
+        self.current_char = None
         self.next_line()
 
-    def process_text(self, text):
+    def process_text(self, text: str) -> str:
         lines = text.split("\n")
         new_lines = []
         for line in lines:
@@ -23,7 +47,7 @@ class Lexer(object):
             new_lines.append(line)
         return "\n".join(new_lines)
 
-    def next_line(self):
+    def next_line(self) -> None:
         self.line += 1
         if self.line < len(self.lines):
             line = self.lines[self.line].strip()
@@ -36,7 +60,7 @@ class Lexer(object):
         else:
             self.current_char = None
 
-    def next_char(self):
+    def next_char(self) -> None:
         """Advance the `pos` pointer and set the `current_char` variable."""
         self.pos += 1
         if self.pos < len(self.text):
@@ -45,11 +69,11 @@ class Lexer(object):
             self.next_line()
 
 
-    def error(self):
-        raise Exception('Invalid character ' + self.current_char)
+    def error(self) -> NoReturn:
+        raise Exception('Invalid character ' + str(self.current_char))
 
 
-    def peek(self, step=1):
+    def peek(self, step: int = 1) -> Optional[str]:
         peek_pos = self.pos + step
         if peek_pos > len(self.text) - 1:
             return None
@@ -57,7 +81,7 @@ class Lexer(object):
             return self.text[peek_pos]
 
 
-    def look_back(self, step=1):
+    def look_back(self, step: int = 1) -> Optional[str]:
         back_pos = self.pos - step
         if back_pos > len(self.text) - 1:
             return None
@@ -65,16 +89,16 @@ class Lexer(object):
             return self.text[back_pos]
 
 
-    def skip_whitespace(self):
+    def skip_whitespace(self) -> None:
         while self.current_char is not None and self.current_char.isspace():
             self.next_char()
 
-    def skip_comment(self):
+    def skip_comment(self) -> None:
         while self.current_char != '}':
             self.next_char()
         self.next_char()  # the closing curly brace
 
-    def number(self):
+    def number(self) -> Token:
         """Return a (multidigit) integer or float consumed from the input."""
         result = ''
         while self.current_char is not None and self.current_char.isdigit():
@@ -98,16 +122,15 @@ class Lexer(object):
 
         return token
 
-    def char(self):
-        if self.current_char == '\'':
-            char = ''
-        else:
+    def char(self) -> Token:
+        char: Optional[str] = ''
+        if self.current_char != '\'':
             char = self.current_char # this is char
             self.next_char() # move to close single quote
         self.next_char() # move to next character
         return Token('CHAR_CONST', char)
 
-    def string(self):
+    def string(self) -> Token:
         result = ''
         while self.current_char is not None:
             if self.current_char == '[' and self.peek(2) == ']': # first
@@ -129,7 +152,7 @@ class Lexer(object):
             return Token('BOOL_CONST', result)
         return Token('STRING_CONST', result)
 
-    def _id(self):
+    def _id(self) -> Token:
         """Handle identifiers and reserved keywords"""
         result = ''
         while self.current_char is not None and (self.current_char.isalnum() or self.current_char == '_'):
@@ -139,7 +162,7 @@ class Lexer(object):
         token = RESERVED_KEYWORDS.get(result, Token(ID, result))
         return token
 
-    def get_next_token(self):
+    def get_next_token(self) -> Token:
         """Lexical analyzer (also known as scanner or tokenizer)
 
         This method is responsible for breaking a sentence
@@ -157,6 +180,8 @@ class Lexer(object):
                 self.skip_comment()
                 continue
 
+            self.token_line = self.line + 1
+
             if self.current_char == 'A' and self.peek() == 'S':
                 self.next_char()
                 self.next_char()
@@ -0,0 +1,226 @@
+# Run metrics
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import collections
+import json
+import threading
+import time
+
+from .ast import walk, CountedLoop, WhileStatement
+
+
+PHASES = ('lex', 'parse', 'execute')
+
+
+class Metrics(object):
+    """Opt-in registry of counters for the lexer, parser and interpreter.
+
+    Nothing is counted unless an interpreter is passed to `attach`, which
+    swaps instrumented versions of a few methods onto that one instance.
+    Interpreters that are never attached run the plain class methods, so
+    leaving a registry around in production costs nothing.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.programs = 0
+        self.errors = 0
+        self.tokens = 0
+        self.nodes = 0
+        self.while_iterations = 0
+        self.output_bytes = 0
+        self.visits = collections.Counter()
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+
+    def attach(self, interpreter):
+        """Instrument `interpreter` and the parser and lexer it owns.
+
+        Counts are kept per run and merged into the registry once
+        `interpret()` returns or raises, so concurrent runs only touch
+        the lock once each. The parser constructor reads the first token
+        before this can time it: it counts as lexed, but its lex time is
+        not in the lex phase.
+        """
+        parser = interpreter.parser
+        lexer = parser.lexer
+        for instance in (lexer, parser, interpreter):
+            if not hasattr(instance, '__dict__'):
+                # a native class of the mypyc build (see native.py)
+                raise Exception('Cannot instrument a compiled ' + type(instance).__name__)
+        if hasattr(interpreter, 'push_statement'):
+            # its work loop calls handlers directly, so visit would count nothing
+            raise Exception('Cannot instrument the explicit-stack ' + type(interpreter).__name__)
+        clock = time.perf_counter
+        visits = collections.Counter()
+        bodies = set()
+        # the parser constructor has already read the first token
+        run = {'tokens': 1, 'nodes': 0, 'iterations': 0, 'output': 0,
+               'lex': 0.0, 'parse': 0.0}
+
+        get_next_token = lexer.get_next_token
+        parse = parser.parse
+        visit = interpreter.visit
+        output_text = interpreter.output_text
+        interpret = interpreter.interpret
+
+        def counting_get_next_token():
+            start = clock()
+            token = get_next_token()
+            run['lex'] += clock() - start
+            run['tokens'] += 1
+            return token
+
+        def timed_parse():
+            start = clock()
+            tree = parse()
+            run['parse'] += clock() - start
+            for node in walk(tree):
+                run['nodes'] += 1
+                if isinstance(node, WhileStatement):
+                    bodies.add(id(node.value))
+            return tree
+
+        def counting_visit(node):
+            visits[type(node).__name__] += 1
+            if id(node) in bodies:
+                run['iterations'] += 1
+            elif type(node) is CountedLoop:
+                # an optimized WHILE runs its body's statements itself; its
+                # counter moves by `step` once per pass
+                scope = interpreter.GLOBAL_SCOPE
+                start = scope[node.counter]
+                try:
+                    return visit(node)
+                finally:
+                    run['iterations'] += (scope[node.counter] - start) // node.step
+            return visit(node)
+
+        def counting_output_text(node):
+            # OUTPUT lines only, not the prompts INPUT writes
+            text = output_text(node)
+            run['output'] += len(text.encode('utf-8'))
+            return text
+
+        def timed_interpret():
+            start = clock()
+            failed = True
+            try:
+                result = interpret()
+                failed = False
+                return result
+            finally:
+                total = clock() - start
+                self.record(run, visits, total, failed)
+
+        lexer.get_next_token = counting_get_next_token
+        parser.parse = timed_parse
+        interpreter.visit = counting_visit
+        interpreter.output_text = counting_output_text
+        interpreter.interpret = timed_interpret
+        return interpreter
+
+    def record(self, run, visits, total, failed=False):
+        with self.lock:
+            self.programs += 1
+            self.errors += 1 if failed else 0
+            self.tokens += run['tokens']
+            self.nodes += run['nodes']
+            self.while_iterations += run['iterations']
+            self.output_bytes += run['output']
+            self.visits.update(visits)
+            self.seconds['lex'] += run['lex']
+            self.seconds['parse'] += run['parse'] - run['lex']
+            self.seconds['execute'] += total - run['parse']
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'programs': self.programs,
+                'errors': self.errors,
+                'tokens_lexed': self.tokens,
+                'ast_nodes': self.nodes,
+                'while_iterations': self.while_iterations,
+                'output_bytes': self.output_bytes,
+                'nodes_visited': dict(self.visits),
+                'phase_seconds': dict(self.seconds),
+            }
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """Render the registry in the Prometheus text exposition format."""
+        data = self.as_dict()
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append('# HELP cfpl_{} {}'.format(name, help))
+            lines.append('# TYPE cfpl_{} {}'.format(name, kind))
+            for labels, value in samples:
+                lines.append('cfpl_{}{} {}'.format(name, labels, value))
+
+        metric('programs_total', 'counter', 'Programs interpreted.',
+               [('', data['programs'])])
+        metric('errors_total', 'counter', 'Programs that raised an error.',
+               [('', data['errors'])])
+        metric('tokens_lexed_total', 'counter', 'Tokens produced by the lexer.',
+               [('', data['tokens_lexed'])])
+        metric('ast_nodes_total', 'counter', 'AST nodes built by the parser.',
+               [('', data['ast_nodes'])])
+        metric('while_iterations_total', 'counter', 'WHILE loop bodies executed.',
+               [('', data['while_iterations'])])
+        metric('output_bytes_total', 'counter', 'Bytes written by OUTPUT.',
+               [('', data['output_bytes'])])
+        metric('nodes_visited_total', 'counter', 'Interpreter visits per node type.',
+               [('{{node="{}"}}'.format(name), count)
+                for name, count in sorted(data['nodes_visited'].items())])
+        metric('phase_seconds_total', 'counter', 'Wall time spent per phase.',
+               [('{{phase="{}"}}'.format(phase), repr(data['phase_seconds'][phase]))
+                for phase in PHASES])
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path, format=None):
+        """Write the registry to `path` as 'json' or 'prometheus' text.
+
+        Without an explicit format, a `.json` suffix selects JSON.
+        """
+        if format is None:
+            format = 'json' if path.endswith('.json') else 'prometheus'
+        text = self.to_json() if format == 'json' else self.to_prometheus()
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def serve(self, port=9464, host='127.0.0.1'):
+        """Expose the registry over HTTP from a daemon thread.
+
+        GET /metrics returns Prometheus text, GET /metrics.json returns JSON.
+        Returns the server; call its `shutdown()` to stop it.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = registry.to_prometheus()
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body = registry.to_json()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
@@ -0,0 +1,134 @@
+# Optional compiled build
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Compile the lexer, parser and interpreter ahead of time.
+
+    python -m cfpl.native build                    # mypyc (pip install mypy)
+    python -m cfpl.native build --compiler cython  # Cython in pure-Python mode
+    python -m cfpl.native run tests/test8.txt      # cfpl, compiled
+
+The sources stay the reference implementation: the extension modules go
+to build/<compiler>/cfpl/, and are only used once that directory is ahead
+of the sources on the package path, which `enable()` does. It has to run
+before lexer, parser or interpreter are first imported:
+
+    from cfpl import native
+    native.enable()
+    from cfpl import pool
+
+mypyc turns Lexer, Parser and Interpreter into native classes. Their
+instances have no `__dict__`, so the debugger and metrics, which
+instrument instances, need the pure-Python build or, for the debugger,
+an interpreted subclass (StackInterpreter, QuickeningInterpreter).
+Cython keeps them ordinary Python classes.
+"""
+
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+PACKAGE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(PACKAGE)
+MODULES = ['lexer', 'parser', 'interpreter']
+COMPILERS = ['mypyc', 'cython']
+
+
+def directory(compiler):
+    return os.path.join(ROOT, 'build', compiler)
+
+
+def built(compiler):
+    """True if every module has an extension in build/<compiler>/cfpl/."""
+    package = os.path.join(directory(compiler), 'cfpl')
+    return all(glob.glob(os.path.join(package, module + '.*.so')) or
+               glob.glob(os.path.join(package, module + '.*.pyd'))
+               for module in MODULES)
+
+
+def build(compiler='mypyc'):
+    """Compile MODULES into build/<compiler>/ and return that directory."""
+    if compiler not in COMPILERS:
+        raise Exception('Unknown compiler ' + repr(compiler))
+    output = directory(compiler)
+    # build a copy of the package, so nothing is written next to the sources
+    work = tempfile.mkdtemp(prefix='cfpl-' + compiler + '-')
+    try:
+        os.makedirs(os.path.join(work, 'cfpl'))
+        for source in glob.glob(os.path.join(PACKAGE, '*.py')):
+            shutil.copy(source, os.path.join(work, 'cfpl'))
+        sources = [os.path.join('cfpl', module + '.py') for module in MODULES]
+        if compiler == 'mypyc':
+            command = [sys.executable, '-m', 'mypyc'] + sources
+        else:
+            command = [sys.executable, '-m', 'Cython.Build.Cythonize', '-i', '-3', '-q'] + sources
+        env = dict(os.environ)
+        env.pop('PYTHONPATH', None)
+        result = subprocess.run(command, cwd=work, env=env, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, universal_newlines=True)
+        if result.returncode != 0:
+            raise Exception(compiler + ' build failed:\n' + result.stdout)
+        if os.path.isdir(output):
+            shutil.rmtree(output)
+        os.makedirs(os.path.join(output, 'cfpl'))
+        # mypyc also writes a shared runtime module, outside the package
+        for pattern in ('*.so', '*.pyd', os.path.join('cfpl', '*.so'), os.path.join('cfpl', '*.pyd')):
+            for extension in glob.glob(os.path.join(work, pattern)):
+                shutil.copy(extension, os.path.join(output, os.path.dirname(pattern)))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return output
+
+
+def enable(compiler=None):
+    """Put a compiled build ahead of the sources on the package path.
+
+    Uses build/<compiler>/, or the first of COMPILERS that has been
+    built; returns the directory, or None (and changes nothing) if there
+    is no build or the modules have already been imported.
+    """
+    if any(__package__ + '.' + module in sys.modules for module in MODULES):
+        return None
+    for name in [compiler] if compiler else COMPILERS:
+        if built(name):
+            sys.path.insert(0, directory(name))
+            sys.modules[__package__].__path__.insert(0, os.path.join(directory(name), 'cfpl'))
+            return directory(name)
+    return None
+
+
+def compiled(module):
+    """True if `module` was loaded from an extension, not from its source."""
+    return not getattr(module, '__file__', '').endswith('.py')
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='CFPL compiled build')
+    commands = arg_parser.add_subparsers(dest='command')
+    build_command = commands.add_parser('build', help='compile the lexer, parser and interpreter')
+    build_command.add_argument('--compiler', choices=COMPILERS, default='mypyc')
+    run_command = commands.add_parser('run', help='run cfpl with the compiled modules')
+    run_command.add_argument('--compiler', choices=COMPILERS)
+    # everything else goes to cfpl
+    args, arguments = arg_parser.parse_known_args()
+    if arguments and args.command != 'run':
+        arg_parser.error('unrecognized arguments: ' + ' '.join(arguments))
+
+    if args.command == 'build':
+        print(build(args.compiler))
+    elif args.command == 'run':
+        if enable(args.compiler) is None:
+            raise SystemExit('No compiled build; run `python -m cfpl.native build` first')
+        from . import interpreter
+        sys.argv = ['cfpl'] + arguments
+        interpreter.main()
+    else:
+        arg_parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
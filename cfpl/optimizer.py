@@ -0,0 +1,442 @@
+# Tree optimizers
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import collections
+
+from .constants import (
+    ASSIGN, BOOL, CHAR, DIV, FLOAT, GREATER_EQUAL, GREATER_THAN, ID, INT, INT_CONST, LESSER_EQUAL,
+    LESSER_THAN, MINUS, MOD, MUL, PLUS,
+)
+from .ast import (
+    Assign, BinOp, Bool, Char, Compound, CountedLoop, IfStatement, Increment, Index, Input, Num,
+    String, Sum, Type, UnaryOp, Var, VarDecl, WhileStatement, walk,
+)
+from .token import Token
+from .cache import canonical
+from .hashcons import unshare
+
+
+ARITHMETIC = (PLUS, MINUS, MUL, DIV, MOD)
+FLIPPED = {
+    LESSER_THAN: GREATER_THAN,
+    LESSER_EQUAL: GREATER_EQUAL,
+    GREATER_THAN: LESSER_THAN,
+    GREATER_EQUAL: LESSER_EQUAL,
+}
+
+
+def assigned_names(node):
+    """Counter of the variable names a subtree may assign, and how often."""
+    counts = collections.Counter()
+    for child in walk(node):
+        if isinstance(child, (Assign, Increment)):
+            target = child.left if isinstance(child, Assign) else child
+            if isinstance(target.value, str):
+                counts[target.value] += 1
+        elif isinstance(child, BinOp) and child.op.type == ASSIGN:
+            # chained assignment may write any variable named in the chain
+            for part in walk(child):
+                if isinstance(part, Var):
+                    counts[part.value] += 1
+        elif isinstance(child, Input):
+            for var in child.value:
+                counts[var.value] += 1
+    return counts
+
+
+def read_names(node):
+    """Every variable name that appears in a subtree."""
+    return set(child.value for child in walk(node)
+               if isinstance(child, (Var, Index)) and isinstance(child.value, str))
+
+
+def located(node, original):
+    """Give a rewritten statement the source line of the one it replaces."""
+    if hasattr(original, 'line'):
+        node.line = original.line
+    return node
+
+
+def has_chain(node):
+    return any(isinstance(child, BinOp) and child.op.type == ASSIGN for child in walk(node))
+
+
+class Optimizer(object):
+    """Shared bookkeeping for passes that rewrite a parsed Program in place.
+
+    A pass subclasses it with a `run(compound)` method, which `optimize`
+    calls on the program's compound statement. `types` maps each scalar
+    variable to its declared type (arrays map to None), and `temporary`
+    declares compiler temporaries named `$t<n>`, which no CFPL identifier
+    can collide with.
+    """
+
+    def __init__(self):
+        self.stats = collections.Counter()
+
+    def optimize(self, tree):
+        block = tree.block
+        self.declarations = block.declarations
+        self.types = {}
+        for declaration in block.declarations:
+            var = declaration.var_node
+            self.types[var.value] = declaration.type_node.value if var.size is None else None
+        self.temporaries = {}
+        # later passes over the same tree keep numbering after earlier ones
+        self.count = sum(1 for name in self.types if name.startswith('$t'))
+        # passes rewrite expressions in place; an interned tree shares them
+        unshare(block.compound_statement)
+        self.run(block.compound_statement)
+        return tree
+
+    def numeric_type(self, node):
+        """INT or FLOAT for an expression that cannot raise or have side effects, else None."""
+        kind = type(node)
+        if kind is Var:
+            data_type = self.types.get(node.value)
+            return data_type if data_type in (INT, FLOAT) else None
+        if kind is Num:
+            return INT if node.token.type == INT_CONST else FLOAT
+        if kind is UnaryOp:
+            return self.numeric_type(node.expr) if node.op.type in (PLUS, MINUS) else None
+        if kind is BinOp and node.op.type in ARITHMETIC:
+            left = self.numeric_type(node.left)
+            right = self.numeric_type(node.right)
+            if left is None or right is None:
+                return None
+            if node.op.type in (DIV, MOD) and not (type(node.right) is Num and node.right.value != 0):
+                return None
+            if node.op.type == DIV or FLOAT in (left, right):
+                return FLOAT
+            return INT
+        return None
+
+    def assignable(self, name, expr):
+        """Whether storing `expr` in `name` can neither raise nor have side effects."""
+        data_type = self.types.get(name)
+        if data_type in (INT, FLOAT):
+            return self.numeric_type(expr) is not None
+        if type(expr) is Var:
+            return data_type is not None and self.types.get(expr.value) == data_type
+        return (data_type == CHAR and type(expr) in (Char, String) or
+                data_type == BOOL and type(expr) is Bool)
+
+    def temporary(self, expr, data_type, before):
+        """A Var for a temporary holding `expr`, assigned by a statement added to `before`."""
+        key = (canonical(expr), data_type)
+        name = self.temporaries.get(key)
+        if name is None:
+            name = '$t' + str(self.count)
+            self.count += 1
+            self.declarations.append(VarDecl(Var(Token(ID, name)), Type(Token(data_type, data_type))))
+            self.types[name] = data_type
+            self.temporaries[key] = name
+        if not any(statement.left.value == name for statement in before):
+            before.append(Assign(Var(Token(ID, name)), Token(ASSIGN, '='), expr))
+        return Var(Token(ID, name))
+
+
+class LoopOptimizer(Optimizer):
+    """Rewrite WHILE loops, innermost first.
+
+    - subexpressions that cannot raise and only read variables the loop
+      never assigns are computed once into temporaries before the loop;
+    - assignments of such values that run on every pass, before any read
+      of their variable, move in front of the loop, behind an IF on the
+      loop condition so a loop that never runs still assigns nothing;
+    - `x = (x + c)` on an INT becomes an Increment;
+    - loops of the form `WHILE (i < limit)` whose body bumps the INT `i`
+      once per pass become a CountedLoop, unrolled `unroll` times when the
+      body has at most `max_unroll_statements` statements.
+    """
+
+    def __init__(self, unroll=4, max_unroll_statements=8):
+        Optimizer.__init__(self)
+        self.unroll = unroll
+        self.max_unroll_statements = max_unroll_statements
+
+    def run(self, compound):
+        self.optimize_compound(compound)
+
+    def optimize_compound(self, compound):
+        children = []
+        for child in compound.children:
+            children.extend(self.optimize_statement(child))
+        compound.children = children
+
+    def optimize_statement(self, node):
+        if isinstance(node, Compound):
+            self.optimize_compound(node)
+        elif isinstance(node, IfStatement):
+            if isinstance(node.value, Compound):
+                self.optimize_compound(node.value)
+            if node.els is not None:
+                self.optimize_compound(node.els)
+        elif isinstance(node, WhileStatement) and isinstance(node.value, Compound):
+            self.optimize_compound(node.value)
+            return self.optimize_loop(node)
+        return [node]
+
+    def optimize_loop(self, loop):
+        assigned = assigned_names(loop)
+        before = []
+        loop.expr = self.hoist_expression(loop.expr, assigned, before)
+        self.hoist_statement(loop.value, assigned, before)
+        self.reduce(loop.value)
+        hoisted = self.hoist_assignments(loop, assigned)
+        node = self.counted_loop(loop, assigned) or loop
+        if hoisted:
+            guard = Compound()
+            guard.children = hoisted + [node]
+            node = located(IfStatement(loop.token, loop.expr, guard), loop)
+        return before + [node]
+
+    def invariant(self, node, assigned):
+        return not any(
+            isinstance(child, (Index, Sum)) or
+            isinstance(child, BinOp) and child.op.type == ASSIGN or
+            isinstance(child, Var) and assigned[child.value]
+            for child in walk(node))
+
+    def hoist_expression(self, node, assigned, before):
+        if not isinstance(node, (Var, Num)) and self.invariant(node, assigned):
+            data_type = self.numeric_type(node)
+            if data_type is not None:
+                self.stats['hoisted_subexpressions'] += 1
+                return self.temporary(node, data_type, before)
+        if isinstance(node, BinOp) and node.op.type != ASSIGN:
+            node.left = self.hoist_expression(node.left, assigned, before)
+            node.right = self.hoist_expression(node.right, assigned, before)
+        elif isinstance(node, UnaryOp):
+            node.expr = self.hoist_expression(node.expr, assigned, before)
+        return node
+
+    def hoist_statement(self, node, assigned, before):
+        if isinstance(node, Assign) and str(node.left.value).startswith('$t'):
+            pass  # an inner loop's temporary, moved out whole by hoist_assignments
+        elif isinstance(node, Assign):
+            node.right = self.hoist_expression(node.right, assigned, before)
+            if isinstance(node.left, Index):
+                node.left.index = self.hoist_expression(node.left.index, assigned, before)
+        elif isinstance(node, (IfStatement, WhileStatement)):
+            node.expr = self.hoist_expression(node.expr, assigned, before)
+            self.hoist_statement(node.value, assigned, before)
+            if isinstance(node, IfStatement) and node.els is not None:
+                self.hoist_statement(node.els, assigned, before)
+        elif isinstance(node, CountedLoop):
+            self.hoist_statement(node.value, assigned, before)
+        elif isinstance(node, Compound):
+            for child in node.children:
+                self.hoist_statement(child, assigned, before)
+
+    def hoist_assignments(self, loop, assigned):
+        if has_chain(loop.expr):
+            return []
+        cond_reads = read_names(loop.expr)
+        hoisted = []
+        kept = []
+        reads = set()
+        for statement in loop.value.children:
+            if (isinstance(statement, Assign) and type(statement.left) is Var and
+                    assigned[statement.left.value] == 1 and
+                    statement.left.value not in cond_reads and
+                    statement.left.value not in reads and
+                    self.invariant(statement.right, assigned) and
+                    self.assignable(statement.left.value, statement.right)):
+                hoisted.append(statement)
+                self.stats['hoisted_assignments'] += 1
+            else:
+                kept.append(statement)
+                reads |= read_names(statement)
+        loop.value.children = kept
+        return hoisted
+
+    def reduce(self, node):
+        """Turn `x = (x + c)` / `x = (x - c)` on INT variables into Increments."""
+        if isinstance(node, Compound):
+            node.children = [self.increment(child) or child for child in node.children]
+            for child in node.children:
+                self.reduce(child)
+        elif isinstance(node, (IfStatement, WhileStatement, CountedLoop)):
+            self.reduce(node.value)
+            if isinstance(node, IfStatement) and node.els is not None:
+                self.reduce(node.els)
+
+    def increment(self, node):
+        if not (isinstance(node, Assign) and type(node.left) is Var and
+                self.types.get(node.left.value) == INT and type(node.right) is BinOp):
+            return None
+        name = node.left.value
+        left, op, right = node.right.left, node.right.op.type, node.right.right
+        if op == PLUS and type(left) is Num and type(right) is Var:
+            left, right = right, left
+        if not (op in (PLUS, MINUS) and type(left) is Var and left.value == name and
+                type(right) is Num and right.token.type == INT_CONST):
+            return None
+        self.stats['increments'] += 1
+        return located(Increment(node.left.token, right.value if op == PLUS else -right.value), node)
+
+    def counted_loop(self, loop, assigned):
+        cond = loop.expr
+        if not (type(cond) is BinOp and cond.op.type in FLIPPED):
+            return None
+        left, right, comparison = cond.left, cond.right, cond.op.type
+        if not (type(left) is Var and self.types.get(left.value) == INT):
+            left, right, comparison = right, left, FLIPPED[comparison]
+        if not (type(left) is Var and self.types.get(left.value) == INT):
+            return None
+        counter = left.value
+        if type(right) is Var:
+            if self.types.get(right.value) not in (INT, FLOAT) or assigned[right.value]:
+                return None
+        elif type(right) is not Num:
+            return None
+        if assigned[counter] != 1 or has_chain(loop.value):
+            return None
+        increments = [child for child in loop.value.children
+                      if isinstance(child, Increment) and child.value == counter]
+        if len(increments) != 1 or increments[0].step == 0:
+            return None
+        unroll = 1
+        if self.unroll > 1 and len(loop.value.children) <= self.max_unroll_statements:
+            unroll = self.unroll
+            self.stats['unrolled_loops'] += 1
+        self.stats['counted_loops'] += 1
+        return located(CountedLoop(loop.token, cond, loop.value, counter, comparison, right,
+                                   increments[0].step, unroll), loop)
+
+
+def subexpressions(holder, field):
+    """(holder, field, node) for the expression at `holder.field` and every operand below it."""
+    node = getattr(holder, field)
+    yield holder, field, node
+    if isinstance(node, BinOp) and node.op.type != ASSIGN:
+        for item in subexpressions(node, 'left'):
+            yield item
+        for item in subexpressions(node, 'right'):
+            yield item
+    elif isinstance(node, UnaryOp):
+        for item in subexpressions(node, 'expr'):
+            yield item
+
+
+class DataflowOptimizer(Optimizer):
+    """Common-subexpression elimination and dead-store removal per block.
+
+    Within each Compound, an arithmetic subtree that cannot raise and is
+    computed by two or more statements with no write to its operands in
+    between is computed once into a temporary. Then a backward liveness
+    pass drops assignments whose value no later statement can read; IF
+    joins the liveness of both branches and loops keep everything they
+    read alive, so control flow is handled conservatively. Only stores
+    that cannot raise are dropped, so errors are unchanged as well.
+    """
+
+    def run(self, compound):
+        self.eliminate(compound)
+        self.live(compound, set())
+
+    def blocks(self, node):
+        """Every Compound directly under a statement."""
+        if isinstance(node, (IfStatement, WhileStatement, CountedLoop)):
+            for child in (node.value, getattr(node, 'els', None)):
+                if isinstance(child, Compound):
+                    yield child
+        elif isinstance(node, Compound):
+            yield node
+
+    def sites(self, statement):
+        """(holder, field) of the expressions a statement evaluates once, before any write."""
+        if has_chain(statement):
+            return
+        if isinstance(statement, Assign):
+            yield statement, 'right'
+            if isinstance(statement.left, Index):
+                yield statement.left, 'index'
+        elif isinstance(statement, IfStatement):
+            yield statement, 'expr'
+
+    def eliminate(self, compound):
+        for child in compound.children:
+            for block in self.blocks(child):
+                self.eliminate(block)
+        while self.common_subexpression(compound):
+            pass
+
+    def common_subexpression(self, compound):
+        """Replace the largest repeated subexpression in `compound`; False if there is none."""
+        groups = []
+        current = {}
+        for index, statement in enumerate(compound.children):
+            for holder, field in self.sites(statement):
+                for parent, name, node in subexpressions(holder, field):
+                    if isinstance(node, BinOp) and self.numeric_type(node) is not None:
+                        key = canonical(node)
+                        if key not in current:
+                            current[key] = (node, read_names(node), [])
+                        current[key][2].append((index, parent, name))
+            written = assigned_names(statement)
+            for key, group in list(current.items()):
+                if group[1] & set(written):
+                    groups.append((key, group))
+                    del current[key]
+        groups.extend(current.items())
+        groups = [(key, group) for key, group in groups if len(group[2]) > 1]
+        if not groups:
+            return False
+        key, (node, reads, occurrences) = max(groups, key=lambda item: len(item[0]))
+        before = []
+        temp = self.temporary(node, self.numeric_type(node), before)
+        for index, parent, name in occurrences:
+            setattr(parent, name, Var(temp.token))
+        first = occurrences[0][0]
+        compound.children[first:first] = before
+        self.stats['common_subexpressions'] += len(occurrences) - 1
+        return True
+
+    def live(self, compound, live):
+        """Drop dead stores from `compound`; return the names live on entry.
+
+        `live` holds the names that may be read after the block runs.
+        """
+        live = set(live)
+        children = []
+        for statement in reversed(compound.children):
+            if isinstance(statement, (Assign, Increment)) and self.dead(statement, live):
+                self.stats['dead_stores'] += 1
+                continue
+            if isinstance(statement, Compound):
+                live = self.live(statement, live)
+            elif isinstance(statement, IfStatement):
+                after = live
+                live = self.live(statement.value, after) if isinstance(statement.value, Compound) \
+                    else after | read_names(statement.value)
+                if statement.els is not None:
+                    live |= self.live(statement.els, after)
+                else:
+                    live |= after
+                live |= read_names(statement.expr)
+            elif isinstance(statement, (WhileStatement, CountedLoop)):
+                # a pass may read what any pass writes: keep everything the loop reads
+                live = live | read_names(statement)
+                if isinstance(statement.value, Compound):
+                    self.live(statement.value, live)
+            elif isinstance(statement, Assign) and type(statement.left) is Var and \
+                    self.types.get(statement.left.value) is not None and not has_chain(statement):
+                live.discard(statement.left.value)
+                live |= read_names(statement.right)
+            elif isinstance(statement, Increment):
+                live.add(statement.value)
+            else:
+                live |= read_names(statement)
+            children.append(statement)
+        children.reverse()
+        compound.children = children
+        return live
+
+    def dead(self, statement, live):
+        if isinstance(statement, Increment):
+            return statement.value not in live
+        name = statement.left.value
+        return (type(statement.left) is Var and name not in live and
+                not has_chain(statement) and self.assignable(name, statement.right))
@@ -1,16 +1,44 @@
 # Code parser
 # Copyright 2019 Art Layese <artiskool@gmail.com>
 
-from constants import *
-from ast import *
+from __future__ import annotations
+
+# for the type checker only, as in lexer.py
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, NoReturn, Optional
+
+    from .hashcons import Interner
+
+from .constants import (
+    AMPERSAND, AND, AS, ASSIGN, BOOL, BOOL_CONST, CHAR, CHAR_CONST, COLON, COMMA, DIV, ELSE, EOF,
+    EQUAL, FLOAT, FLOAT_CONST, GREATER_EQUAL, GREATER_THAN, ID, IF, INPUT, INT, INT_CONST,
+    LEFT_BRACE, LEFT_PAREN, LESSER_EQUAL, LESSER_THAN, MINUS, MOD, MUL, NOT, NOT_EQUAL, OR,
+    OUTPUT, PLUS, RIGHT_BRACE, RIGHT_PAREN, START, STOP, STRING_CONST, SUM, VAR, WHILE,
+)
+from .ast import (
+    AST, Assign, BinOp, Block, Bool, Char, Compound, IfStatement, Index, Input, NoOp, Num,
+    Output, Program, String, Sum, Type, UnaryOp, Var, VarDecl, WhileStatement,
+)
+from .lexer import Lexer
+from .token import Token
 
 class Parser(object):
-    def __init__(self, lexer):
+    # declared for compiled builds (see native.py)
+    lexer: Lexer
+    current_token: Token
+    current_line: int
+    interner: Optional[Interner]
+
+    def __init__(self, lexer: Lexer, interner: Optional[Interner] = None) -> None:
         self.lexer = lexer
+        # shares equal expression subtrees when given (see hashcons.py)
+        self.interner = interner
         # set current token to the first token taken from the input
         self.current_token = self.lexer.get_next_token()
+        self.current_line = self.lexer.token_line
 
-    def error(self):
+    def error(self) -> NoReturn:
         line = str(self.lexer.line + 1)
         if self.current_token.type == EOF:
             line = str(self.lexer.line - 1)
@@ -18,28 +46,35 @@ class Parser(object):
         msg = 'Invalid syntax on line ' + line + ': ' + self.lexer.text
         raise Exception(msg)
 
-    def keep(self, token_type):
+    def keep(self, token_type: str) -> None:
         # compare the current token type with the passed token
         # type and if they match then "keep" the current token
         # and assign the next token to the self.current_token,
         # otherwise raise an exception.
         if self.current_token.type == token_type:
             self.current_token = self.lexer.get_next_token()
+            self.current_line = self.lexer.token_line
         else:
             self.error()
 
-    def block(self):
+    def shared(self, node: AST) -> AST:
+        """`node`, or the equal node the interner already holds"""
+        if self.interner is None:
+            return node
+        return self.interner.intern(node)
+
+    def block(self) -> Block:
         """block : declarations compound_statement"""
         declaration_nodes = self.declarations()
         compound_statement_node = self.compound_statement()
         node = Block(declaration_nodes, compound_statement_node)
         return node
 
-    def declarations(self):
+    def declarations(self) -> List[VarDecl]:
         """declarations : VAR (variable_declaration)+
                         | empty
         """
-        declarations = []
+        declarations: List[VarDecl] = []
         """
         if self.current_token.type == VAR:
             self.keep(VAR)
@@ -57,11 +92,19 @@ class Parser(object):
 
         return declarations
 
-    def variable_declaration(self):
-        """variable_declaration : ID (COMMA ID [= default value])* AS type_spec"""
+    def array_size(self, node: Var) -> None:
+        """array_size : [LEFT_BRACE expr RIGHT_BRACE]"""
+        if self.current_token.type == LEFT_BRACE:
+            self.keep(LEFT_BRACE)
+            node.size = self.expr()
+            self.keep(RIGHT_BRACE)
+
+    def variable_declaration(self) -> List[VarDecl]:
+        """variable_declaration : ID [array_size] (COMMA ID [array_size] [= default value])* AS type_spec"""
         node = Var(self.current_token)
         var_nodes = [node]  # first ID
         self.keep(ID)
+        self.array_size(node)
 
         if self.current_token.type == ASSIGN:
             self.keep(ASSIGN)
@@ -72,6 +115,7 @@ class Parser(object):
             node = Var(self.current_token)
             var_nodes.append(node)
             self.keep(ID)
+            self.array_size(node)
 
             if self.current_token.type == ASSIGN:
                 self.keep(ASSIGN)
@@ -86,7 +130,7 @@ class Parser(object):
         ]
         return var_declarations
 
-    def type_spec(self):
+    def type_spec(self) -> Type:
         """type_spec : INT
                      | FLOAT
                      | CHAR
@@ -104,7 +148,7 @@ class Parser(object):
         node = Type(token)
         return node
 
-    def compound_statement(self):
+    def compound_statement(self) -> Compound:
         """
         compound_statement: START statement_list STOP
         """
@@ -118,7 +162,7 @@ class Parser(object):
 
         return root
 
-    def statement_list(self):
+    def statement_list(self) -> List[AST]:
         """
         statement_list : statement
                        | statement statement_list
@@ -136,12 +180,14 @@ class Parser(object):
                 break
         return results
 
-    def statement(self):
+    def statement(self) -> AST:
         """
         statement : compound_statement
                   | assignment_statement
                   | empty
         """
+        line = self.current_line
+        node: AST
         if self.current_token.type == START:
             node = self.compound_statement()
         elif self.current_token.type == ID:
@@ -149,38 +195,38 @@ class Parser(object):
         elif self.current_token.type == OUTPUT:
             self.keep(OUTPUT)
             self.keep(COLON)
-            self.current_token.value = self.output_statement()
-            node = Output(self.current_token)
+            node = Output(Token(OUTPUT, self.output_statement()))
         elif self.current_token.type == INPUT:
             self.keep(INPUT)
             self.keep(COLON)
-            self.current_token.value = self.input_statement()
-            node = Input(self.current_token)
+            node = Input(Token(INPUT, self.input_statement()))
         elif self.current_token.type == IF:
             current_token = self.current_token
             self.keep(IF)
             self.keep(LEFT_PAREN)
             expression = self.expr()
             self.keep(RIGHT_PAREN)
-            current_token.value = self.compound_statement()
+            body = self.compound_statement()
             els = None
             if self.current_token.type == ELSE:
                 self.keep(ELSE)
                 els = self.compound_statement()
-            node = IfStatement(current_token, expression, els)
+            node = IfStatement(current_token, expression, body, els)
         elif self.current_token.type == WHILE:
             current_token = self.current_token
             self.keep(WHILE)
             self.keep(LEFT_PAREN)
             expression = self.expr()
             self.keep(RIGHT_PAREN)
-            current_token.value = self.compound_statement()
-            node = WhileStatement(current_token, expression)
+            body = self.compound_statement()
+            node = WhileStatement(current_token, expression, body)
         else:
-            node = self.empty()
+            return self.empty()
+        if not isinstance(node, Compound):
+            node.line = line  # for debugger breakpoints and tracing
         return node
 
-    def input_statement(self):
+    def input_statement(self) -> List[Var]:
         """
         input_statement: INPUT: (variable)*
         """
@@ -197,14 +243,14 @@ class Parser(object):
 
         return var_nodes
 
-    def output_statement(self):
+    def output_statement(self) -> List[AST]:
         """
         output_statement : expr (& expr)*
         """
-        terms = []
+        terms: List[AST] = []
         current_pos = self.lexer.pos
         while True:
-            if self.current_token.type == STRING_CONST:
+            if self.current_token.type in (STRING_CONST, BOOL_CONST):
                 terms.append(self.expr())
             elif self.current_token.type == ID:
                 terms.append(self.variable())
@@ -214,11 +260,11 @@ class Parser(object):
                 self.keep(AMPERSAND)
         return terms
 
-    def if_statement(self):
+    def if_statement(self) -> List[AST]:
         """
         output_statement : expr (& expr)*
         """
-        terms = []
+        terms: List[AST] = []
         current_pos = self.lexer.pos
         while True:
             if self.current_token.type == STRING_CONST:
@@ -231,7 +277,7 @@ class Parser(object):
                 self.keep(AMPERSAND)
         return terms
 
-    def assignment_statement(self):
+    def assignment_statement(self) -> Assign:
         """
         assignment_statement : variable ASSIGN expr
         """
@@ -243,19 +289,29 @@ class Parser(object):
         node = Assign(left, token, right)
         return node
 
-    def variable(self):
+    def variable(self) -> AST:
         """
         variable : ID
+                 | ID LEFT_BRACE expr RIGHT_BRACE
         """
-        node = Var(self.current_token)
+        token = self.current_token
         self.keep(ID)
-        return node
-
-    def empty(self):
+        return self.element(token)
+
+    def element(self, token: Token) -> AST:
+        """The variable named by `token`, just kept, or an element of it"""
+        if self.current_token.type == LEFT_BRACE:
+            self.keep(LEFT_BRACE)
+            index = self.expr()
+            self.keep(RIGHT_BRACE)
+            return Index(token, index)
+        return self.shared(Var(token))
+
+    def empty(self) -> NoOp:
         """An empty production"""
         return NoOp()
 
-    def expr(self):
+    def expr(self) -> AST:
         """
         expr : term ((PLUS | MINUS | ASSIGN | GREATER_THAN | LESSER_THAN | GREATER_EQUAL | LESSER_EQUAL | EQUAL | NOT_EQUAL) term)*
         """
@@ -282,11 +338,11 @@ class Parser(object):
             elif token.type == NOT_EQUAL:
                 self.keep(NOT_EQUAL)
 
-            node = BinOp(left=node, op=token, right=self.term())
+            node = self.shared(BinOp(left=node, op=token, right=self.term()))
 
         return node
 
-    def term(self):
+    def term(self) -> AST:
         """term : factor ((MUL | MOD | DIV | AND | OR | NOT) factor)*"""
         node = self.factor()
 
@@ -305,11 +361,11 @@ class Parser(object):
             elif token.type == NOT:
                 self.keep(NOT)
 
-            node = BinOp(left=node, op=token, right=self.factor())
+            node = self.shared(BinOp(left=node, op=token, right=self.factor()))
 
         return node
 
-    def factor(self):
+    def factor(self) -> AST:
         """factor : PLUS factor
                   | MINUS factor
                   | INT_CONST
@@ -317,23 +373,25 @@ class Parser(object):
                   | LEFT_PAREN expr RIGHT_PAREN
                   | SINGLE_QOUTE expr SINGLE_QOUTE
                   | DOUBLE_QOUTE expr DOUBLE_QOUTE
+                  | SUM LEFT_PAREN expr RIGHT_PAREN
                   | variable
         """
         token = self.current_token
+        node: AST
         if token.type == PLUS:
             self.keep(PLUS)
-            node = UnaryOp(token, self.factor())
+            node = self.shared(UnaryOp(token, self.factor()))
             return node
         elif token.type == MINUS:
             self.keep(MINUS)
-            node = UnaryOp(token, self.factor())
+            node = self.shared(UnaryOp(token, self.factor()))
             return node
         elif token.type == INT_CONST:
             self.keep(INT_CONST)
-            return Num(token)
+            return self.shared(Num(token))
         elif token.type == FLOAT_CONST:
             self.keep(FLOAT_CONST)
-            return Num(token)
+            return self.shared(Num(token))
         elif token.type == LEFT_PAREN:
             self.keep(LEFT_PAREN)
             node = self.expr()
@@ -341,24 +399,36 @@ class Parser(object):
             return node
         elif token.type == CHAR_CONST:
             self.keep(CHAR_CONST)
-            return Char(token)
+            return self.shared(Char(token))
         elif token.type == STRING_CONST:
             self.keep(STRING_CONST)
-            return String(token)
+            return self.shared(String(token))
         elif token.type == BOOL_CONST:
             self.keep(BOOL_CONST)
-            return Bool(token)
+            return self.shared(Bool(token))
+        elif token.type == ID and token.value == SUM:
+            # not a keyword: SUM is a call only when a parenthesis follows,
+            # so programs can still name a variable SUM
+            self.keep(ID)
+            if self.current_token.type != LEFT_PAREN:
+                return self.element(token)
+            self.keep(LEFT_PAREN)
+            node = Sum(token, self.expr())
+            self.keep(RIGHT_PAREN)
+            return node
         else:
             return self.variable()
 
-    def parse(self):
+    def parse(self) -> Program:
         """
         block : declarations compound_statement
 
         declarations : VAR (variable_declaration)+
                      | empty
 
-        variable_declaration : ID (COMMA ID [= default value])* AS type_spec
+        variable_declaration : ID [array_size] (COMMA ID [array_size] [= default value])* AS type_spec
+
+        array_size : [LEFT_BRACE expr RIGHT_BRACE]
 
         type_spec : INT | CHAR | FLOAT | BOOL
 
@@ -384,9 +454,11 @@ class Parser(object):
                | INT_CONST
                | FLOAT_CONST
                | LEFT_PAREN expr RIGHT_PAREN
+               | SUM LEFT_PAREN expr RIGHT_PAREN
                | variable
 
         variable: ID
+                | ID LEFT_BRACE expr RIGHT_BRACE
         """
 
         block_node = self.block()
@@ -0,0 +1,391 @@
+# Partial evaluator
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+"""Specialize a program for some of its INPUT values.
+
+    >>> residual = specialize(tree, {'n': '10'})
+    >>> Interpreter(None, stdin=io.StringIO('2\\n')).visit(residual)
+
+`bindings` map variables read by INPUT to the text typed for them and
+hold for every INPUT of that variable. Run with the input lines of the
+values still open, the residual program prints exactly what the original
+prints with the full lines: an INPUT whose variables are all bound
+becomes an OUTPUT of its prompt and line, and any other INPUT with a
+bound variable reads only the others (see `ast.Input.fixed`).
+
+Values known before the run (declared defaults, constants, bound inputs
+and whatever is computed from them alone) are folded through assignments
+and expressions, with the interpreter's own arithmetic and conversions.
+An IF whose condition is known is replaced by its branch. A WHILE whose
+condition stays known is unrolled if it ends within `max_passes` passes
+and leaves at most `max_statements` residual statements; otherwise it
+stays a loop. A known value is only stored in its variable once
+something left in the residual program may read it.
+
+The residual tree shares unchanged subtrees with `tree`, which is left
+as it is, and runs, encodes (image.encode) and caches like any parsed
+program; there is no CFPL source for it, since a partly fixed INPUT has
+none.
+"""
+
+import collections
+
+from .constants import ASSIGN, AND, BOOL_CONST, FLOAT_CONST, ID, INT_CONST, OR, OUTPUT, STRING_CONST
+from .ast import (
+    Assign, BinOp, Block, Bool, Char, Compound, IfStatement, Index, Input, NoOp, Num, Output, Program,
+    String, Sum, UnaryOp, Var, WhileStatement,
+)
+from .token import Token
+from .arrays import show
+from .interpreter import Interpreter
+from .optimizer import assigned_names, has_chain, located, read_names
+
+
+CONSTANTS = (Num, Char, Bool, String)
+UNKNOWN = object()
+MAX_PASSES = 1000
+MAX_STATEMENTS = 1000
+
+
+def constant(value):
+    """A constant node that evaluates to `value`."""
+    if type(value) is bool:
+        return Bool(Token(BOOL_CONST, 'TRUE' if value else 'FALSE'))
+    if type(value) is int:
+        return Num(Token(INT_CONST, value))
+    if type(value) is float:
+        return Num(Token(FLOAT_CONST, value))
+    return String(Token(STRING_CONST, value))
+
+
+def statements(node):
+    if type(node) is Compound:
+        return node.children
+    return [node]
+
+
+def mentioned(node):
+    """Every variable a statement may read or assign."""
+    return read_names(node) | set(assigned_names(node))
+
+
+class PartialEvaluator(object):
+    """Builds the residual program of a tree for a set of INPUT bindings.
+
+    `stats` counts the folded expressions, assignments and INPUT values,
+    the resolved IFs, and the unrolled loops and their passes.
+    """
+
+    def __init__(self, max_passes=MAX_PASSES, max_statements=MAX_STATEMENTS):
+        self.max_passes = max_passes
+        self.max_statements = max_statements
+        self.stats = collections.Counter()
+
+    def specialize(self, tree, bindings):
+        block = tree.block
+        # a scratch interpreter evaluates whatever is known, so folding
+        # computes, converts and fails exactly as a run would
+        self.scratch = Interpreter(None)
+        self.types = self.scratch.DECLARED_VAR
+        self.arrays = set()
+        self.bindings = dict(bindings)
+        for name, text in self.bindings.items():
+            if ',' in text:
+                raise ValueError('Input for ' + repr(name) + ' has a comma: ' + repr(text))
+        # known values; `pending` are those not stored in their variable yet
+        self.known = {}
+        self.pending = set()
+        for declaration in block.declarations:
+            var = declaration.var_node
+            self.types[var.value] = declaration.type_node.value
+            if var.size is not None:
+                self.arrays.add(var.value)
+                continue
+            if var.default_value is not None:
+                # evaluated as visit_VarDecl does, from the defaults declared before it
+                value = self.expression(var.default_value)[0]
+            else:
+                value = {'INT': 0, 'FLOAT': 0, 'CHAR': '', 'BOOL': False}.get(declaration.type_node.value)
+            if value is not UNKNOWN:
+                value = self.coerce(var.value, value)
+            if value is not UNKNOWN:
+                self.known[var.value] = value
+        compound = Compound()
+        compound.children = self.block(statements(block.compound_statement))
+        return Program(Block(block.declarations, compound))
+
+    def coerce(self, name, value):
+        try:
+            return self.scratch.coerce_value(name, value)
+        except Exception:
+            return UNKNOWN
+
+    def compute(self, node):
+        self.scratch.GLOBAL_SCOPE = self.known
+        try:
+            return self.scratch.visit(node)
+        except Exception:
+            return UNKNOWN  # the residual program raises it when it gets there
+
+    def forget(self, names):
+        for name in names:
+            self.known.pop(name, None)
+            self.pending.discard(name)
+
+    def flush(self, names, out):
+        """Store the pending known values of `names` before something reads them."""
+        for name in sorted(self.pending & set(names)):
+            out.append(Assign(Var(Token(ID, name)), Token(ASSIGN, '='), constant(self.known[name])))
+            self.pending.discard(name)
+            self.stats['stores'] += 1
+
+    def expression(self, node):
+        """(value or UNKNOWN, residual node) of an expression."""
+        kind = type(node)
+        if kind in CONSTANTS:
+            return node.value, node
+        if kind is Var:
+            if node.value in self.known:
+                value = self.known[node.value]
+                return value, constant(value)
+            return UNKNOWN, node
+        if kind is BinOp and node.op.type != ASSIGN:
+            left_value, left = self.expression(node.left)
+            if left_value is not UNKNOWN and node.op.type in (AND, OR):
+                # AND and OR hand back an operand, and skip the right one if they can
+                if (node.op.type == AND) != bool(left_value):
+                    return left_value, left
+                return self.expression(node.right)
+            right_value, right = self.expression(node.right)
+            if left_value is not UNKNOWN and right_value is not UNKNOWN:
+                value = self.compute(BinOp(left, node.op, right))
+                if value is not UNKNOWN:
+                    self.stats['expressions'] += 1
+                    return value, constant(value)
+            if left is node.left and right is node.right:
+                return UNKNOWN, node
+            return UNKNOWN, BinOp(left, node.op, right)
+        if kind is UnaryOp:
+            value, expr = self.expression(node.expr)
+            if value is not UNKNOWN:
+                value = self.compute(UnaryOp(node.op, expr))
+                if value is not UNKNOWN:
+                    self.stats['expressions'] += 1
+                    return value, constant(value)
+            return UNKNOWN, node if expr is node.expr else UnaryOp(node.op, expr)
+        if kind is Index:
+            index = self.expression(node.index)[1]
+            return UNKNOWN, node if index is node.index else Index(node.token, index)
+        if kind is Sum:
+            expr = self.expression(node.expr)[1]
+            return UNKNOWN, node if expr is node.expr else Sum(node.token, expr)
+        return UNKNOWN, node
+
+    def block(self, nodes):
+        out = []
+        for node in nodes:
+            self.statement(node, out)
+        return out
+
+    def statement(self, node, out):
+        kind = type(node)
+        if kind is Compound:
+            for child in node.children:
+                self.statement(child, out)
+        elif kind is NoOp:
+            pass
+        elif kind is Assign and isinstance(node.left.value, str) and node.left.value in self.types \
+                and not has_chain(node.right):
+            self.assign(node, out)
+        elif kind is Output:
+            self.output(node, out)
+        elif kind is Input and all(var.value in self.types and var.value not in self.arrays
+                                   for var in node.value):
+            self.input(node, out)
+        elif kind is IfStatement:
+            self.branch(node, out)
+        elif kind is WhileStatement:
+            self.loop(node, out)
+        else:
+            # chained assignments and the optimizers' nodes run as they are
+            self.flush(mentioned(node), out)
+            out.append(node)
+            self.forget(assigned_names(node))
+
+    def assign(self, node, out):
+        name = node.left.value
+        value, right = self.expression(node.right)
+        if type(node.left) is Var and name not in self.arrays:
+            if value is not UNKNOWN:
+                value = self.coerce(name, value)
+            if value is not UNKNOWN:
+                self.known[name] = value
+                self.pending.add(name)
+                self.stats['assignments'] += 1
+                return
+            self.forget([name])
+        left = node.left
+        if type(left) is Index:
+            index = self.expression(left.index)[1]
+            if index is not left.index:
+                left = Index(left.token, index)
+        if left is node.left and right is node.right:
+            out.append(node)
+        else:
+            out.append(located(Assign(left, node.op, right), node))
+
+    def output(self, node, out):
+        items = []
+        for item in node.value:
+            kind = type(item)
+            if kind is Var and item.value in self.known:
+                value = self.known[item.value]
+                # formatted as visit_Output does for each type
+                data_type = self.types[item.value]
+                if data_type == 'INT':
+                    value = int(value)
+                elif data_type == 'FLOAT':
+                    value = float(value)
+                elif data_type == 'CHAR':
+                    value = value[0] if len(value) > 0 else value
+                text = show(value)
+            elif kind in CONSTANTS:
+                text = show(item.value)
+            else:
+                if kind is Index:
+                    item = self.expression(item)[1]
+                items.append(item)
+                continue
+            if items and type(items[-1]) is String:
+                items[-1] = String(Token(STRING_CONST, items[-1].value + text))
+            else:
+                items.append(String(Token(STRING_CONST, text)))
+        out.append(located(Output(Token(OUTPUT, items)), node))
+
+    def input(self, node, out):
+        names = [var.value for var in node.value]
+        texts = [self.bindings.get(name) for name in names]
+        if texts.count(None) == len(texts):
+            out.append(node)
+            self.forget(names)
+            return
+        try:
+            values = [self.scratch.input_value(name, text) if text is not None else UNKNOWN
+                      for name, text in zip(names, texts)]
+        except NameError as error:
+            raise ValueError(str(error))
+        self.stats['inputs'] += len(texts) - texts.count(None)
+        if None in texts:
+            residual = located(Input(node.token), node)
+            residual.fixed = texts
+            out.append(residual)
+            stored = True
+        else:
+            line = self.scratch.input_prompt(node) + ','.join(texts)
+            out.append(located(Output(Token(OUTPUT, [String(Token(STRING_CONST, line))])), node))
+            stored = False
+        for name, value in zip(names, values):
+            value = self.coerce(name, value) if value is not UNKNOWN else UNKNOWN
+            if value is UNKNOWN:
+                self.forget([name])
+                continue
+            self.known[name] = value
+            if stored:
+                self.pending.discard(name)
+            else:
+                self.pending.add(name)
+
+    def arm(self, node, known):
+        """Residual Compound for `node` run from `known`, storing what it sets, and what is known after."""
+        self.known = dict(known)
+        self.pending = set()
+        out = self.block(statements(node))
+        self.flush(self.pending, out)
+        compound = Compound()
+        compound.children = out
+        return compound, self.known
+
+    def branch(self, node, out):
+        value, expr = self.expression(node.expr)
+        if value is not UNKNOWN:
+            self.stats['ifs'] += 1
+            if value:
+                self.statement(node.value, out)
+            elif node.els is not None:
+                self.statement(node.els, out)
+            return
+        self.flush(mentioned(node), out)
+        known, pending = self.known, self.pending
+        body, after = self.arm(node.value, known)
+        els, other = None, known
+        if node.els is not None:
+            els, other = self.arm(node.els, known)
+        # what both ways leave the same is still known, and stored
+        self.known = dict((name, value) for name, value in after.items()
+                          if name in other and other[name] == value and type(other[name]) is type(value))
+        self.pending = pending
+        residual = IfStatement(node.token, expr, body, els)
+        out.append(located(residual, node))
+
+    def loop(self, node, out):
+        known, pending = dict(self.known), set(self.pending)
+        unrolled = []
+        passes = 0
+        while passes <= self.max_passes and len(unrolled) <= self.max_statements:
+            value = self.expression(node.expr)[0]
+            if value is UNKNOWN:
+                break
+            if not value:
+                self.stats['loops'] += 1
+                self.stats['passes'] += passes
+                out.extend(unrolled)
+                return
+            self.statement(node.value, unrolled)
+            passes += 1
+        # it stays a loop, run from where it started
+        self.known, self.pending = known, pending
+        self.flush(mentioned(node), out)
+        self.forget(assigned_names(node))
+        known, pending = self.known, self.pending
+        body = self.arm(node.value, known)[0]
+        self.known, self.pending = known, pending
+        expr = self.expression(node.expr)[1]
+        out.append(located(WhileStatement(node.token, expr, body), node))
+
+
+def specialize(tree, bindings, max_passes=MAX_PASSES, max_statements=MAX_STATEMENTS):
+    """The residual program of `tree` for `bindings` {variable: input text}."""
+    return PartialEvaluator(max_passes, max_statements).specialize(tree, bindings)
+
+
+def main():
+    import argparse
+    import sys
+    import time
+    from .lexer import Lexer
+    from .parser import Parser
+    from .ast import walk
+    arg_parser = argparse.ArgumentParser(description='CFPL partial evaluator')
+    arg_parser.add_argument('file', help='CFPL source file')
+    arg_parser.add_argument('--bind', action='append', default=[], metavar='NAME=TEXT',
+                            help='fix the input of variable NAME (repeatable)')
+    arg_parser.add_argument('--max-passes', type=int, default=MAX_PASSES, help='longest loop to unroll')
+    arg_parser.add_argument('--run', action='store_true', help='run the residual program with standard input')
+    args = arg_parser.parse_args()
+
+    bindings = dict(binding.split('=', 1) for binding in args.bind)
+    tree = Parser(Lexer(open(args.file, 'r').read())).parse()
+    evaluator = PartialEvaluator(args.max_passes)
+    start = time.perf_counter()
+    residual = evaluator.specialize(tree, bindings)
+    seconds = time.perf_counter() - start
+    nodes = [sum(1 for node in walk(program.block.compound_statement)) for program in (tree, residual)]
+    sys.stderr.write('specialized in {:.1f} ms: {} -> {} nodes, {}\n'.format(
+        seconds * 1000, nodes[0], nodes[1],
+        ' '.join(name + '=' + str(evaluator.stats[name]) for name in sorted(evaluator.stats))))
+    if args.run:
+        Interpreter(None).visit(residual)
+
+
+if __name__ == '__main__':
+    main()
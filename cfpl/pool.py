@@ -0,0 +1,101 @@
+# Thread pool execution
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import io
+import os
+import queue
+import threading
+
+from .lexer import Lexer
+from .parser import Parser
+from .interpreter import Interpreter
+
+
+def parse(source, interner=None):
+    """Parse `source` into a Program tree that can be run many times.
+
+    With a hashcons.Interner, equal expression subtrees share one node.
+    """
+    return Parser(Lexer(source), interner).parse()
+
+
+def run(program, inputs=(), engine=Interpreter):
+    """Run a source string or a parsed Program; return (output, error).
+
+    Each call gets its own interpreter, scope and captured I/O, and the
+    tree is only read, so any number of threads can run the same tree.
+    """
+    if isinstance(program, str):
+        try:
+            program = parse(program)
+        except Exception as e:
+            return '', str(e)
+    stdout = io.StringIO()
+    stdin = io.StringIO(''.join(line + '\n' for line in inputs))
+    try:
+        engine(None, stdout=stdout, stdin=stdin).visit(program)
+    except Exception as e:
+        return stdout.getvalue(), str(e)
+    return stdout.getvalue(), None
+
+
+class Job(object):
+    def __init__(self, program, inputs):
+        self.program = program
+        self.inputs = inputs
+        self.output = None
+        self.error = None
+        self.done = threading.Event()
+
+    def result(self, timeout=None):
+        """Wait for the run to finish and return (output, error)."""
+        if not self.done.wait(timeout):
+            raise RuntimeError('Job still running')
+        return self.output, self.error
+
+
+class ThreadPool(object):
+    """Fixed set of threads running CFPL programs from one queue.
+
+    On a free-threaded CPython (3.13t and later) the threads run programs
+    in parallel; with the GIL they interleave.
+    """
+
+    def __init__(self, workers=None, engine=Interpreter):
+        self.engine = engine
+        self.jobs = queue.Queue()
+        self.threads = [threading.Thread(target=self.work, daemon=True)
+                        for i in range(workers or os.cpu_count() or 1)]
+        for thread in self.threads:
+            thread.start()
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            job.output, job.error = run(job.program, job.inputs, self.engine)
+            job.done.set()
+
+    def submit(self, program, inputs=()):
+        """Queue a source string or parsed Program; returns a Job."""
+        job = Job(program, inputs)
+        self.jobs.put(job)
+        return job
+
+    def map(self, programs, inputs=()):
+        """Run every program and return their (output, error) pairs in order."""
+        jobs = [self.submit(program, inputs) for program in programs]
+        return [job.result() for job in jobs]
+
+    def shutdown(self):
+        for thread in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,246 @@
+# Self-specializing (quickening) interpreter
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import collections
+import operator
+
+from .ast import BinOp, UnaryOp, Num, Char, Bool, String, Var
+from .arrays import Array
+from .constants import (
+    BOOL, CHAR, DIV, EQUAL, FLOAT, GREATER_EQUAL, GREATER_THAN, INT, LESSER_EQUAL, LESSER_THAN,
+    MINUS, MOD, MUL, NOT_EQUAL, PLUS,
+)
+from .interpreter import Interpreter
+
+
+# the generic visit_BinOp computes exactly these for every operand type
+OPERATORS = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    MUL: operator.mul,
+    DIV: operator.truediv,
+    MOD: operator.mod,
+    GREATER_THAN: operator.gt,
+    LESSER_THAN: operator.lt,
+    GREATER_EQUAL: operator.ge,
+    LESSER_EQUAL: operator.le,
+    EQUAL: operator.eq,
+    NOT_EQUAL: lambda left, right: bool(left != right),
+}
+
+CONSTANTS = (Num, Char, Bool, String)
+
+# (declared type, value type): conversion coerce_value would apply, if any
+STORES = {
+    (INT, int): None,
+    (INT, float): int,
+    (FLOAT, float): None,
+    (FLOAT, int): float,
+    (CHAR, str): None,
+    (BOOL, bool): None,
+}
+
+WARMUP = 8
+MAX_BACKOFF = 4096
+
+
+def pure(node):
+    """True if evaluating `node` twice is the same as evaluating it once."""
+    if type(node) in CONSTANTS or type(node) is Var:
+        return True
+    if type(node) is UnaryOp:
+        return pure(node.expr)
+    if type(node) is BinOp:
+        return node.op.type in OPERATORS and pure(node.left) and pure(node.right)
+    return False
+
+
+class QuickeningInterpreter(Interpreter):
+    """Interpreter whose BinOp and Assign nodes specialize on observed types.
+
+    Every node gets a handler in `self.quick`, keyed by the node, the
+    first time it runs. BinOp and scalar Assign nodes start with an
+    adaptive handler that counts down `WARMUP` runs and then swaps
+    itself for one specialized to the types it just saw (`PLUS int,int`,
+    `store INT<-float`), with the operator fixed and Var and constant
+    operands read inline. A specialized handler checks the types with
+    one `type(x) is T` guard; when the guard fails the node goes back to
+    the adaptive handler, with a warmup that doubles each time, and runs
+    the generic code.
+
+    The handlers are per interpreter, so the parsed tree itself is never
+    changed and can still be shared between threads and runs.
+    `stats()` reports the hits and misses of every specialization.
+    """
+
+    def __init__(self, parser, stdout=None, stdin=None):
+        super(QuickeningInterpreter, self).__init__(parser, stdout, stdin)
+        self.quick = {}
+        self.backoff = {}
+        self.sites = []
+        self.counts = collections.Counter()
+
+    def visit(self, node):
+        # nodes are keyed by id; the tree outlives the run
+        handler = self.quick.get(id(node))
+        if handler is None:
+            handler = self.install(node)
+        return handler(node)
+
+    def install(self, node):
+        adaptive = getattr(self, 'adaptive_' + type(node).__name__, None)
+        handler = adaptive(node, WARMUP) if adaptive is not None else None
+        if handler is None:
+            handler = getattr(self, 'visit_' + type(node).__name__, self.generic_visit)
+        self.quick[id(node)] = handler
+        return handler
+
+    def deoptimize(self):
+        """Drop every handler, e.g. before the class of the interpreter changes."""
+        self.quick.clear()
+
+    def site(self, family):
+        counter = [0, 0]  # hits, misses
+        self.sites.append((family, counter))
+        self.counts['specialized'] += 1
+        return counter
+
+    def miss(self, node, counter):
+        """A guard failed: count it and return the node to its adaptive handler."""
+        counter[1] += 1
+        self.counts['deoptimized'] += 1
+        backoff = self.backoff[id(node)] = min(self.backoff.get(id(node), WARMUP) * 2, MAX_BACKOFF)
+        handler = getattr(self, 'adaptive_' + type(node).__name__)(node, backoff)
+        self.quick[id(node)] = handler
+
+    def specializing(self):
+        # a debugger hooks assign_var_value, which specialized stores skip
+        return getattr(self, 'debugger', None) is None
+
+    def adaptive_BinOp(self, node, warmup):
+        op = OPERATORS.get(node.op.type)
+        if op is None or not (pure(node.left) and pure(node.right)):
+            return None
+        countdown = [warmup]
+        left, right = node.left, node.right
+
+        def adaptive(node):
+            l = self.visit(left)
+            r = self.visit(right)
+            countdown[0] -= 1
+            if countdown[0] <= 0 and self.specializing():
+                self.quick[id(node)] = self.specialize_BinOp(node, op, type(l), type(r))
+            return op(l, r)
+        return adaptive
+
+    def specialize_BinOp(self, node, op, left_type, right_type):
+        counter = self.site(node.op.type + ' ' + left_type.__name__ + ',' + right_type.__name__)
+        left, right = node.left, node.right
+        get = self.GLOBAL_SCOPE.get
+        visit = self.visit
+        miss = self.miss
+        # a missing variable reads as None, fails the guard and the
+        # generic code raises the error
+        if type(left) is Var and type(right) in CONSTANTS and type(right.value) is right_type:
+            name, constant = left.value, right.value
+
+            def specialized(node):
+                l = get(name)
+                if type(l) is left_type:
+                    counter[0] += 1
+                    return op(l, constant)
+                miss(node, counter)
+                return self.visit_BinOp(node)
+        elif type(left) is Var and type(right) is Var:
+            left_name, right_name = left.value, right.value
+
+            def specialized(node):
+                l = get(left_name)
+                r = get(right_name)
+                if type(l) is left_type and type(r) is right_type:
+                    counter[0] += 1
+                    return op(l, r)
+                miss(node, counter)
+                return self.visit_BinOp(node)
+        else:
+            def specialized(node):
+                l = visit(left)
+                r = visit(right)
+                if type(l) is left_type and type(r) is right_type:
+                    counter[0] += 1
+                    return op(l, r)
+                miss(node, counter)
+                return self.visit_BinOp(node)
+        return specialized
+
+    def adaptive_Assign(self, node, warmup):
+        target = node.left
+        if type(target) is not Var or type(target.value) is not str:
+            return None
+        name = target.value
+        if name not in self.DECLARED_VAR or isinstance(self.GLOBAL_SCOPE.get(name), Array):
+            return None
+        countdown = [warmup]
+        right = node.right
+
+        def adaptive(node):
+            value = self.visit(right)
+            countdown[0] -= 1
+            if countdown[0] <= 0 and self.specializing():
+                self.quick[id(node)] = self.specialize_Assign(node, name, type(value))
+            self.assign_var_value(name, value)
+        return adaptive
+
+    def specialize_Assign(self, node, name, value_type):
+        declared = self.DECLARED_VAR[name]
+        if (declared, value_type) not in STORES:
+            # no store without coercion for this pair; try again later
+            self.counts['unspecialized'] += 1
+            backoff = self.backoff[id(node)] = min(self.backoff.get(id(node), WARMUP) * 2, MAX_BACKOFF)
+            return self.adaptive_Assign(node, backoff)
+        convert = STORES[(declared, value_type)]
+        counter = self.site('store ' + declared + '<-' + value_type.__name__)
+        scope = self.GLOBAL_SCOPE
+        visit = self.visit
+        miss = self.miss
+        right = node.right
+        if convert is None:
+            def specialized(node):
+                value = visit(right)
+                if type(value) is value_type:
+                    counter[0] += 1
+                    scope[name] = value
+                    return
+                miss(node, counter)
+                self.assign_var_value(name, value)
+        else:
+            def specialized(node):
+                value = visit(right)
+                if type(value) is value_type:
+                    counter[0] += 1
+                    scope[name] = convert(value)
+                    return
+                miss(node, counter)
+                self.assign_var_value(name, value)
+        return specialized
+
+    def stats(self):
+        """Per specialization family: [sites, hits, misses], plus overall counts."""
+        families = collections.OrderedDict()
+        for family, (hits, misses) in sorted(self.sites, key=lambda site: site[0]):
+            totals = families.setdefault(family, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += hits
+            totals[2] += misses
+        return families, self.counts
+
+    def report(self):
+        """The hit rates of `stats()` as text, one family per line."""
+        families, counts = self.stats()
+        lines = []
+        for family, (sites, hits, misses) in families.items():
+            rate = 100.0 * hits / (hits + misses) if hits + misses else 0.0
+            lines.append('{:<24} sites={} hits={} misses={} hit_rate={:.1f}%'.format(
+                family, sites, hits, misses, rate))
+        lines.append(' '.join(name + '=' + str(count) for name, count in sorted(counts.items())) or 'nothing specialized')
+        return '\n'.join(lines)
@@ -0,0 +1,526 @@
+# Persistent interpreter server
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import collections
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+
+from .lexer import Lexer
+from .parser import Parser
+from .interpreter import Interpreter
+from .cost import Estimator, features
+
+
+HEADER = struct.Struct('!I')
+MAX_FRAME = 16 * 1024 * 1024
+TREE_CACHE_SIZE = 256
+# seconds a server job may run: when its request sets no timeout, and at most
+DEFAULT_TIMEOUT = 10.0
+MAX_TIMEOUT = 60.0
+
+
+class TimeLimitExceeded(Exception):
+    pass
+
+
+class OutputLimitExceeded(Exception):
+    pass
+
+
+def program_id(source):
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def send_message(sock, message):
+    """Send one frame: a 4-byte big-endian length, then UTF-8 JSON."""
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    """Receive one frame, or None if the peer closed between frames."""
+    header = recv_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError('Frame of ' + str(length) + ' bytes is too large')
+    data = recv_exactly(sock, length)
+    if data is None:
+        raise ConnectionError('Connection closed inside a frame')
+    return json.loads(data.decode('utf-8'))
+
+
+class LimitedOutput(io.StringIO):
+    def __init__(self, limit=None):
+        io.StringIO.__init__(self)
+        self.limit = limit
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+        if self.limit is not None and self.size > self.limit:
+            raise OutputLimitExceeded('Output limit of ' + str(self.limit) + ' characters exceeded')
+        return io.StringIO.write(self, text)
+
+
+def remove_stale_socket(path):
+    """Unlink `path` if it is a Unix socket nothing listens on; raise if it is anything else."""
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(repr(path) + ' exists and is not a socket')
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise ValueError('Another server is listening on ' + repr(path))
+
+
+def _time_limit_exceeded(signum, frame):
+    raise TimeLimitExceeded('Time limit exceeded')
+
+
+def run_until(tree, stdout, stdin, deadline):
+    """Run `tree` in steps until `deadline`, for timeouts without a timer signal."""
+    from .checkpoint import CHUNK, ResumableInterpreter
+    interpreter = ResumableInterpreter(tree, stdout=stdout)
+    interpreter.stdin = stdin
+    while True:
+        try:
+            done = interpreter.run(CHUNK)
+        finally:
+            # output printed before an error still counts against max_output
+            interpreter.flush_output()
+        if done:
+            return
+        if time.perf_counter() > deadline:
+            raise TimeLimitExceeded('Time limit exceeded')
+
+
+def execute(source, inputs=(), limits=None, trees=None, program=None, results=None):
+    """Run `source` with captured I/O and return a response dict.
+
+    `inputs` are the lines INPUT statements read, one per statement.
+    `limits` may hold `timeout` (seconds of wall time) and `max_output`
+    (characters). The timeout is a timer signal in a process's main
+    thread; any other thread runs the program in steps (`run_until`),
+    looking at the clock between them. `trees` is an optional LRU cache
+    of parsed programs, keyed by the `program` id, and `results` an
+    optional cache.ResultCache.
+    """
+    limits = limits or {}
+    timeout = limits.get('timeout')
+    stepped = bool(timeout) and threading.current_thread() is not threading.main_thread()
+    stdout = LimitedOutput(limits.get('max_output'))
+    stdin = io.StringIO(''.join(line + '\n' for line in inputs))
+    timings = {}
+    error = None
+    cacheable = True
+    key = None
+    clock = time.perf_counter
+    start = clock()
+    if timeout and not stepped:
+        signal.signal(signal.SIGALRM, _time_limit_exceeded)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        tree = trees.get(program) if trees is not None else None
+        if tree is None:
+            tree = Parser(Lexer(source)).parse()
+            if trees is not None:
+                trees[program] = tree
+                while len(trees) > TREE_CACHE_SIZE:
+                    trees.popitem(last=False)
+        else:
+            trees.move_to_end(program)
+        timings['parse'] = clock() - start
+        if results is not None:
+            key = results.key(tree, inputs, limits)
+            entry = results.get(key)
+            if entry is not None:
+                output, error = entry
+                timings['execute'] = clock() - start - timings['parse']
+                return {'ok': error is None, 'output': output, 'error': error,
+                        'timings': timings, 'cached': True}
+        if stepped:
+            run_until(tree, stdout, stdin, start + timeout)
+        else:
+            Interpreter(None, stdout=stdout, stdin=stdin).visit(tree)
+    except TimeLimitExceeded as e:
+        error = str(e)
+        cacheable = False  # depends on the machine, not on the program
+    except Exception as e:
+        error = str(e)
+    finally:
+        if timeout and not stepped:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    timings['execute'] = clock() - start - timings.get('parse', 0.0)
+    if key is not None and cacheable:
+        results.put(key, stdout.getvalue(), error)
+    return {
+        'ok': error is None,
+        'output': stdout.getvalue(),
+        'error': error,
+        'timings': timings,
+    }
+
+
+def worker_loop(conn, cache_options=None):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    execute('START\nSTOP')  # warm up the code paths before the first job
+    trees = collections.OrderedDict()  # parsed trees are reusable, keep the hot ones
+    results = None
+    if cache_options is not None:
+        from .cache import ResultCache
+        results = ResultCache(**cache_options)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        conn.send(execute(trees=trees, results=results, **job))
+
+
+class Worker(object):
+    """One pre-forked interpreter process and the pipe to it."""
+
+    def __init__(self, context, cache_options=None):
+        self.context = context
+        self.cache_options = cache_options
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        conn, child = self.context.Pipe()
+        self.process = self.context.Process(target=worker_loop, args=(child, self.cache_options), daemon=True)
+        self.process.start()
+        child.close()
+        self.conn = conn
+
+    def stop(self):
+        if self.process is not None:
+            self.conn.close()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+
+    def run(self, job):
+        try:
+            self.conn.send(job)
+            return self.conn.recv()
+        except (EOFError, OSError):
+            self.stop()
+            self.start()
+            return {'ok': False, 'output': '', 'error': 'Worker crashed', 'timings': {}}
+
+
+class Job(object):
+    def __init__(self, request, lane='fast', found=None):
+        self.request = request
+        self.lane = lane
+        self.features = found
+        self.response = None
+        self.queued = time.perf_counter()
+        self.done = threading.Event()
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                message = recv_message(self.request)
+            except (ValueError, ConnectionError) as e:
+                try:
+                    send_message(self.request, {'ok': False, 'error': str(e)})
+                except OSError:
+                    pass
+                break
+            if message is None:
+                break
+            send_message(self.request, self.server.cfpl.submit(message))
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Server(object):
+    """Long-lived daemon that runs CFPL programs on pre-warmed workers.
+
+    `address` is a filesystem path for a Unix domain socket or a
+    `(host, port)` pair for TCP. Requests wait in a queue of at most
+    `queue_size` jobs; once it is full, a request waits `queue_timeout`
+    seconds for room and is then answered with a 'Server busy' error.
+
+    Each request is a JSON object with either `source` or the `program`
+    id returned by an earlier response, plus optional `inputs` and
+    `limits` (see `execute`).
+
+    `result_cache` turns on a cache.ResultCache in every worker; it is a
+    dict of its options, e.g. `{'size': 4096, 'directory': '/var/cache/cfpl'}`,
+    and the on-disk tier is shared by the workers.
+
+    With `slow_workers`, that many of the workers only run programs a
+    cost.Estimator expects to take over `slow_threshold` seconds, each
+    lane with its own queue, so quick programs never wait behind slow
+    ones. Every run's measured time is fed back into the estimator, and
+    responses say which `lane` ran them.
+
+    Every job has a time limit, so a program that never stops cannot hold
+    a worker: `timeout` seconds when the request sets none, and never more
+    than `max_timeout`. None leaves either out.
+    """
+
+    def __init__(self, address, workers=None, queue_size=64, queue_timeout=0.5, cache_size=1024,
+                 result_cache=None, slow_workers=0, slow_threshold=None, timeout=DEFAULT_TIMEOUT,
+                 max_timeout=MAX_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.max_timeout = max_timeout
+        count = workers or os.cpu_count() or 1
+        if slow_workers and slow_workers >= count:
+            raise ValueError('slow_workers must leave at least one of the ' + str(count) + ' workers fast')
+        self.lanes = {'fast': queue.Queue(queue_size)}
+        self.estimator = None
+        if slow_workers:
+            self.lanes['slow'] = queue.Queue(queue_size)
+            self.estimator = Estimator() if slow_threshold is None else Estimator(slow_threshold)
+        self.queue_timeout = queue_timeout
+        self.cache_size = cache_size
+        self.programs = collections.OrderedDict()
+        self.features = collections.OrderedDict()
+        self.lock = threading.Lock()
+        context = multiprocessing.get_context('fork')
+        self.workers = [Worker(context, result_cache) for i in range(count)]
+        self.worker_lanes = ['slow' if i < slow_workers else 'fast' for i in range(count)]
+        self.dispatchers = []
+        self.server = None
+
+    def remember(self, program, source):
+        with self.lock:
+            self.programs[program] = source
+            self.programs.move_to_end(program)
+            while len(self.programs) > self.cache_size:
+                self.programs.popitem(last=False)
+
+    def lookup(self, program):
+        with self.lock:
+            source = self.programs.get(program)
+            if source is not None:
+                self.programs.move_to_end(program)
+            return source
+
+    def profile(self, program, source):
+        """cost.features of a program, parsed once while it stays cached."""
+        with self.lock:
+            found = self.features.get(program)
+        if found is None:
+            try:
+                found = features(Parser(Lexer(source)).parse())
+            except Exception:
+                found = features(None)  # the worker reports the error
+            with self.lock:
+                self.features[program] = found
+                while len(self.features) > self.cache_size:
+                    self.features.popitem(last=False)
+        return found
+
+    def limits(self, requested):
+        """The request's limits, with the server's default and maximum timeout applied."""
+        limits = dict(requested)
+        timeout = limits.get('timeout')
+        if type(timeout) not in (int, float) or timeout <= 0:
+            timeout = self.timeout
+        if self.max_timeout is not None and (timeout is None or timeout > self.max_timeout):
+            timeout = self.max_timeout
+        limits['timeout'] = timeout
+        return limits
+
+    def submit(self, message):
+        if not isinstance(message, dict):
+            return {'ok': False, 'error': 'Request must be a JSON object'}
+        limits = message.get('limits', {})
+        if not isinstance(limits, dict):
+            return {'ok': False, 'error': 'limits must be a JSON object'}
+        source = message.get('source')
+        program = message.get('program')
+        if source is not None:
+            program = program_id(source)
+            self.remember(program, source)
+        else:
+            source = self.lookup(program)
+            if source is None:
+                return {'ok': False, 'error': 'Unknown program ' + repr(program)}
+        lane = 'fast'
+        found = None
+        if self.estimator is not None:
+            found = self.profile(program, source)
+            with self.lock:
+                lane = self.estimator.lane(found, program)
+        job = Job({
+            'program': program,
+            'source': source,
+            'inputs': message.get('inputs', []),
+            'limits': self.limits(limits),
+        }, lane, found)
+        try:
+            self.lanes[lane].put(job, timeout=self.queue_timeout)
+        except queue.Full:
+            return {'ok': False, 'error': 'Server busy', 'program': program}
+        job.done.wait()
+        job.response['program'] = program
+        if found is not None:
+            job.response['lane'] = lane
+        return job.response
+
+    def dispatch(self, worker, lane):
+        jobs = self.lanes[lane]
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            started = time.perf_counter()
+            response = worker.run(job.request)
+            response['timings']['queue'] = started - job.queued
+            response['timings']['total'] = time.perf_counter() - job.queued
+            if job.features is not None and 'execute' in response['timings'] and not response.get('cached'):
+                with self.lock:
+                    self.estimator.observe(job.features, response['timings']['execute'], job.request['program'])
+            job.response = response
+            job.done.set()
+
+    def start(self):
+        if isinstance(self.address, str):
+            remove_stale_socket(self.address)
+        for worker, lane in zip(self.workers, self.worker_lanes):
+            worker.start()
+            thread = threading.Thread(target=self.dispatch, args=(worker, lane), daemon=True)
+            thread.start()
+            self.dispatchers.append(thread)
+        if isinstance(self.address, str):
+            self.server = UnixServer(self.address, Handler)
+        else:
+            self.server = TCPServer(tuple(self.address), Handler)
+        self.server.cfpl = self
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.unlink(self.address)
+        for lane in self.worker_lanes:
+            self.lanes[lane].put(None)
+        for thread in self.dispatchers:
+            thread.join()
+        for worker in self.workers:
+            worker.stop()
+
+
+class Client(object):
+    """Blocking client that keeps one connection open across requests."""
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address)
+        else:
+            self.sock = socket.create_connection(tuple(address))
+
+    def run(self, source=None, program=None, inputs=(), limits=None):
+        message = {'inputs': list(inputs), 'limits': limits or {}}
+        if source is not None:
+            message['source'] = source
+        else:
+            message['program'] = program
+        send_message(self.sock, message)
+        return recv_message(self.sock)
+
+    def close(self):
+        self.sock.close()
+
+
+def main():
+    import argparse
+    import sys
+    arg_parser = argparse.ArgumentParser(description='CFPL interpreter server')
+    arg_parser.add_argument('--socket', metavar='PATH', help='listen on a Unix domain socket')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, help='listen on a local TCP port')
+    arg_parser.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    arg_parser.add_argument('--queue', type=int, default=64, help='maximum queued requests')
+    arg_parser.add_argument('--result-cache', type=int, metavar='ENTRIES',
+                            help='cache whole-program results, ENTRIES per worker in memory')
+    arg_parser.add_argument('--result-cache-dir', metavar='PATH', help='also cache results on disk under PATH')
+    arg_parser.add_argument('--slow-workers', type=int, default=0, metavar='N',
+                            help='keep N of the workers for programs estimated to be slow')
+    arg_parser.add_argument('--slow-ms', type=float, help='estimated run time that makes a program slow (default: 10)')
+    arg_parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                            help='seconds a job may run when its request sets no timeout (0: no limit)')
+    arg_parser.add_argument('--max-timeout', type=float, default=MAX_TIMEOUT,
+                            help='most seconds a request may ask for (0: no limit)')
+    args = arg_parser.parse_args()
+    if args.socket:
+        address = args.socket
+    elif args.port is not None:
+        address = (args.host, args.port)
+    else:
+        arg_parser.error('one of --socket or --port is required')
+    result_cache = None
+    if args.result_cache or args.result_cache_dir:
+        result_cache = {'size': args.result_cache or 1024, 'directory': args.result_cache_dir}
+    server = Server(address, workers=args.workers, queue_size=args.queue, result_cache=result_cache,
+                    slow_workers=args.slow_workers,
+                    slow_threshold=None if args.slow_ms is None else args.slow_ms / 1000.0,
+                    timeout=args.timeout or None, max_timeout=args.max_timeout or None)
+    try:
+        server.start()
+    except ValueError as e:
+        sys.exit(str(e))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+# Explicit-stack interpreter
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import operator
+
+from .constants import (
+    AND, ASSIGN, DIV, EQUAL, GREATER_EQUAL, GREATER_THAN, LESSER_EQUAL, LESSER_THAN, MINUS, MOD,
+    MUL, NOT, NOT_EQUAL, OR, PLUS, STRING_CONST,
+)
+from .ast import (
+    Assign, BinOp, Block, Bool, Char, Compound, CountedLoop, IfStatement, Increment, Index, NoOp,
+    Num, Program, String, Sum, UnaryOp, Var, WhileStatement,
+)
+from .arrays import Array
+from .interpreter import COMPARISONS, Interpreter
+
+
+BINARY_OPERATORS = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    MUL: operator.mul,
+    MOD: operator.mod,
+    DIV: operator.truediv,
+    GREATER_THAN: operator.gt,
+    LESSER_THAN: operator.lt,
+    GREATER_EQUAL: operator.ge,
+    LESSER_EQUAL: operator.le,
+    EQUAL: operator.eq,
+    NOT_EQUAL: lambda left, right: bool(left != right),
+}
+
+
+CONSTANTS = (Num, Char, Bool, String)
+
+# result for `immediate` when a node has to go through the work stack
+PENDING = object()
+
+
+class StackInterpreter(Interpreter):
+    """Interpreter that walks the tree with a work stack and a value stack.
+
+    Every pending step is a `(handler, node)` pair on `self.work`; handlers
+    for expressions leave exactly one result on `self.values`, handlers for
+    statements leave nothing. Nothing recurses through Python frames, so
+    the nesting it runs is limited by memory rather than the recursion
+    limit; the Parser still recurses, so parsed programs nest only as
+    deep as it goes (about 320 blocks or parentheses). Node
+    types without a handler here (declarations, INPUT, OUTPUT, ...) run the
+    recursive `visit_*` method, which re-enters `visit` on the same stacks.
+
+    Constants, variables and binary operators on those are evaluated on
+    the spot (`immediate`) rather than pushed, which keeps the common
+    shallow expressions as cheap as in the recursive visitor.
+    """
+
+    def __init__(self, parser, stdout=None, stdin=None):
+        Interpreter.__init__(self, parser, stdout, stdin)
+        self.work = []
+        self.values = []
+        self.expressions = {
+            Num: self.eval_constant,
+            Char: self.eval_constant,
+            Bool: self.eval_constant,
+            String: self.eval_constant,
+            Var: self.eval_var,
+            BinOp: self.eval_binop,
+            UnaryOp: self.eval_unaryop,
+            Index: self.eval_index,
+            Sum: self.eval_sum,
+        }
+        self.statements = {
+            Program: self.exec_program,
+            Block: self.exec_block,
+            Compound: self.exec_compound,
+            Assign: self.exec_assign,
+            IfStatement: self.exec_if,
+            WhileStatement: self.exec_while,
+            CountedLoop: self.exec_counted,
+            Increment: self.exec_increment,
+            NoOp: self.exec_noop,
+        }
+
+    def visit(self, node):
+        work = self.work
+        base = len(work)
+        statement = type(node) in self.statements
+        if statement:
+            self.push_statement(node)
+        else:
+            self.push_expression(node)
+        while len(work) > base:
+            handler, item = work.pop()
+            handler(item)
+        if statement:
+            # same return values as the recursive visitor
+            if isinstance(node, (IfStatement, WhileStatement)):
+                return node.value
+            return None
+        return self.values.pop()
+
+    def push_expression(self, node):
+        handler = self.expressions.get(type(node))
+        if handler is None:
+            handler = self.eval_fallback
+        self.work.append((handler, node))
+
+    def push_statement(self, node):
+        handler = self.statements.get(type(node))
+        if handler is None:
+            handler = self.exec_fallback
+        self.work.append((handler, node))
+
+    def immediate(self, node):
+        """The value of a leaf or of an arithmetic/comparison BinOp of two leaves, else PENDING."""
+        kind = type(node)
+        if kind is Var:
+            var_value = self.GLOBAL_SCOPE.get(node.value)
+            if var_value is None:
+                raise NameError(repr(node.value))
+            return var_value
+        if kind in CONSTANTS:
+            return node.value
+        if kind is BinOp:
+            function = BINARY_OPERATORS.get(node.op.type)
+            left, right = node.left, node.right
+            if function is not None and (type(left) is Var or type(left) in CONSTANTS) \
+                    and (type(right) is Var or type(right) in CONSTANTS):
+                return function(self.immediate(left), self.immediate(right))
+        return PENDING
+
+    def eval_fallback(self, node):
+        method = getattr(self, 'visit_' + type(node).__name__, self.generic_visit)
+        self.values.append(method(node))
+
+    def exec_fallback(self, node):
+        getattr(self, 'visit_' + type(node).__name__, self.generic_visit)(node)
+
+    # expressions
+
+    def eval_constant(self, node):
+        self.values.append(node.value)
+
+    def eval_var(self, node):
+        var_value = self.GLOBAL_SCOPE.get(node.value)
+        if var_value is None:
+            raise NameError(repr(node.value))
+        self.values.append(var_value)
+
+    def eval_binop(self, node):
+        op = node.op.type
+        if op == ASSIGN:
+            self.values.append(None)  # no chained value yet
+            self.work.append((self.finish_assign_op, node))
+            self.push_expression(node.right)
+        elif op == AND or op == OR:
+            self.work.append((self.finish_logical, node))
+            self.push_expression(node.left)
+        elif op == NOT:
+            self.work.append((self.finish_not, node))
+            self.push_expression(node.right)
+        else:
+            value = self.immediate(node.left)
+            if value is PENDING:
+                self.work.append((self.finish_binop, node))
+                self.push_expression(node.right)
+                self.push_expression(node.left)
+                return
+            right = self.immediate(node.right)
+            if right is PENDING:
+                # left is known; it waits on the value stack for right
+                self.values.append(value)
+                self.work.append((self.finish_binop, node))
+                self.push_expression(node.right)
+                return
+            function = BINARY_OPERATORS.get(op)
+            self.values.append(function(value, right) if function is not None else None)
+
+    def finish_binop(self, node):
+        values = self.values
+        right = values.pop()
+        left = values.pop()
+        function = BINARY_OPERATORS.get(node.op.type)
+        values.append(function(left, right) if function is not None else None)
+
+    def finish_logical(self, node):
+        # `left and right` / `left or right`: only evaluate right if needed
+        left = self.values[-1]
+        if bool(left) == (node.op.type == AND):
+            self.values.pop()
+            self.push_expression(node.right)
+
+    def finish_not(self, node):
+        self.values.append(not self.values.pop())
+
+    def finish_assign_op(self, node):
+        # chained assignment, exactly as Interpreter.assign_chain does it;
+        # the chained value sits on the value stack under the right side
+        value = self.values.pop()
+        chained = self.values.pop()
+        if chained is None:
+            chained = value
+        if type(node.left).__name__ == 'BinOp':
+            if node.left.op.type == ASSIGN:
+                self.values.append(chained)
+                self.work.append((self.finish_assign_op, node.left))
+                self.push_expression(node.left.right)
+            else:
+                self.push_expression(node.left)
+            return
+        if type(node.left).__name__ == 'Var' and node.left.value in self.GLOBAL_SCOPE:
+            self.assign_var_value(node.left.value, chained)
+        if type(node.right).__name__ == 'Var' and node.right.value in self.GLOBAL_SCOPE:
+            self.assign_var_value(node.right.value, chained)
+        self.values.append(value)
+
+    def eval_unaryop(self, node):
+        self.work.append((self.finish_unaryop, node))
+        self.push_expression(node.expr)
+
+    def finish_unaryop(self, node):
+        value = self.values.pop()
+        op = node.op.type
+        if op == PLUS:
+            value = +value
+        elif op == MINUS:
+            value = -value
+        else:
+            value = None
+        self.values.append(value)
+
+    def eval_index(self, node):
+        self.lookup_array(node)
+        self.work.append((self.finish_index, node))
+        self.push_expression(node.index)
+
+    def finish_index(self, node):
+        self.values.append(self.lookup_array(node).get(self.values.pop()))
+
+    def eval_sum(self, node):
+        self.work.append((self.finish_sum, node))
+        self.push_expression(node.expr)
+
+    def finish_sum(self, node):
+        value = self.values.pop()
+        if not isinstance(value, Array):
+            raise NameError('SUM needs an array, got ' + repr(value))
+        self.values.append(value.sum())
+
+    # statements
+
+    def exec_program(self, node):
+        self.push_statement(node.block)
+
+    def exec_block(self, node):
+        self.push_statement(node.compound_statement)
+        for declaration in reversed(node.declarations):
+            self.push_statement(declaration)
+
+    def exec_compound(self, node):
+        for child in reversed(node.children):
+            if child is not None:
+                self.push_statement(child)
+
+    def exec_noop(self, node):
+        pass
+
+    def exec_assign(self, node):
+        left = node.left
+        if type(left) is Var and type(left.value) is str:
+            if left.token.type != STRING_CONST and left.value not in self.DECLARED_VAR:
+                raise NameError(repr(left.value) + " variable is not defined.")
+            value = self.immediate(node.right)
+            if value is PENDING:
+                self.work.append((self.finish_assign, node))
+                self.push_expression(node.right)
+            else:
+                self.assign_var_value(left.value, value)
+        elif type(left).__name__ == 'Index':
+            self.lookup_array(left)
+            self.work.append((self.finish_assign_index, node))
+            self.push_expression(left.index)
+            self.push_expression(node.right)
+        else:
+            Interpreter.visit_Assign(self, node)
+
+    def finish_assign(self, node):
+        self.assign_var_value(node.left.value, self.values.pop())
+
+    def finish_assign_index(self, node):
+        index = self.values.pop()
+        value = self.values.pop()
+        if isinstance(value, Array):
+            raise NameError('Array could not assign to element of ' + repr(node.left.value))
+        self.lookup_array(node.left).set(index, self.coerce_value(node.left.value, value))
+
+    def push_body(self, body):
+        if type(body).__name__ == 'list':
+            for statement in reversed(body):
+                self.push_statement(statement)
+        else:
+            self.push_statement(body)
+
+    def exec_if(self, node):
+        val_expr = self.immediate(node.expr)
+        if val_expr is PENDING:
+            self.work.append((self.finish_if, node))
+            self.push_expression(node.expr)
+        else:
+            self.branch(node, val_expr)
+
+    def finish_if(self, node):
+        self.branch(node, self.values.pop())
+
+    def branch(self, node, val_expr):
+        if val_expr:
+            self.push_body(node.value)
+        elif node.els is not None:
+            self.push_statement(node.els)
+
+    def exec_while(self, node):
+        val_expr = self.immediate(node.expr)
+        if val_expr is PENDING:
+            self.work.append((self.finish_while, node))
+            self.push_expression(node.expr)
+        else:
+            self.loop(node, val_expr)
+
+    def finish_while(self, node):
+        self.loop(node, self.values.pop())
+
+    def loop(self, node, val_expr):
+        if not val_expr:
+            return
+        # test the condition again once the body has run
+        self.work.append((self.exec_while, node))
+        self.push_body(node.value)
+
+    def exec_increment(self, node):
+        self.GLOBAL_SCOPE[node.value] += node.step
+
+    def exec_counted(self, node):
+        # the limit never changes inside the loop, so evaluate it once
+        limit = self.immediate(node.limit)
+        self.counted_step((node, limit))
+
+    def counted_step(self, item):
+        node, limit = item
+        compare = COMPARISONS[node.comparison]
+        counter = self.GLOBAL_SCOPE[node.counter]
+        if not compare(counter, limit):
+            return
+        self.work.append((self.counted_step, item))
+        passes = 1
+        if node.unroll > 1 and compare(counter + node.step * (node.unroll - 1), limit):
+            passes = node.unroll
+        for i in range(passes):
+            self.push_body(node.value.children)
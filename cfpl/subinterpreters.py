@@ -0,0 +1,162 @@
+# Subinterpreter execution
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import os
+import queue
+import threading
+
+from . import pool
+
+
+# the directory holding the cfpl package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run once in every new interpreter
+SETUP = """
+import sys
+sys.path.insert(0, {root!r})
+from cfpl import image
+from cfpl import pool
+
+def run(program, inputs):
+    if isinstance(program, bytes):
+        program = image.decode(program)
+    return pool.run(program, inputs)
+""".format(root=ROOT)
+
+
+class Interpreter(object):
+    """One subinterpreter through the PEP 734 `concurrent.interpreters` module."""
+
+    def __init__(self):
+        from concurrent import interpreters
+        self.interpreter = interpreters.create()
+        self.results = interpreters.create_queue()
+        self.interpreter.prepare_main(results=self.results)
+        self.interpreter.exec(SETUP)
+
+    def run(self, program, inputs):
+        self.interpreter.prepare_main(program=program, inputs=inputs)
+        self.interpreter.exec('results.put(run(program, inputs))')
+        return self.results.get()
+
+    def close(self):
+        self.interpreter.close()
+
+
+class LowLevelInterpreter(object):
+    """One subinterpreter through the `_interpreters` module of CPython 3.13."""
+
+    def __init__(self):
+        import _interpreters
+        import _interpqueues
+        self.interpreters = _interpreters
+        self.queues = _interpqueues
+        self.id = _interpreters.create('isolated')  # with its own GIL
+        self.results = _interpqueues.create(0, 0, 1)
+        self.execute(SETUP + '\nimport _interpqueues\n')
+
+    def execute(self, code, shared=None):
+        error = self.interpreters.exec(self.id, code, shared)
+        if error is not None:
+            raise Exception(error.formatted)
+
+    def run(self, program, inputs):
+        self.execute('_interpqueues.put(results, run(program, inputs), 0, 1)',
+                     {'program': program, 'inputs': inputs, 'results': self.results})
+        return self.queues.get(self.results)[0]
+
+    def close(self):
+        self.queues.destroy(self.results)
+        self.interpreters.destroy(self.id)
+
+
+def backend():
+    """The subinterpreter class this Python supports, or None."""
+    try:
+        from concurrent import interpreters
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        import _interpreters
+        import _interpqueues
+        return LowLevelInterpreter
+    except ImportError:
+        return None
+
+
+class SubinterpreterPool(object):
+    """Run independent CFPL programs in CPython subinterpreters.
+
+    Each worker thread owns one subinterpreter with its own GIL, so
+    programs run in parallel on a regular (GIL) build. Sources and inputs
+    go in and `(output, error)` comes back through a cross-interpreter
+    queue; parsed trees are sent as program images (image.py). Where
+    subinterpreters are unavailable (before CPython 3.13) the pool falls
+    back to a pool.ThreadPool and `backend` is 'threads'.
+
+    The interface matches pool.ThreadPool: `submit`, `map`, `shutdown`.
+    """
+
+    def __init__(self, workers=None):
+        workers = workers or os.cpu_count() or 1
+        cls = backend()
+        self.fallback = None
+        if cls is None:
+            self.backend = 'threads'
+            self.fallback = pool.ThreadPool(workers)
+            return
+        self.backend = 'subinterpreters'
+        self.jobs = queue.Queue()
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self.work, args=(cls(),), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def work(self, interpreter):
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                program = job.program
+                if not isinstance(program, str):
+                    from . import image
+                    program = image.encode(program)
+                try:
+                    job.output, job.error = interpreter.run(program, tuple(job.inputs))
+                except Exception as e:
+                    job.output, job.error = '', str(e)
+                job.done.set()
+        finally:
+            interpreter.close()
+
+    def submit(self, program, inputs=()):
+        """Queue a source string or parsed Program; returns a pool.Job."""
+        if self.fallback is not None:
+            return self.fallback.submit(program, inputs)
+        job = pool.Job(program, inputs)
+        self.jobs.put(job)
+        return job
+
+    def map(self, programs, inputs=()):
+        """Run every program and return their (output, error) pairs in order."""
+        jobs = [self.submit(program, inputs) for program in programs]
+        return [job.result() for job in jobs]
+
+    def shutdown(self):
+        if self.fallback is not None:
+            self.fallback.shutdown()
+            return
+        for thread in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
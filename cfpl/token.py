@@ -0,0 +1,39 @@
+# Tokenizer
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+from operator import itemgetter
+
+
+class Token(tuple):
+    """An immutable (type, value) pair.
+
+    Reserved keyword tokens are shared by every lexer, so nothing may
+    change a token once the lexer has made it.
+    """
+    __slots__ = ()
+
+    def __new__(cls, type, value):
+        return tuple.__new__(cls, (type, value))
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    type = property(itemgetter(0))
+    value = property(itemgetter(1))
+
+    def __str__(self):
+        """String representation of the class instance.
+
+        Examples:
+            Token(INT_CONST, 3)
+            Token(PLUS, '+')
+            Token(MUL, '*')
+        """
+        return 'Token({type}, {value})'.format(
+            type=self.type,
+            value=repr(self.value)
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
@@ -0,0 +1,103 @@
+# Result cache tests
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cfpl import pool
+from cfpl.cache import ResultCache
+
+
+HELLO = 'START\nOUTPUT: "hello"\nSTOP'
+ECHO = 'VAR x, y AS INT\nSTART\nINPUT: x\ny = (x * 2)\nOUTPUT: y\nSTOP'
+
+
+def files(directory):
+    return [name for root, dirs, names in os.walk(directory) for name in names if name.endswith('.json')]
+
+
+class KeyTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResultCache()
+
+    def key(self, source, inputs=(), limits=None):
+        return self.cache.key(pool.parse(source), inputs, limits)
+
+    def test_formatting_and_comments_do_not_matter(self):
+        spaced = '* says hello\nSTART\n    OUTPUT:   "hello"\n\nSTOP\n'
+        self.assertEqual(self.key(HELLO), self.key(spaced))
+
+    def test_programs_differ(self):
+        self.assertNotEqual(self.key(HELLO), self.key(HELLO.replace('hello', 'world')))
+
+    def test_inputs_only_count_for_programs_with_input(self):
+        self.assertEqual(self.key(HELLO, ['1']), self.key(HELLO, ['2']))
+        self.assertNotEqual(self.key(ECHO, ['1']), self.key(ECHO, ['2']))
+        self.assertEqual(self.key(ECHO, ['1']), self.key(ECHO, ['1']))
+
+    def test_limits_count(self):
+        self.assertNotEqual(self.key(HELLO), self.key(HELLO, limits={'max_output': 3}))
+
+
+class MemoryTest(unittest.TestCase):
+    def test_run_is_answered_from_the_cache(self):
+        cache = ResultCache()
+        self.assertEqual(cache.run(HELLO), ('hello\n', None))
+        self.assertEqual(cache.run(HELLO), ('hello\n', None))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_errors_are_cached(self):
+        cache = ResultCache()
+        output, error = cache.run('START\nOUTPUT: x\nSTOP')
+        self.assertTrue(error)
+        self.assertEqual(cache.run('START\nOUTPUT: x\nSTOP'), (output, error))
+        self.assertEqual(cache.hits, 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache(size=2)
+        cache.put('a', 'A', None)
+        cache.put('b', 'B', None)
+        cache.get('a')
+        cache.put('c', 'C', None)
+        self.assertEqual(list(cache.entries), ['a', 'c'])
+        self.assertIsNone(cache.get('b'))
+
+
+class DiskTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_entries_outlive_the_cache(self):
+        ResultCache(directory=self.directory).run(HELLO)
+        cache = ResultCache(directory=self.directory)
+        self.assertEqual(cache.run(HELLO), ('hello\n', None))
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = ResultCache(directory=self.directory, disk_size=3)
+        for key in 'abcde':
+            cache.put(key * 64, key, None)
+            os.utime(cache.path(key * 64), (0, 'abcde'.index(key)))
+        cache.evict()
+        self.assertEqual(sorted(files(self.directory)), [key * 64 + '.json' for key in 'cde'])
+
+    def test_malformed_entries_are_misses_and_removed(self):
+        key = ResultCache().key(pool.parse(HELLO))
+        for data in ('{"output": "x"', '{"output": "x"}', '[]', '{"output": 1, "error": null}', ''):
+            cache = ResultCache(directory=self.directory)
+            path = cache.path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(data)
+            self.assertIsNone(cache.get(key), data)
+            self.assertFalse(os.path.exists(path), data)
+            self.assertEqual(cache.run(HELLO), ('hello\n', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# Checkpoint and resume tests
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import unittest
+
+from cfpl import pool
+from cfpl.checkpoint import ResumableInterpreter, resume
+
+
+LOOP = '''VAR n, m, i, total AS INT
+VAR a[12] = 1 AS INT
+START
+    INPUT: n
+    WHILE (i < n)
+    START
+        a[i] = (a[i] * i)
+        total = (total + a[i])
+        OUTPUT: total
+        i = (i + 1)
+    STOP
+    INPUT: m
+    total = (total * m)
+    OUTPUT: "total: " & total & "#a: " & a
+STOP'''
+INPUTS = ['10', '3']
+
+
+def uninterrupted(tree):
+    interpreter = ResumableInterpreter(tree, INPUTS)
+    interpreter.run()
+    return interpreter.take_output(), interpreter.steps
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.tree = pool.parse(LOOP)
+        self.expected, self.steps = uninterrupted(self.tree)
+
+    def test_same_output_from_any_checkpoint(self):
+        self.assertIn('total: 135', self.expected)
+        for steps in range(1, self.steps):
+            interpreter = ResumableInterpreter(self.tree, INPUTS)
+            self.assertFalse(interpreter.run(steps))
+            printed = interpreter.take_output()
+            resumed = resume(interpreter.checkpoint(), pool.parse(LOOP))
+            self.assertTrue(resumed.run())
+            self.assertEqual(printed + resumed.take_output(), self.expected, steps)
+
+    def test_output_not_taken_travels_with_the_state(self):
+        interpreter = ResumableInterpreter(self.tree, INPUTS)
+        interpreter.run(self.steps // 2)
+        resumed = resume(interpreter.checkpoint(), self.tree)
+        resumed.run()
+        self.assertEqual(resumed.take_output(), self.expected)
+
+    def test_checkpoints_of_a_resumed_run(self):
+        interpreter = ResumableInterpreter(self.tree, INPUTS)
+        printed = ''
+        while not interpreter.run(7):
+            printed += interpreter.take_output()
+            interpreter = resume(interpreter.checkpoint(), self.tree)
+        self.assertEqual(printed + interpreter.take_output(), self.expected)
+
+    def test_embedded_program(self):
+        interpreter = ResumableInterpreter(self.tree, INPUTS)
+        interpreter.run(self.steps // 3)
+        resumed = resume(interpreter.checkpoint(embed=True))
+        resumed.run()
+        self.assertEqual(resumed.take_output(), self.expected)
+
+    def test_program_is_needed_when_not_embedded(self):
+        interpreter = ResumableInterpreter(self.tree, INPUTS)
+        interpreter.run(10)
+        with self.assertRaises(ValueError):
+            resume(interpreter.checkpoint())
+
+    def test_another_program(self):
+        interpreter = ResumableInterpreter(self.tree, INPUTS)
+        interpreter.run(10)
+        with self.assertRaises(ValueError):
+            resume(interpreter.checkpoint(), pool.parse(LOOP.replace('* m', '* 2')))
+
+    def test_not_a_checkpoint(self):
+        interpreter = ResumableInterpreter(self.tree, INPUTS)
+        interpreter.run(10)
+        with self.assertRaises(ValueError):
+            resume(b'XXXX' + interpreter.checkpoint()[4:], self.tree)
+
+    def test_same_output_as_the_other_engines(self):
+        self.assertEqual(pool.run(self.tree, INPUTS), (self.expected, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
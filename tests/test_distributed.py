@@ -0,0 +1,127 @@
+# Distributed runner tests
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import socket
+import threading
+import time
+import unittest
+
+from cfpl import pool
+from cfpl.distributed import Coordinator, Peer, Worker
+from cfpl.server import recv_message, send_message
+
+
+ECHO = 'VAR x, y AS INT\nSTART\nINPUT: x\ny = (x * 2)\nOUTPUT: y\nSTOP'
+HELLO = 'START\nOUTPUT: "hello"\nSTOP'
+ENDLESS = 'VAR i AS INT\nSTART\nWHILE (i >= 0)\nSTART\ni = (i + 1)\nSTOP\nSTOP'
+
+
+def start_worker(coordinator, name):
+    thread = threading.Thread(target=Worker(coordinator.address, name).run, daemon=True)
+    thread.start()
+    return thread
+
+
+def pull_and_drop(coordinator):
+    """Take a batch like a worker would, then go away without answering."""
+    sock = socket.create_connection(coordinator.address)
+    send_message(sock, {'op': 'pull', 'worker': 'flaky', 'max': 8})
+    reply = recv_message(sock)
+    sock.close()
+    return reply
+
+
+class CoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.coordinator = None
+
+    def tearDown(self):
+        if self.coordinator is not None:
+            self.coordinator.shutdown()
+
+    def start(self, **options):
+        self.coordinator = Coordinator(**options).start()
+        return self.coordinator
+
+    def test_results_match_a_local_run(self):
+        coordinator = self.start()
+        cases = [['1'], ['2'], ['3']]
+        ids = coordinator.submit([ECHO, HELLO], cases)
+        start_worker(coordinator, 'a')
+        start_worker(coordinator, 'b')
+        self.assertTrue(coordinator.wait(30))
+        expected = [pool.run(source, inputs) for source in (ECHO, HELLO) for inputs in cases]
+        self.assertEqual([(coordinator.results[task]['output'], coordinator.results[task]['error'])
+                          for task in ids], expected)
+        self.assertEqual(coordinator.stats['completed'], len(ids))
+
+    def test_tasks_of_a_lost_worker_are_requeued(self):
+        coordinator = self.start()
+        ids = coordinator.submit([HELLO, ECHO], [['4']])
+        self.assertEqual(len(pull_and_drop(coordinator)['tasks']), 2)
+        start_worker(coordinator, 'steady')
+        self.assertTrue(coordinator.wait(30))
+        for task in ids:
+            response = coordinator.results[task]
+            self.assertTrue(response['ok'])
+            self.assertEqual(response['worker'], 'steady')
+            self.assertEqual(response['attempts'], 2)
+        self.assertEqual(coordinator.stats['retried'], 2)
+
+    def test_gives_up_after_max_attempts(self):
+        coordinator = self.start(max_attempts=1)
+        (task,) = coordinator.submit([HELLO])
+        pull_and_drop(coordinator)
+        self.assertTrue(coordinator.wait(30))
+        self.assertEqual(coordinator.results[task]['error'], 'Gave up after 1 attempts')
+        self.assertEqual(coordinator.stats['failed'], 1)
+
+    def test_first_result_wins(self):
+        coordinator = Coordinator(straggler_after=0.0)
+        (task,) = coordinator.submit([HELLO])
+        first, second = Peer('first'), Peer('second')
+        self.assertEqual(coordinator.take(first, 1)['tasks'][0]['task'], task)
+        time.sleep(0.01)
+        # nothing queued, so the second worker gets a copy of the straggler
+        self.assertEqual(coordinator.take(second, 1)['tasks'][0]['task'], task)
+        self.assertEqual(coordinator.stats['speculative'], 1)
+        response = {'ok': True, 'output': 'hello\n', 'error': None, 'timings': {}}
+        self.assertEqual(coordinator.complete(second, task, dict(response)), {'op': 'ack', 'duplicate': False})
+        self.assertEqual(coordinator.complete(first, task, dict(response)), {'op': 'ack', 'duplicate': True})
+        self.assertEqual(coordinator.results[task]['worker'], 'second')
+        self.assertEqual(coordinator.stats['duplicates'], 1)
+
+    def test_tasks_are_timed_from_the_result_before_them(self):
+        coordinator = Coordinator()
+        first, second = coordinator.submit([HELLO, ECHO])
+        peer = Peer('worker')
+        self.assertEqual(len(coordinator.take(peer, 2)['tasks']), 2)
+        response = {'ok': True, 'output': '', 'error': None, 'timings': {}}
+        time.sleep(0.2)
+        coordinator.complete(peer, first, dict(response))
+        coordinator.complete(peer, second, dict(response))
+        self.assertGreaterEqual(coordinator.durations[0], 0.2)
+        # the second task waited behind the first, which is not its run time
+        self.assertLess(coordinator.durations[1], 0.1)
+
+    def test_tasks_get_the_default_timeout(self):
+        coordinator = self.start(timeout=0.3)
+        endless, hello = coordinator.submit([ENDLESS, HELLO])
+        start_worker(coordinator, 'a')
+        self.assertTrue(coordinator.wait(30))
+        self.assertEqual(coordinator.results[endless]['error'], 'Time limit exceeded')
+        self.assertEqual(coordinator.results[hello]['output'], 'hello\n')
+
+    def test_unknown_messages(self):
+        coordinator = self.start()
+        sock = socket.create_connection(coordinator.address)
+        try:
+            for message in ([], {'op': 'nonsense'}):
+                send_message(sock, message)
+                self.assertEqual(recv_message(sock)['op'], 'error')
+        finally:
+            sock.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# Program image tests
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import glob
+import multiprocessing
+import os
+import unittest
+
+from cfpl import image, pool
+from cfpl.cache import canonical
+from cfpl.hashcons import Interner
+
+
+SAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test*.txt')))
+INPUTS = ['1.5,2']
+SHARED = 'VAR a, b, c AS INT\nSTART\nb = ((a + 1) * 2)\nc = ((a + 1) * 3)\nSTOP'
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def run_loaded(name, conn):
+    conn.send(pool.run(image.load(name), INPUTS))
+    conn.close()
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_samples(self):
+        self.assertTrue(SAMPLES)
+        for path in SAMPLES:
+            tree = pool.parse(read(path))
+            decoded = image.decode(image.encode(tree))
+            self.assertEqual(canonical(decoded), canonical(tree), path)
+            self.assertEqual(pool.run(decoded, INPUTS), pool.run(tree, INPUTS), path)
+
+    def test_encoding_is_deterministic(self):
+        source = read(SAMPLES[0])
+        self.assertEqual(image.encode(pool.parse(source)), image.encode(pool.parse(source)))
+
+    def test_any_buffer(self):
+        tree = pool.parse(SHARED)
+        data = image.encode(tree)
+        for buffer in (data, bytearray(data), memoryview(data)):
+            self.assertEqual(canonical(image.decode(buffer)), canonical(tree))
+
+    def test_shared_nodes_stay_shared(self):
+        tree = pool.parse(SHARED, Interner())
+        first, second = tree.block.compound_statement.children[:2]
+        self.assertIs(first.right.left, second.right.left)
+        decoded = image.decode(image.encode(tree))
+        first, second = decoded.block.compound_statement.children[:2]
+        self.assertIs(first.right.left, second.right.left)
+
+    def test_record_builds_one_subtree(self):
+        tree = pool.parse(SHARED)
+        decoder = image.Decoder(image.encode(tree))
+        try:
+            root = decoder.record(decoder.root)
+            self.assertEqual(canonical(root), canonical(tree))
+            # every record is built once, and then found again
+            self.assertIs(decoder.record(decoder.root), root)
+        finally:
+            decoder.release()
+
+    def test_not_an_image(self):
+        with self.assertRaises(Exception):
+            image.decode(b'XXXX' + image.encode(pool.parse(SHARED))[4:])
+
+    def test_shared_memory(self):
+        tree = pool.parse(read(SAMPLES[0]))
+        block = image.share(tree)
+        try:
+            # a new process, with its own resource tracker, as workers have
+            context = multiprocessing.get_context('spawn')
+            parent, child = context.Pipe()
+            process = context.Process(target=run_loaded, args=(block.name, child))
+            process.start()
+            result = parent.recv()
+            process.join()
+        finally:
+            block.close()
+            block.unlink()
+        self.assertEqual(tuple(result), pool.run(tree, INPUTS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# Server protocol tests
+# Copyright 2019 Art Layese <artiskool@gmail.com>
+
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from cfpl.server import Client, Server, program_id, recv_message, send_message
+
+
+HELLO = 'START\nOUTPUT: "hello"\nSTOP'
+ECHO = 'VAR x, y AS INT\nSTART\nINPUT: x\ny = (x * 2)\nOUTPUT: y\nSTOP'
+ENDLESS = 'VAR i AS INT\nSTART\nWHILE (i >= 0)\nSTART\ni = (i + 1)\nSTOP\nSTOP'
+
+
+class ServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, 'cfpl.sock')
+        cls.server = Server(cls.path, workers=1, timeout=0.5, max_timeout=1.0).start()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        os.rmdir(cls.directory)
+
+    def setUp(self):
+        self.client = Client(self.path)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_run(self):
+        response = self.client.run(HELLO)
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['output'], 'hello\n')
+        self.assertIsNone(response['error'])
+        self.assertEqual(response['program'], program_id(HELLO))
+
+    def test_inputs(self):
+        # the INPUT prompt echoes the line it read
+        output = self.client.run(ECHO, inputs=['21'])['output']
+        self.assertTrue(output.endswith('[INT] >>> 21\n42\n'))
+
+    def test_program_id(self):
+        program = self.client.run(ECHO, inputs=['1'])['program']
+        response = self.client.run(program=program, inputs=['5'])
+        self.assertTrue(response['output'].endswith('>>> 5\n10\n'))
+
+    def test_unknown_program(self):
+        response = self.client.run(program='0' * 64)
+        self.assertFalse(response['ok'])
+        self.assertIn('Unknown program', response['error'])
+
+    def test_program_error(self):
+        response = self.client.run('START\nOUTPUT: x\nSTOP')
+        self.assertFalse(response['ok'])
+        self.assertTrue(response['error'])
+
+    def test_max_output(self):
+        response = self.client.run(HELLO, limits={'max_output': 3})
+        self.assertFalse(response['ok'])
+        self.assertIn('Output limit', response['error'])
+
+    def test_default_timeout(self):
+        response = self.client.run(ENDLESS)
+        self.assertEqual(response['error'], 'Time limit exceeded')
+        self.assertLess(response['timings']['execute'], 0.9)
+
+    def test_max_timeout(self):
+        response = self.client.run(ENDLESS, limits={'timeout': 60})
+        self.assertEqual(response['error'], 'Time limit exceeded')
+        self.assertLess(response['timings']['execute'], 1.5)
+
+    def test_requests_that_are_not_objects(self):
+        for message in ([], 'x', 3):
+            send_message(self.client.sock, message)
+            response = recv_message(self.client.sock)
+            self.assertFalse(response['ok'])
+        # the connection is still usable
+        self.assertEqual(self.client.run(HELLO)['output'], 'hello\n')
+
+    def test_limits_must_be_an_object(self):
+        self.assertFalse(self.client.run(HELLO, limits=[1])['ok'])
+
+
+class SocketPathTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cfpl.sock')
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        os.rmdir(self.directory)
+
+    def test_keeps_a_regular_file(self):
+        with open(self.path, 'w') as f:
+            f.write('data')
+        with self.assertRaises(ValueError):
+            Server(self.path, workers=1).start()
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'data')
+
+    def test_replaces_a_stale_socket(self):
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+        server = Server(self.path, workers=1).start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = Client(self.path)
+            self.assertEqual(client.run(HELLO)['output'], 'hello\n')
+            client.close()
+        finally:
+            server.shutdown()
+
+    def test_refuses_a_socket_in_use(self):
+        listening = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listening.bind(self.path)
+        listening.listen(1)
+        try:
+            with self.assertRaises(ValueError):
+                Server(self.path, workers=1).start()
+        finally:
+            listening.close()
+
+
+if __name__ == '__main__':
+    unittest.main()